@@ -0,0 +1,11 @@
+from .stubs import (
+  StubLatencies, Fixture, StubOCREngine, StubTimingExtractor, StubClassifier, StubTreeBuilder, ScriptedAgent
+)
+from .gemini_stub import GeminiStubServer
+from .synthetic import make_synthetic_datasheet
+from .report import percentile, benchmark_report, format_report
+
+__all__ = [
+  "StubLatencies", "Fixture", "StubOCREngine", "StubTimingExtractor", "StubClassifier", "StubTreeBuilder",
+  "ScriptedAgent", "GeminiStubServer", "make_synthetic_datasheet", "percentile", "benchmark_report", "format_report"
+]
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+
+# Status codes the stub can script, with the API's error status names
+ERROR_STATUSES = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE", 400: "INVALID_ARGUMENT"}
+
+class GeminiStubServer:
+  """
+  Local stand-in for the Gemini REST API, so GeminiTimingExtractor's retries,
+  shared quota cooldown and TimingExtractionPool concurrency can be exercised
+  without network or quota (point --gemini-endpoint / GEMINI_API_ENDPOINT at `url`).
+
+  Successive generateContent calls answer with the scripted `statuses`, then
+  200 with `result` as the model's JSON text. Every call holds its connection
+  for `latency` seconds. Records each call's arrival time and the peak number
+  of calls in progress at once.
+  """
+
+  def __init__(self, result: Dict[str, Any], statuses: Iterable[int] = (), latency: float = 0.0, port: int = 0):
+    self.result = result
+    self.latency = latency
+    self._statuses = list(statuses)
+    self._lock = threading.Lock()
+    self.arrivals: List[float] = []
+    self.active = 0
+    self.max_active = 0
+    self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+    self._server.daemon_threads = True
+    self._thread: Optional[threading.Thread] = None
+
+  @property
+  def url(self) -> str:
+    host, port = self._server.server_address[:2]
+    return f"http://{host}:{port}"
+
+  @property
+  def requests(self) -> int:
+    return len(self.arrivals)
+
+  def start(self) -> "GeminiStubServer":
+    self._thread = threading.Thread(target=self._server.serve_forever, name="gemini-stub", daemon=True)
+    self._thread.start()
+    return self
+
+  def stop(self) -> None:
+    self._server.shutdown()
+    self._server.server_close()
+
+  def __enter__(self) -> "GeminiStubServer":
+    return self.start()
+
+  def __exit__(self, *exc_info) -> None:
+    self.stop()
+
+  def _respond(self) -> tuple:
+    """(status, body) for the next call; also tracks concurrency."""
+    with self._lock:
+      self.arrivals.append(time.monotonic())
+      self.active += 1
+      self.max_active = max(self.max_active, self.active)
+      status = self._statuses.pop(0) if self._statuses else 200
+    try:
+      time.sleep(self.latency)
+    finally:
+      with self._lock:
+        self.active -= 1
+
+    if status != 200:
+      return status, {"error": {"code": status, "message": "stub error", "status": ERROR_STATUSES.get(status, "UNKNOWN")}}
+    return 200, {
+      "candidates": [{
+        "content": {"role": "model", "parts": [{"text": json.dumps(self.result)}]},
+        "finishReason": "STOP",
+        "index": 0
+      }],
+      "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 20, "totalTokenCount": 120}
+    }
+
+  def _handler(self):
+    stub = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if ":generateContent" not in self.path:
+          status, body = 404, {"error": {"code": 404, "message": f"stub has no {self.path}", "status": "NOT_FOUND"}}
+        else:
+          status, body = stub._respond()
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+      def log_message(self, format, *args):
+        pass
+
+    return Handler
\ No newline at end of file
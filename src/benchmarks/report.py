@@ -0,0 +1,54 @@
+import math
+from typing import Any, Dict, List
+from pipeline.tracing import Span
+
+PERCENTILES = (50, 90, 99)
+
+def percentile(values: List[float], q: float) -> float:
+  """Linear-interpolated percentile of an unsorted list (q in 0-100)."""
+  if not values:
+    return 0.0
+  ordered = sorted(values)
+  position = (len(ordered) - 1) * q / 100
+  low, high = math.floor(position), math.ceil(position)
+  return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def benchmark_report(spans: List[Span], pages: int, wall_seconds: float, config: Dict[str, Any]) -> Dict[str, Any]:
+  """Throughput plus per-span-name latency percentiles, RSS growth and the RSS peak reached inside each span."""
+  groups: Dict[str, List[Span]] = {}
+  for span in spans:
+    groups.setdefault(f"{span.category}/{span.name}", []).append(span)
+
+  stages = {}
+  for name, group in groups.items():
+    seconds = [span.seconds for span in group]
+    stages[name] = {
+      "calls": len(group),
+      "total_s": round(sum(seconds), 3),
+      **{f"p{q}_s": round(percentile(seconds, q), 4) for q in PERCENTILES},
+      "max_s": round(max(seconds), 4),
+      "rss_peak_mb": max((span.args.get("rss_peak_mb") or 0.0) for span in group),
+      "rss_delta_mb": round(sum(span.args.get("rss_delta_mb") or 0.0 for span in group), 1),
+      "rss_delta_max_mb": max((span.args.get("rss_delta_mb") or 0.0) for span in group)
+    }
+
+  return {
+    "config": config,
+    "pages": pages,
+    "wall_s": round(wall_seconds, 2),
+    "pages_per_s": round(pages / wall_seconds, 3) if wall_seconds else None,
+    "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["total_s"]))
+  }
+
+def format_report(report: Dict[str, Any]) -> str:
+  lines = [
+    f"[Benchmark] {report['pages']} pages in {report['wall_s']:.1f}s -> {report['pages_per_s']} pages/s",
+    f"  {'span':<34} {'calls':>6} {'total s':>9} {'p50 s':>8} {'p90 s':>8} {'p99 s':>8} {'max s':>8} {'peak RSS':>9} {'+RSS':>8} {'max +RSS':>9}"
+  ]
+  for name, stage in report["stages"].items():
+    lines.append(
+      f"  {name:<34} {stage['calls']:>6} {stage['total_s']:>9.2f} {stage['p50_s']:>8.3f} {stage['p90_s']:>8.3f} "
+      f"{stage['p99_s']:>8.3f} {stage['max_s']:>8.3f} {stage['rss_peak_mb']:>8.0f}M "
+      f"{stage['rss_delta_mb']:>7.0f}M {stage['rss_delta_max_mb']:>8.0f}M"
+    )
+  return "\n".join(lines)
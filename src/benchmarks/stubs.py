@@ -0,0 +1,206 @@
+import json
+import re
+import time
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from pdf_processor import PDFProcessor, PDFExportConfig
+from pipeline.artifacts import hash_bytes
+from pipeline.langchain_tracing import TraceCallbackHandler
+from pipeline.tracing import span
+from rtl_context import KnowledgeNode, PageAnalysis, PageType, TreeNavigator
+from rtl_context.tree_patch import diff_manifests
+
+PAGE_NUMBER = re.compile(r"page_(\d+)")
+
+@dataclass
+class StubLatencies:
+  """Seconds each stand-in sleeps per call (defaults are rough warm-GPU / hosted-API figures)."""
+  ocr_batch: float = 0.3    # Fixed cost of one OCR forward pass
+  ocr_page: float = 1.2     # Added per page in the pass
+  vlm_check: float = 0.4    # OlmOCR "is there a diagram" fallback
+  gemini: float = 2.5       # Timing extraction per diagram
+  classify: float = 1.0     # Ollama page classification
+  tree: float = 8.0         # Gemini tree build per document
+  agent_turn: float = 3.0   # One LLM turn of an agent loop
+
+  def scaled(self, factor: float) -> "StubLatencies":
+    return replace(self, **{f.name: getattr(self, f.name) * factor for f in fields(self)})
+
+  def override(self, assignments: List[str]) -> "StubLatencies":
+    """Applies 'name=seconds' strings, e.g. ['gemini=0.5']."""
+    values = {}
+    for assignment in assignments:
+      name, _, seconds = assignment.partition("=")
+      if name.strip() not in {f.name for f in fields(self)}:
+        raise ValueError(f"Unknown latency '{name}' (use one of {', '.join(f.name for f in fields(self))})")
+      values[name.strip()] = float(seconds)
+    return replace(self, **values)
+
+class Fixture:
+  """
+  Recorded outputs of a real run (<name>_md / <name>_context) that the stubs
+  replay. Page N of a synthetic datasheet maps onto fixture page
+  ((N - 1) % fixture pages) + 1, so any page count gets realistic content.
+  """
+
+  def __init__(self, md_dir: Path, context_dir: Path):
+    self.md_dir = md_dir
+    self.context_dir = context_dir
+    self.pages: List[str] = []
+    for md_path in sorted(md_dir.glob("page_*.md")):
+      with open(md_path, "r", encoding="utf-8") as f:
+        self.pages.append(f.read().removeprefix("\n\n"))
+    if not self.pages:
+      raise ValueError(f"No page_*.md files in {md_dir}")
+
+    self.timing: Dict[int, dict] = {}
+    for json_path in md_dir.glob("page_*_timing.json"):
+      with open(json_path, "r", encoding="utf-8") as f:
+        self.timing[self._number(json_path.stem)] = json.load(f)
+
+    with open(context_dir / "rtl_context_flat.json", "r", encoding="utf-8") as f:
+      self.analyses = {self._number(entry["page_id"]): entry for entry in json.load(f)}
+    with open(context_dir / "rtl_knowledge_tree.json", "r", encoding="utf-8") as f:
+      self.tree = json.load(f)
+
+  @staticmethod
+  def _number(page_id: str) -> int:
+    return int(PAGE_NUMBER.search(page_id).group(1))
+
+  def fixture_page(self, page_id: str) -> int:
+    return (self._number(page_id) - 1) % len(self.pages) + 1
+
+class StubOCREngine:
+  """
+  Stands in for OlmOCRProcessor. Images carry no page id, so each one is
+  matched to its fixture page: PNG paths by file name, rendered pages by a
+  hash of their pixels against the fixture PDF rendered once at `dpi`
+  (synthetic datasheets repeat the fixture's pages, so they render alike).
+  Cache hits and page-by-page retries therefore still get the right text.
+  """
+
+  def __init__(self, fixture: Fixture, latencies: StubLatencies, pdf: Optional[Path] = None, dpi: int = 150):
+    self.fixture = fixture
+    self.latencies = latencies
+    self._pages_by_hash: Dict[str, int] = {}
+    if pdf:
+      with PDFProcessor(pdf) as processor:
+        for page_index in processor.resolve_pages():
+          page = processor.render_page(page_index, PDFExportConfig(dpi=dpi))
+          self._pages_by_hash[hash_bytes(page.samples)] = fixture.fixture_page(page.page_id)
+
+  def _transcription(self, image: Any) -> str:
+    if isinstance(image, Path):
+      page = self.fixture.fixture_page(image.stem)
+    else:
+      page = self._pages_by_hash.get(hash_bytes(image.tobytes()))
+      if page is None:
+        raise ValueError("Image matches no page of the fixture PDF at the stub's dpi")
+    return self.fixture.pages[page - 1]
+
+  def process_images(self, images: List[Any]) -> List[str]:
+    with span("generate", "ocr", batch=len(images)):
+      time.sleep(self.latencies.ocr_batch + self.latencies.ocr_page * len(images))
+      return [self._transcription(image) for image in images]
+
+  def process_images_with_diagram_flag(self, images: List[Any]) -> List[tuple]:
+    return [(text, None) for text in self.process_images(images)]
+
+  def has_visual_diagram(self, image: Any) -> bool:
+    with span("diagram_check", "ocr"):
+      time.sleep(self.latencies.vlm_check)
+      return True
+
+class StubTimingExtractor:
+  """Stands in for GeminiTimingExtractor; replays the fixture's first timing JSON for every diagram."""
+
+  model_name = "stub-gemini"
+  payload_params = {"stub": True}
+
+  def __init__(self, fixture: Fixture, latencies: StubLatencies):
+    self.latencies = latencies
+    self.result = fixture.timing[min(fixture.timing)] if fixture.timing else {"operating_mode": "Unknown Mode"}
+
+  def analyze_diagram(self, image_source: Any) -> Dict[str, Any]:
+    with span("generate", "cloud"):
+      time.sleep(self.latencies.gemini)
+      return dict(self.result)
+
+class StubClassifier:
+  """Stands in for PageClassifier; fixture pages outside the flat manifest come back irrelevant."""
+
+  model_name = "stub-qwen"
+  system_prompt = "stub classifier"
+  prompt_params = {}
+
+  def __init__(self, fixture: Fixture, latencies: StubLatencies):
+    self.fixture = fixture
+    self.latencies = latencies
+
+  def analyze_page(self, page_id: str, content: str) -> PageAnalysis:
+    with span("classify", "rtl_context", page=page_id):
+      time.sleep(self.latencies.classify)
+      entry = self.fixture.analyses.get(self.fixture.fixture_page(page_id))
+      if entry is None:
+        return PageAnalysis(
+          page_id=page_id, page_type=PageType.IRRELEVANT, relevance_score=0, summary="", key_signals=[]
+        )
+      return PageAnalysis(**{**entry, "page_id": page_id})
+
+class StubTreeBuilder:
+  """Stands in for KnowledgeTreeBuilder; always returns the fixture tree."""
+
+  model_name = "stub-gemini"
+  system_prompt = "stub tree builder"
+
+  def __init__(self, fixture: Fixture, latencies: StubLatencies):
+    self.fixture = fixture
+    self.latencies = latencies
+
+  def build_params(self, flat_manifest: List[Dict]) -> dict:
+    return {}
+
+  def patch_tree(self, tree: KnowledgeNode, previous_manifest: List[Dict], flat_manifest: List[Dict]) -> tuple:
+    with span("place_pages", "rtl_context"):
+      time.sleep(self.latencies.tree / 4)
+      return tree, diff_manifests(previous_manifest, flat_manifest)
+
+  def build_tree(self, flat_manifest: List[Dict], device_name: Optional[str] = None) -> Optional[KnowledgeNode]:
+    with span("build_tree", "rtl_context", pages=len(flat_manifest)):
+      time.sleep(self.latencies.tree)
+      return KnowledgeNode.model_validate(self.fixture.tree)
+
+class ScriptedAgent:
+  """
+  Stands in for RTLAgent / SpecGenAgent. Follows the agents' protocol with
+  the real tools (list configurations, read the specs of the first one,
+  answer), sleeping agent_turn for each LLM turn.
+  """
+
+  def __init__(self, context_dir: Path, md_dir: Path, latencies: StubLatencies):
+    from rtl_generator.tools import DatasheetNavigatorTool, DatasheetReaderTool
+
+    tree_path = context_dir / "rtl_knowledge_tree.json"
+    self.tree_path = tree_path
+    self.navigator = DatasheetNavigatorTool(tree_path=tree_path)
+    self.reader = DatasheetReaderTool(tree_path=tree_path, md_dir=md_dir)
+    self.latencies = latencies
+
+  def _turn(self) -> None:
+    with span("llm:stub", "rtl_generator"):
+      time.sleep(self.latencies.agent_turn)
+
+  def run(self, user_query: str) -> str:
+    config = {"callbacks": [TraceCallbackHandler("rtl_generator")]}
+    with span("agent_loop", "rtl_generator", agent=type(self).__name__):
+      self._turn()
+      self.navigator.invoke({"query": ""}, config=config)
+      configurations = TreeNavigator.load(self.tree_path).list_configurations()
+      if not configurations:
+        return "// No configurations found."
+
+      self._turn()
+      specs = self.reader.invoke({"config_id": configurations[0]["id"]}, config=config)
+      self._turn()
+    return f"// Stub answer for '{user_query}' from {len(specs)} characters of context.\n"
@@ -0,0 +1,16 @@
+from pathlib import Path
+import fitz  # PyMuPDF
+
+def make_synthetic_datasheet(source_pdf: Path, pages: int, output_path: Path) -> Path:
+  """Writes a `pages`-page PDF by repeating source_pdf, for scaling runs past real datasheet sizes."""
+  if pages < 1:
+    raise ValueError("A synthetic datasheet needs at least one page.")
+
+  with fitz.open(source_pdf) as source, fitz.open() as target:
+    if source.page_count == 0:
+      raise ValueError(f"{source_pdf} has no pages.")
+    while target.page_count < pages:
+      target.insert_pdf(source, to_page=min(source.page_count, pages - target.page_count) - 1)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    target.save(output_path, garbage=3, deflate=True)
+  return output_path
@@ -1,53 +1,387 @@
 import typer
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Dict, Any, NamedTuple, Callable, Tuple, Iterable, Iterator
+import functools
+import itertools
 import sys
 import json
+import time
+import threading
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from pdf_processor import PDFProcessor, PDFExportConfig
+from pdf_processor import PDFProcessor, PDFExportConfig, RenderedPage, FigureRegion, parse_page_range
+from pdf_processor.figures import stack_images
+from pdf_processor.utils import atomic_write_text
+from pipeline import (
+  ArtifactStore, ProgressManifest, hash_bytes, hash_file, hash_json, hash_text, configure_response_cache, get_tracer,
+  write_combined_markdown
+)
 
 app = typer.Typer(add_completion=False)
 
+@app.callback()
+def configure(
+  ctx: typer.Context,
+  no_cache: bool = typer.Option(False, "--no-cache", help="Bypass the shared model response cache (always call the models)."),
+  cache_dir: Optional[Path] = typer.Option(None, "--cache-dir", envvar="RTL_CACHE_DIR", help="Response cache location (default ~/.cache/rtl_pipeline)."),
+  cache_max_mb: int = typer.Option(512, "--cache-max-mb", min=1, help="Evict least recently used responses above this size."),
+  cache_max_days: float = typer.Option(30.0, "--cache-max-days", help="Evict responses older than this."),
+  profile: bool = typer.Option(False, "--profile", help="Trace every stage and print a timing/token/memory summary."),
+  trace_file: Path = typer.Option(Path("trace.json"), "--trace-file", help="Chrome trace written with --profile (open in ui.perfetto.dev).")
+):
+  """Datasheet PDF -> OCR -> context tree -> RTL."""
+  cache = configure_response_cache(
+    path=cache_dir / "responses.sqlite3" if cache_dir else None,
+    max_bytes=cache_max_mb * 1024 * 1024, max_age_days=cache_max_days, enabled=not no_cache
+  )
+
+  def report_cache():
+    if cache.stats["hits"] or cache.stats["misses"]:
+      print(cache.summary())
+  ctx.call_on_close(report_cache)
+
+  if profile:
+    tracer = get_tracer()
+    tracer.enable()
+
+    def report_profile():
+      print(tracer.summary())
+      print(f"[Profile] Chrome trace: {tracer.write_chrome_trace(trace_file)}")
+    ctx.call_on_close(report_profile)
+
 @app.command()
 def main(
   input: Path = typer.Option(..., "--input", "-i", exists=True, dir_okay=False),
   output: Optional[Path] = typer.Option(None, "--output", "-o"),
-  dpi: int = typer.Option(150, "--dpi")
+  dpi: int = typer.Option(150, "--dpi"),
+  workers: int = typer.Option(1, "--workers", "-w", min=1, help="Parallel render processes."),
+  pages: Optional[str] = typer.Option(None, "--pages", help="1-based page selection, e.g. '1-20,25'."),
+  image_format: str = typer.Option("png", "--format", help="png | jpg | webp"),
+  colorspace: str = typer.Option("rgb", "--colorspace", help="rgb | gray | mono (1-bit)"),
+  adaptive_dpi: bool = typer.Option(False, "--adaptive-dpi", help="Pick DPI per page from its smallest text."),
+  min_dpi: int = typer.Option(100, "--min-dpi"),
+  max_dpi: int = typer.Option(300, "--max-dpi"),
+  quality: int = typer.Option(80, "--quality", min=1, max=100, help="jpg/webp quality."),
+  lossless: bool = typer.Option(False, "--lossless", help="Lossless WebP.")
 ):
   """Convert PDF to Images (Standard)."""
   print(f"--- Starting Processing: {input.name} ---")
-  config = PDFExportConfig(dpi=dpi, image_format="png")
+  try:
+    config = PDFExportConfig(
+      dpi=dpi, image_format=image_format.lower(), workers=workers, pages=parse_page_range(pages),
+      adaptive_dpi=adaptive_dpi, min_dpi=min_dpi, max_dpi=max_dpi,
+      colorspace=colorspace.lower(), quality=quality, lossless=lossless
+    )
+  except ValueError as e:
+    print(f"Error: {e}")
+    raise typer.Exit(code=1)
+
   try:
     with PDFProcessor(input) as processor:
-      images = processor.convert_to_images(config, output_dir=output)
+      store = ArtifactStore(output or processor.default_output_dir)
+      images = processor.convert_to_images(config, output_dir=output, store=store)
       print(f"Success! Generated {len(images)} images.")
+      print(store.summary())
   except Exception as e:
     print(f"Fatal Error: {e}")
     raise typer.Exit(code=1)
 
+def _list_page_images(input_dir: Path) -> List[Path]:
+  """Page rasters in page order, whichever format 'main' wrote them in."""
+  images = []
+  for extension in ("png", "webp", "jpg"):
+    images.extend(input_dir.glob(f"*.{extension}"))
+  return sorted(images, key=lambda img: img.stem)
+
+# Words in the OCR text that make a page worth a diagram check
+TIMING_KEYWORDS = ["timing", "switching", "waveform", "figure"]
+
+# OCR batches buffered together, so the engine's size sort can regroup pages across them
+OCR_SORT_WINDOW = 4
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+  """Consumes an iterator in lists of `size` (the last one may be shorter)."""
+  iterator = iter(iterable)
+  while chunk := list(itertools.islice(iterator, size)):
+    yield chunk
+
+class _PageSource(NamedTuple):
+  page_id: str
+  image: Any  # Path, in-memory PIL image, or None for text-layer pages
+  content_hash: str
+  markdown: Optional[str] = None  # Native text layer (skips the OCR model)
+  figures: Optional[Callable[[], List[Tuple[FigureRegion, RenderedPage]]]] = None  # Lazy figure crops
+
+def _iter_ocr_sources(
+  input_path: Path, dpi: int, pages: Optional[List[int]], save_images: Optional[Path],
+  text_layer: bool = False, decisions: Optional[List[dict]] = None, figure_dpi: int = 200,
+  adaptive_dpi: bool = False, skip: Optional[Callable[[str], bool]] = None
+):
+  """
+  Yields a _PageSource per page for the OCR loop.
+  A PDF is streamed page by page in memory; a folder yields its PNG files.
+  With text_layer, born-digital pages are extracted natively and never rendered.
+  PDF pages also carry a lazy figure locator so vision calls can run on crops.
+  Pages for which skip(page_id) is true are neither hashed nor rendered.
+  """
+  if input_path.is_dir():
+    for img in _list_page_images(input_path):
+      if skip and skip(img.stem):
+        continue
+      yield _PageSource(img.stem, img, hash_file(img))
+    return
+
+  config = PDFExportConfig(dpi=dpi, pages=pages, adaptive_dpi=adaptive_dpi)
+  if save_images and not save_images.exists():
+    save_images.mkdir(parents=True)
+
+  with PDFProcessor(input_path) as processor:
+    for page_index in processor.resolve_pages(config.pages):
+      if skip and skip(f"page_{page_index + 1:03d}"):
+        continue
+
+      if text_layer:
+        decision = processor.text_layer_decision(page_index)
+        if decisions is not None:
+          decisions.append(decision.to_dict())
+        print(f"      [{decision.page_id}] -> {decision.path.upper()} ({decision.reason})")
+
+        if decision.path == "text":
+          yield _PageSource(
+            decision.page_id, None, processor.page_content_hash(page_index),
+            markdown=processor.extract_markdown(page_index)
+          )
+          continue
+
+      try:
+        page = processor.render_page(page_index, config)
+      except Exception as e:
+        print(f"Error rendering page {page_index + 1}: {e}")
+        continue
+
+      image = page.to_image()
+      if save_images:
+        page.save(save_images / f"{page.page_id}.png")
+      yield _PageSource(
+        page.page_id, image, hash_bytes(page.samples),
+        figures=functools.partial(_render_figures, input_path, page_index, figure_dpi)
+      )
+
+def _render_figures(pdf_path: Path, page_index: int, dpi: int) -> List[Tuple[FigureRegion, RenderedPage]]:
+  # Opens its own handle: the figure check can run after the page stream
+  # has closed the document, or on another pipeline thread
+  with PDFProcessor(pdf_path) as processor:
+    return processor.render_figures(page_index, dpi=dpi)
+
+def _ocr_chunk(
+  chunk: List[_PageSource], output_dir: Path, store: ArtifactStore, get_engine: Callable[[], Any],
+  model_id: str, ocr_prompt: str, ocr_params: dict, single_pass: bool = False
+) -> Tuple[dict, dict]:
+  """
+  Transcribes a chunk of pages into <page_id>.md files.
+  Text-layer and unchanged pages are settled first; the rest go through the
+  model together in one padded batch. Returns (page_texts, diagram_flags).
+  """
+  page_texts = {}
+  diagram_flags = {}
+  pending = []
+
+  for page_id, image, image_hash, native_markdown, _ in chunk:
+    md_path = output_dir / f"{page_id}.md"
+    ocr_inputs = {"image": image_hash}
+    ocr_fingerprint = store.fingerprint(
+      ocr_inputs, model=model_id,
+      prompt=ocr_prompt, params=ocr_params
+    )
+
+    if native_markdown is not None:
+      # Born-digital page: the text layer already is the transcription
+      page_texts[page_id] = native_markdown
+      atomic_write_text(md_path, f"\n\n{native_markdown}")
+      print(f"[{page_id}] Done (text layer).")
+    elif cached := store.reuse("ocr", page_id, ocr_fingerprint):
+      with open(md_path, "r", encoding="utf-8") as f:
+        page_texts[page_id] = f.read().removeprefix("\n\n")
+      diagram_flags[page_id] = (cached.get("payload") or {}).get("has_diagram")
+      print(f"[{page_id}] Cached.")
+    else:
+      pending.append((page_id, image, md_path, ocr_inputs, ocr_fingerprint))
+
+  def transcribe(images: list) -> List[Tuple[str, Optional[bool]]]:
+    if single_pass:
+      return get_engine().process_images_with_diagram_flag(images)
+    return [(text, None) for text in get_engine().process_images(images)]
+
+  if pending:
+    print(f"[OCR] Reading {', '.join(item[0] for item in pending)}...", end=" ", flush=True)
+    try:
+      outputs = transcribe([item[1] for item in pending])
+      print("Done.")
+    except Exception as e:
+      print(f"\nError processing batch: {e}")
+      outputs = []
+      if len(pending) > 1:
+        # One bad page (or a batch too large for memory) should not cost the others
+        print("[OCR] Retrying page by page...")
+        for page_id, image, *_ in pending:
+          try:
+            outputs.extend(transcribe([image]))
+          except Exception as page_error:
+            print(f"Error processing {page_id}: {page_error}")
+            outputs.append(None)
+
+    for (page_id, _, md_path, ocr_inputs, ocr_fingerprint), output in zip(pending, outputs):
+      if output is None:
+        continue
+      page_text, flag = output
+      atomic_write_text(md_path, f"\n\n{page_text}")
+
+      store.record(
+        "ocr", page_id, ocr_fingerprint, ocr_inputs, outputs=[md_path],
+        model=model_id, prompt=ocr_prompt, payload={"has_diagram": flag}
+      )
+      page_texts[page_id] = page_text
+      diagram_flags[page_id] = flag
+
+  return page_texts, diagram_flags
+
+def _find_diagram(
+  source: _PageSource, flag: Optional[bool], is_diagram: Callable[..., bool], figure_dpi: int
+) -> Tuple[bool, Any, Optional[List[dict]]]:
+  """
+  Decides whether a page holds a timing diagram, preferring tight figure crops
+  over the whole page (PDF input only). All crops of a page are checked in one
+  call. Returns (found, image to send, crop regions).
+  """
+  crops = source.figures() if source.figures else []
+  headings = [crop.to_image() for region, crop in crops if region.kind == "heading"]
+  figures = [crop.to_image() for region, crop in crops if region.kind != "heading"]
+  print(f"      [?] {source.page_id}: Hints found. Verifying visual presence ({len(figures) or 'full page'} crops)...", end=" ")
+
+  if flag is not None:
+    # Single pass already answered the question for the whole page
+    has_diagram = flag
+  elif figures:
+    has_diagram = is_diagram(stack_images(figures), figure_dpi)
+  else:
+    has_diagram = is_diagram(source.image)
+
+  print("YES." if has_diagram else "NO.")
+  if not has_diagram:
+    return False, None, None
+  if not figures:
+    return True, source.image, None
+
+  # Keep the crop geometry next to the extracted logic (PDF points)
+  regions = [{**region.to_dict(), "dpi": figure_dpi} for region, _ in crops]
+  # Section titles on top: the crops alone rarely name the operating mode
+  return True, stack_images(headings + figures), regions
+
+def _connect_matching_worker(connect_worker: Callable, url: str, requested: Dict[str, Any]) -> Any:
+  """
+  Client for a warm 'ocr-worker' at url, or None. A worker whose model settings
+  differ from the ones explicitly requested (device, quantization...) is not
+  used, since its output would be recorded under the requested settings.
+  """
+  client = connect_worker(url)
+  if not client:
+    return None
+  mismatched = {key: value for key, value in requested.items() if value is not None and client.info.get(key) != value}
+  if mismatched:
+    running = ", ".join(f"{key}={client.info.get(key)}" for key in mismatched)
+    wanted = ", ".join(f"{key}={value}" for key, value in mismatched.items())
+    print(f"[WARN] OCR worker at {url} runs {running}, not {wanted}. Loading the model here instead.")
+    return None
+  print(f"[INFO] Using warm OCR worker at {url} ({client.info.get('device')}, "
+        f"quantization: {client.info.get('quantization') or 'none'})")
+  return client
+
 @app.command()
 def ocr(
-  input_dir: Path = typer.Option(..., "--input", "-i", exists=True, file_okay=False),
+  input_path: Path = typer.Option(..., "--input", "-i", exists=True, help="Folder of page PNGs, or a PDF to stream."),
   output_dir: Path = typer.Option(..., "--output-dir", "-o"),
-  extract_timing: bool = typer.Option(False, "--extract-timing", help="Enable Cloud Logic Extraction.")
+  extract_timing: bool = typer.Option(False, "--extract-timing", help="Enable Cloud Logic Extraction."),
+  dpi: int = typer.Option(150, "--dpi", help="Render DPI (PDF input only)."),
+  pages: Optional[str] = typer.Option(None, "--pages", help="1-based page selection (PDF input only)."),
+  save_images: Optional[Path] = typer.Option(None, "--save-images", help="Also write page PNGs here (PDF input only)."),
+  text_layer: bool = typer.Option(False, "--text-layer", help="Use the PDF's native text where reliable; OCR only scanned/figure pages."),
+  figure_dpi: int = typer.Option(200, "--figure-dpi", help="Render DPI for figure crops sent to vision models (PDF input only)."),
+  adaptive_dpi: bool = typer.Option(False, "--adaptive-dpi", help="Pick render DPI per page from its smallest text (PDF input only)."),
+  batch_size: int = typer.Option(1, "--batch-size", "-b", min=1, help="Pages per OCR forward pass."),
+  device: Optional[str] = typer.Option(None, "--device", help="cuda or cpu (default: auto)."),
+  quantization: Optional[str] = typer.Option(None, "--quantization", "-q", help="int8 or 4bit weight quantization."),
+  threads: Optional[int] = typer.Option(None, "--threads", help="CPU threads (CPU mode)."),
+  max_pixels: Optional[int] = typer.Option(None, "--max-pixels", help="Vision input pixel cap (fewer tokens on CPU)."),
+  worker_url: Optional[str] = typer.Option(None, "--worker-url", envvar="OLMOCR_WORKER_URL", help="Warm OCR worker to use if running (default http://127.0.0.1:8765)."),
+  use_worker: bool = typer.Option(True, "--worker/--no-worker", help="Use a running 'ocr-worker' instead of loading the model."),
+  single_pass: bool = typer.Option(False, "--single-pass", help="Get the diagram YES/NO from the OCR generation itself (one vision encode per page)."),
+  detector: bool = typer.Option(False, "--detector/--no-detector", help="Settle clear diagram/no-diagram cases with the classical detector; ask the VLM only when ambiguous. Off until calibrated on your documents (see calibrate-detector)."),
+  detector_low: float = typer.Option(0.3, "--detector-low", help="Detector score at or below which a crop is not a diagram."),
+  detector_high: float = typer.Option(0.6, "--detector-high", help="Detector score at or above which a crop is a diagram."),
+  cloud_concurrency: int = typer.Option(4, "--cloud-concurrency", min=1, help="Gemini extractions in flight while OCR continues."),
+  gemini_endpoint: Optional[str] = typer.Option(None, "--gemini-endpoint", envvar="GEMINI_API_ENDPOINT", help="Alternative Gemini API host (e.g. a local stub)."),
+  cloud_max_side: int = typer.Option(2048, "--cloud-max-side", min=256, help="Downscale diagrams to this many px on the long side before sending."),
+  cloud_format: str = typer.Option("webp", "--cloud-format", help="Re-encode diagrams as webp | jpeg | png before sending."),
+  cloud_quality: int = typer.Option(85, "--cloud-quality", min=1, max=100, help="webp/jpeg quality for diagrams sent to Gemini."),
+  resume: bool = typer.Option(False, "--resume", help="Skip pages an interrupted run already finished (see _progress.json).")
 ):
   """
   Run OlmOCR on images. Smartly detects and extracts timing logic.
+  Pages whose image, model and prompt are unchanged since the last run are reused.
+  Each page is written as soon as it is done; --resume skips finished pages entirely.
   """
+  if input_path.is_file() and input_path.suffix.lower() != ".pdf":
+    print(f"Error: {input_path} is neither a folder nor a PDF.")
+    raise typer.Exit(1)
+
   try:
-    from ocr_engine import OlmOCRProcessor, GeminiTimingExtractor
-    ocr_engine = OlmOCRProcessor()
+    from ocr_engine import (
+      OlmOCRProcessor, GeminiTimingExtractor, TimingExtractionPool, TIMING_PROMPT,
+      connect_worker, DEFAULT_WORKER_URL, score_timing_diagram
+    )
   except ImportError as e:
     print(f"Error: Missing ML dependencies. {e}")
     raise typer.Exit(1)
+
+  worker_url = worker_url or DEFAULT_WORKER_URL
+  worker = None
+  if use_worker:
+    worker = _connect_matching_worker(
+      connect_worker, worker_url, {"device": device, "quantization": quantization, "max_pixels": max_pixels}
+    )
+  if worker:
+    # The worker's model settings decide the output (and cache keys), not the flags
+    quantization, max_pixels = worker.info.get("quantization"), worker.info.get("max_pixels")
+
+  # The 7B model is only loaded once a page actually needs it,
+  # and not at all when a warm 'ocr-worker' is already serving it
+  @functools.cache
+  def get_ocr_engine():
+    if worker:
+      return worker
+    return OlmOCRProcessor(
+      batch_size=batch_size, device=device, quantization=quantization, num_threads=threads, max_pixels=max_pixels
+    )
+
+  detector_counts = {"yes": 0, "no": 0, "ambiguous": 0}
+
+  def is_timing_diagram(candidate, dpi: Optional[int] = None) -> bool:
+    # Cheap raster heuristics first; the VLM only settles the ambiguous band
+    if detector:
+      verdict = score_timing_diagram(candidate, dpi).verdict(detector_low, detector_high)
+      detector_counts[verdict] += 1
+      if verdict != "ambiguous":
+        return verdict == "yes"
+    return get_ocr_engine().has_visual_diagram(candidate)
     
   gemini_extractor = None
   if extract_timing:
     try:
-      gemini_extractor = GeminiTimingExtractor()
+      gemini_extractor = GeminiTimingExtractor(
+        endpoint=gemini_endpoint, max_side=cloud_max_side, image_format=cloud_format.lower(), quality=cloud_quality
+      )
       print("[INFO] Cloud Vision initialized.")
     except Exception as e:
       print(f"[WARN] Cloud Vision unavailable: {e}")
@@ -56,68 +390,534 @@ def ocr(
   if not output_dir.exists():
     output_dir.mkdir(parents=True)
 
-  images = sorted(list(input_dir.glob("*.png")))
-  print(f"--- Processing {len(images)} pages ---")
+  try:
+    page_selection = parse_page_range(pages)
+  except ValueError as e:
+    print(f"Error: {e}")
+    raise typer.Exit(1)
 
-  full_text_buffer = []
+  if text_layer and input_path.is_dir():
+    print("[WARN] --text-layer needs a PDF input. Falling back to OCR for every page.")
 
-  for i, img in enumerate(images):
-    print(f"[{i+1}/{len(images)}] Reading {img.name}...", end=" ", flush=True)
-    
-    try:
-      # A. Local Text OCR
-      page_text = ocr_engine.process_image(img)
-      
-      md_path = output_dir / f"{img.stem}.md"
-      with open(md_path, "w", encoding="utf-8") as f:
-        f.write(f"\n\n{page_text}")
-      
-      full_text_buffer.append(f"\n\n\n{page_text}")
-      print("Done.")
+  # Single-pass mode asks the OCR generation for the diagram flag as well
+  ocr_prompt = OlmOCRProcessor.OCR_WITH_DIAGRAM_PROMPT if single_pass else OlmOCRProcessor.OCR_PROMPT
+  diagram_prompt = OlmOCRProcessor.OCR_WITH_DIAGRAM_PROMPT if single_pass else OlmOCRProcessor.DIAGRAM_PROMPT
+
+  # Quantized / downscaled runs produce different text, so they get their own cache entries
+  ocr_params = dict(OlmOCRProcessor.OCR_GENERATION)
+  if quantization:
+    ocr_params["quantization"] = quantization
+  if max_pixels:
+    ocr_params["max_pixels"] = max_pixels
+
+  # The detector band changes which pages count as diagrams
+  timing_params = {"figure_dpi": figure_dpi}
+  if detector:
+    timing_params["detector"] = [detector_low, detector_high]
+  if gemini_extractor:
+    timing_params["payload"] = gemini_extractor.payload_params
+
+  # A page finished under other settings (e.g. without timing extraction) is redone on --resume
+  run_settings = {
+    "ocr": {"model": OlmOCRProcessor.model_id, "prompt": hash_text(ocr_prompt), "params": ocr_params},
+    "text_layer": text_layer,
+    "extract_timing": extract_timing
+  }
+  if extract_timing:
+    run_settings["timing"] = {
+      "model": gemini_extractor.model_name, "prompt": hash_text(diagram_prompt + TIMING_PROMPT), "params": timing_params
+    }
+
+  store = ArtifactStore(output_dir)
+  progress = ProgressManifest(output_dir, settings=run_settings)
+
+  # Pages of this run (resumed pages included), for the progress summary
+  run_pages: List[str] = []
+
+  def skip_finished(page_id: str) -> bool:
+    if resume and progress.is_complete(page_id):
+      run_pages.append(page_id)
+      return True
+    # Being redone: incomplete until this run finishes it
+    progress.discard(page_id)
+    return False
+
+  decisions: List[dict] = []
+  sources = _iter_ocr_sources(
+    input_path, dpi, page_selection, save_images, text_layer, decisions, figure_dpi, adaptive_dpi, skip_finished
+  )
 
-      # B. Diagram Detection Logic
-      if extract_timing:
-        keywords = ["timing", "switching", "waveform", "figure"]
-        has_keyword = any(k in page_text.lower() for k in keywords)
+  def write_timing(page_id: str, context: dict, logic_data: dict):
+    # Runs on a Gemini worker thread as soon as the response arrives.
+    # A _timing.json marks the page as holding a diagram, so failures are not written
+    if "error" in logic_data:
+      return
+    if context["regions"]:
+      logic_data["figure_regions"] = context["regions"]
+    atomic_write_text(context["json_path"], json.dumps(logic_data, indent=2))
+
+  def record_timing(results: Iterable[Tuple[str, dict, dict]]):
+    for page_id, context, logic_data in results:
+      if "error" in logic_data:
+        # Left incomplete, so --resume retries it
+        print(f"      [X] {page_id}: Extraction failed: {logic_data['error']}")
+        continue
+      print(f"      [✓] {page_id}: Logic extracted: Mode='{logic_data.get('operating_mode', 'Unknown')}'")
+      store.record(
+        "timing", page_id, context["fingerprint"], context["inputs"], outputs=[context["json_path"]],
+        model=context["model"], prompt=context["prompt"], payload={"has_diagram": True}
+      )
+      progress.complete(page_id, timing=True)
+
+  timing_pool = None
+  if extract_timing:
+    timing_pool = TimingExtractionPool(gemini_extractor, concurrency=cloud_concurrency, on_result=write_timing)
+
+  print(f"--- Processing pages from {input_path.name} (batch size {batch_size}) ---")
+
+  # Several batches at a time: the engine splits them into size-sorted batches of batch_size
+  chunk_size = batch_size * OCR_SORT_WINDOW if batch_size > 1 else 1
+  for chunk in _chunked(sources, chunk_size):
+    # A. Local Text OCR
+    page_texts, diagram_flags = _ocr_chunk(
+      chunk, output_dir, store, get_ocr_engine, OlmOCRProcessor.model_id, ocr_prompt, ocr_params, single_pass
+    )
+
+    # B. Diagram Detection Logic, page by page in document order
+    finished = []
+    for source in chunk:
+      page_id, image, image_hash = source.page_id, source.image, source.content_hash
+      if page_id not in page_texts:
+        continue
+      page_text = page_texts[page_id]
+      run_pages.append(page_id)
+
+      # Text-layer pages have no figures by construction
+      if not extract_timing or image is None:
+        finished.append(page_id)
+        continue
+
+      try:
+        has_keyword = any(k in page_text.lower() for k in TIMING_KEYWORDS)
         
         if has_keyword:
-          print(f"      [?] Hints found. Verifying visual presence...", end=" ")
-          if ocr_engine.has_visual_diagram(img):
-            print("YES.")
-            print(f"      [⚡] Sending to Gemini for Context Extraction...")
-            try:
-              logic_data = gemini_extractor.analyze_diagram(img)
-              
-              json_path = output_dir / f"{img.stem}_timing.json"
-              with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(logic_data, f, indent=2)
-                
-              print(f"      [✓] Logic extracted: Mode='{logic_data.get('operating_mode', 'Unknown')}'")
-            except Exception as e:
-              print(f"      [X] Extraction failed: {e}")
+          json_path = output_dir / f"{page_id}_timing.json"
+          timing_model = f"{OlmOCRProcessor.model_id}+{gemini_extractor.model_name}"
+          timing_prompt = diagram_prompt + TIMING_PROMPT
+          timing_inputs = {"image": image_hash}
+          timing_fingerprint = store.fingerprint(
+            timing_inputs, model=timing_model, prompt=timing_prompt, params=timing_params
+          )
+
+          cached = store.reuse("timing", page_id, timing_fingerprint)
+          if cached:
+            verdict = "YES" if cached["payload"]["has_diagram"] else "NO"
+            print(f"      [=] {page_id}: Diagram check unchanged ({verdict}). Reusing.")
           else:
-            print("NO.")
+            has_diagram, vision_input, regions = _find_diagram(
+              source, diagram_flags.get(page_id), is_timing_diagram, figure_dpi
+            )
 
-    except Exception as e:
-      print(f"\nError processing {img.name}: {e}")
+            if has_diagram:
+              # Extraction runs in the background; OCR moves on to the next pages
+              timing_pool.submit(page_id, vision_input, context={
+                "json_path": json_path, "fingerprint": timing_fingerprint, "inputs": timing_inputs,
+                "model": timing_model, "prompt": timing_prompt, "regions": regions
+              })
+              print(f"      [⚡] Queued for Gemini context extraction ({timing_pool.in_flight} in flight).")
+              continue
+
+            store.record(
+              "timing", page_id, timing_fingerprint, timing_inputs,
+              model=timing_model, prompt=timing_prompt, payload={"has_diagram": False}
+            )
+        finished.append(page_id)
+
+      except Exception as e:
+        print(f"\nError processing {page_id}: {e}")
+
+    for page_id in finished:
+      progress.complete(page_id)
+    if timing_pool:
+      record_timing(timing_pool.ready())
+    store.save()
+    progress.save()
+
+  if timing_pool:
+    if timing_pool.in_flight:
+      print(f"[Cloud] Waiting for {timing_pool.in_flight} Gemini extractions...")
+    record_timing(timing_pool.drain())
+    timing_pool.close()
+    store.save()
+    progress.save()
+    print(gemini_extractor.transfer_summary())
+
+  page_ids = sorted(set(run_pages))
+  complete = sum(1 for page_id in page_ids if page_id in progress.pages)
+  if complete < len(page_ids):
+    print(f"[Progress] {complete}/{len(page_ids)} pages complete. Re-run with --resume to finish the rest.")
+  # Every page on disk, so a resumed or --pages run keeps the pages finished before
+  write_combined_markdown(output_dir)
+
+  if decisions:
+    atomic_write_text(output_dir / "_ocr_decisions.json", json.dumps(decisions, indent=2))
+    text_pages = sum(1 for d in decisions if d["path"] == "text")
+    print(f"[Text Layer] {text_pages}/{len(decisions)} pages extracted natively. Log: _ocr_decisions.json")
+
+  if detector and any(detector_counts.values()):
+    settled = detector_counts["yes"] + detector_counts["no"]
+    print(f"[Detector] {settled}/{settled + detector_counts['ambiguous']} diagram checks settled without the VLM "
+          f"({detector_counts['yes']} yes, {detector_counts['no']} no).")
 
-  full_path = output_dir / "_full_datasheet.md"
-  with open(full_path, "w", encoding="utf-8") as f:
-    f.write("\n".join(full_text_buffer))
   print(f"\n--- Complete! Output in {output_dir} ---")
+  print(store.summary())
+
+@app.command()
+def ocr_worker(
+  host: str = typer.Option("127.0.0.1", "--host", help="Bind address (keep it local)."),
+  port: int = typer.Option(8765, "--port", "-p"),
+  batch_size: int = typer.Option(1, "--batch-size", "-b", min=1, help="Default pages per OCR forward pass."),
+  device: Optional[str] = typer.Option(None, "--device", help="cuda or cpu (default: auto)."),
+  quantization: Optional[str] = typer.Option(None, "--quantization", "-q", help="int8 or 4bit weight quantization."),
+  threads: Optional[int] = typer.Option(None, "--threads", help="CPU threads (CPU mode)."),
+  max_pixels: Optional[int] = typer.Option(None, "--max-pixels", help="Vision input pixel cap.")
+):
+  """Load OlmOCR once and serve it locally, so 'ocr' runs skip the model load."""
+  try:
+    from ocr_engine import OlmOCRProcessor, OCRWorkerServer
+  except ImportError as e:
+    print(f"Error: Missing ML dependencies. {e}")
+    raise typer.Exit(1)
+
+  engine = OlmOCRProcessor(
+    batch_size=batch_size, device=device, quantization=quantization, num_threads=threads, max_pixels=max_pixels
+  )
+  server = OCRWorkerServer(engine, host=host, port=port)
+  print(f"--- OCR worker listening on {server.url} (Ctrl+C to stop) ---")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    print("\n--- OCR worker stopped ---")
+
+@app.command()
+def ocr_compare(
+  input_dir: Path = typer.Option(..., "--input", "-i", exists=True, file_okay=False, help="Folder of page images."),
+  reference_dir: Path = typer.Option(..., "--reference", "-r", exists=True, file_okay=False, help="Markdown from the current bf16 path."),
+  modes: str = typer.Option("none,int8", "--modes", help="Comma list of quantization modes: none, int8, 4bit."),
+  device: Optional[str] = typer.Option(None, "--device", help="cuda or cpu (default: auto)."),
+  threads: Optional[int] = typer.Option(None, "--threads", help="CPU threads."),
+  max_pixels: Optional[int] = typer.Option(None, "--max-pixels", help="Vision input pixel cap."),
+  pages: Optional[str] = typer.Option(None, "--pages", help="1-based page selection, e.g. '5-7,19-24'."),
+  report: Path = typer.Option(Path("ocr_compare.json"), "--report", help="Where to write the JSON report.")
+):
+  """
+  Compare OCR accuracy and throughput across execution modes (e.g. bf16 vs CPU int8).
+  Needs the model weights and a machine that can hold them; the report records the
+  machine, so results from different hosts are not compared by mistake.
+  """
+  try:
+    import gc
+    import platform
+    import torch
+    from ocr_engine import OlmOCRProcessor
+    from ocr_engine.evaluation import evaluate_ocr
+    page_selection = parse_page_range(pages)
+  except (ImportError, ValueError) as e:
+    print(f"Error: {e}")
+    raise typer.Exit(1)
+
+  images = _list_page_images(input_dir)
+  if page_selection:
+    images = [img for img in images if int(img.stem.split("_")[-1]) in page_selection]
+  print(f"--- Comparing {modes} on {len(images)} pages ---")
+
+  results = {}
+  for mode in [m.strip() for m in modes.split(",") if m.strip()]:
+    quantization = None if mode == "none" else mode
+    print(f"\n[{mode}] Loading model...")
+    load_start = time.perf_counter()
+    engine = OlmOCRProcessor(device=device, quantization=quantization, num_threads=threads, max_pixels=max_pixels)
+    load_seconds = time.perf_counter() - load_start
+
+    result = evaluate_ocr(engine, images, reference_dir)
+    result["load_seconds"] = round(load_seconds, 2)
+    result["memory"] = engine.memory_report()
+    result["device"] = engine.device
+    results[mode] = result
+
+    for page in result["pages"]:
+      similarity = f"{page['similarity']:.3f}" if page["similarity"] is not None else "n/a"
+      print(f"   {page['page_id']}: {page['seconds']:>8.2f}s  similarity {similarity}")
+
+    # Free the weights before loading the next mode
+    del engine
+    gc.collect()
+
+  print("\n--- Summary ---")
+  print(f"{'mode':<8} {'load s':>8} {'s/page':>8} {'similarity':>11}  memory")
+  for mode, result in results.items():
+    similarity = f"{result['mean_similarity']:.4f}" if result["mean_similarity"] is not None else "n/a"
+    print(f"{mode:<8} {result['load_seconds']:>8.1f} {result['seconds_per_page']:>8.1f} {similarity:>11}  {result['memory']}")
+
+  # Timings only compare on the same machine, so the report says which one
+  environment = {
+    "platform": platform.platform(), "processor": platform.processor(), "torch": torch.__version__,
+    "threads": torch.get_num_threads(),
+    "gpu": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+  }
+  with open(report, "w", encoding="utf-8") as f:
+    json.dump({"environment": environment, "pages": [img.stem for img in images], "modes": results}, f, indent=2)
+  print(f"\nReport saved to {report}")
+
+@app.command()
+def calibrate_detector(
+  images_dir: Path = typer.Option(..., "--images", "-i", exists=True, file_okay=False, help="Folder of page images."),
+  labels_dir: Path = typer.Option(..., "--labels", "-l", exists=True, file_okay=False, help="OCR output folder; pages with a _timing.json count as diagrams."),
+  low: float = typer.Option(0.3, "--low", help="Candidate 'no diagram' threshold."),
+  high: float = typer.Option(0.6, "--high", help="Candidate 'diagram' threshold."),
+  not_diagram: List[str] = typer.Option([], "--not-diagram", help="Page id to label as no diagram despite its _timing.json (e.g. a timing table Gemini read parameters from). Repeatable."),
+  report: Path = typer.Option(Path("detector_calibration.json"), "--report", help="Where to write the JSON report.")
+):
+  """Score labelled pages with the classical diagram detector and suggest --detector-low/--detector-high."""
+  try:
+    from ocr_engine.diagram_detect import calibrate
+  except ImportError as e:
+    print(f"Error: {e}")
+    raise typer.Exit(1)
+
+  images = _list_page_images(images_dir)
+  if not images:
+    print(f"Error: no page images in {images_dir}")
+    raise typer.Exit(1)
+
+  # Existing Gemini extractions are the ground truth
+  labels = [(labels_dir / f"{img.stem}_timing.json").exists() and img.stem not in not_diagram for img in images]
+  print(f"--- Calibrating on {len(images)} pages ({sum(labels)} with timing diagrams) ---")
+
+  result = calibrate(images, labels, low=low, high=high)
+  result["relabelled"] = sorted(not_diagram)
+  for page in result["pages"]:
+    marker = "D" if page["label"] else " "
+    print(f"   {marker} {page['page_id']}: score {page['score']:.3f}  steps {page['steps']:>4}  "
+          f"long runs {page['long_runs']:>4}  -> {page['verdict']}")
+
+  print(f"\nSettled without VLM: {result['settled_without_vlm']}/{len(images)}  "
+        f"errors: {len(result['errors'])}  mean {result['mean_millis']} ms/page")
+  print(f"Suggested band: --detector-low {result['suggested_low']} --detector-high {result['suggested_high']}")
+
+  with open(report, "w", encoding="utf-8") as f:
+    json.dump(result, f, indent=2)
+  print(f"Report saved to {report}")
+
+class _PendingClassification(NamedTuple):
+  path: Path
+  inputs: dict
+  fingerprint: str
+  content: str  # Markdown with the Gemini timing metadata injected
+  note: str  # Printed with the result
+
+def _prepare_classification(
+  f: Path, timing_json_path: Path, classifier: Any, store: ArtifactStore, force: bool = False
+) -> Tuple[Any, Optional[_PendingClassification]]:
+  """
+  Returns (cached analysis, None) for an unchanged page, else (None, pending)
+  with the content to classify, injecting the Gemini timing metadata when a
+  _timing.json exists.
+  """
+  from rtl_context import PageAnalysis
+
+  classify_inputs = {
+    "markdown": hash_file(f),
+    "timing": hash_file(timing_json_path) if timing_json_path.exists() else None
+  }
+  classify_fingerprint = store.fingerprint(
+    classify_inputs, model=classifier.model_name, prompt=classifier.system_prompt, params=classifier.prompt_params
+  )
+
+  cached = None if force else store.reuse("classify", f.stem, classify_fingerprint)
+  if cached:
+    return PageAnalysis(**cached["payload"]), None
+
+  with open(f, "r", encoding="utf-8") as file_handle:
+    content = file_handle.read()
+
+  context_injection = ""
+  note = ""
+  if timing_json_path.exists():
+    try:
+      with open(timing_json_path, "r") as jf:
+        data = json.load(jf)
+      mode = data.get("operating_mode", "Unknown Mode")
+      clock = data.get("clock_domain", {}).get("signal", "Unknown Clock")
+      
+      context_injection = (
+        f"\n[METADATA FROM GEMINI VISION]\n"
+        f"Verified Operating Mode: {mode}\n"
+        f"Clock Signal: {clock}\n"
+        f"Contains Timing Diagram: YES\n"
+        f"----------------------------------------\n"
+      )
+      note = f"[+JSON Mode: {mode}] "
+    except Exception as e:
+      note = f"[JSON Error: {e}] "
+
+  return None, _PendingClassification(f, classify_inputs, classify_fingerprint, context_injection + content, note)
+
+def _record_classification(pending: _PendingClassification, analysis: Any, classifier: Any, store: ArtifactStore):
+  # Failed classifications are not cached so they are retried next run
+  if analysis.summary != "Classification Failed":
+    store.record(
+      "classify", pending.path.stem, pending.fingerprint, pending.inputs,
+      model=classifier.model_name, prompt=classifier.system_prompt, payload=analysis.model_dump(mode="json")
+    )
+    store.save()
+
+def _classify_page(f: Path, timing_json_path: Path, classifier: Any, store: ArtifactStore, force: bool = False):
+  """Classifies one page's markdown. Unchanged pages come from the artifact store."""
+  cached, pending = _prepare_classification(f, timing_json_path, classifier, store, force)
+  if cached:
+    print(f"Classifying {f.name}... [CACHED] [{cached.page_type.value.upper()}] Score: {cached.relevance_score}")
+    return cached
+
+  analysis = classifier.analyze_page(f.stem, pending.content)
+  print(f"Classifying {f.name}... {pending.note}[{analysis.page_type.value.upper()}] Score: {analysis.relevance_score}")
+  _record_classification(pending, analysis, classifier, store)
+  return analysis
+
+def _classify_pages(
+  files: List[Path], input_dir: Path, classifier: Any, store: ArtifactStore, force: bool = False, parallel: int = 4,
+  prefilter: Any = None
+) -> list:
+  """
+  Classifies pages with up to `parallel` Ollama requests in flight, recording
+  each as it finishes. A pre-filter settles clear-cut pages first (those are
+  not cached; they are instant). Returns the analyses in page order.
+  """
+  analyses: List[Any] = [None] * len(files)
+  pending: List[Tuple[int, _PendingClassification]] = []
+  for index, f in enumerate(files):
+    cached, request = _prepare_classification(f, input_dir / f"{f.stem}_timing.json", classifier, store, force)
+    if cached:
+      analyses[index] = cached
+    else:
+      pending.append((index, request))
+
+  if prefilter and pending:
+    decisions = prefilter.triage([(request.path.stem, request.content) for _, request in pending])
+    uncertain = []
+    for (index, request), decision in zip(pending, decisions):
+      if decision is None:
+        uncertain.append((index, request))
+      else:
+        analyses[index] = decision
+    settled = len(pending) - len(uncertain)
+    relevant = sum(1 for decision in decisions if decision and decision.relevance_score >= 4)
+    print(f"[Pre-filter] {relevant} relevant, {settled - relevant} irrelevant settled without the LLM")
+    pending = uncertain
+
+  print(f"[Classify] {len(files) - len(pending)} cached, {len(pending)} to classify ({parallel} in parallel)")
+  start_time = time.perf_counter()
+  results = classifier.analyze_pages(
+    [(request.path.stem, request.content) for _, request in pending], max_concurrency=parallel
+  )
+  for done, (position, analysis) in enumerate(results, start=1):
+    index, request = pending[position]
+    analyses[index] = analysis
+    _record_classification(request, analysis, classifier, store)
+
+    rate = done / (time.perf_counter() - start_time)
+    print(
+      f"   [{done}/{len(pending)}] {request.path.name}: {request.note}[{analysis.page_type.value.upper()}] "
+      f"Score: {analysis.relevance_score}  ({rate:.2f} pages/s)"
+    )
+
+  if pending:
+    elapsed = time.perf_counter() - start_time
+    print(f"[Classify] {len(pending)} pages in {elapsed:.1f}s ({len(pending) / elapsed:.2f} pages/s)")
+  return analyses
+
+def _patch_tree(flat_manifest: list, tree_path: Path, snapshot_path: Path, builder: Any, max_changed: float = 0.5):
+  """The existing tree patched for the new manifest, or None when a full build is the better option."""
+  from rtl_context import KnowledgeNode
+  from rtl_context.tree_patch import diff_manifests
+
+  if not (tree_path.exists() and snapshot_path.exists()):
+    return None
+  try:
+    with open(snapshot_path, "r", encoding="utf-8") as f:
+      previous_manifest = json.load(f)
+    with open(tree_path, "r", encoding="utf-8") as f:
+      tree = KnowledgeNode(**json.load(f))
+  except Exception as e:
+    print(f"-> Cannot patch the existing tree ({e}); rebuilding.")
+    return None
+
+  diff = diff_manifests(previous_manifest, flat_manifest)
+  touched = len(diff.added) + len(diff.changed) + len(diff.removed)
+  if touched > max_changed * max(len(flat_manifest), 1):
+    print(f"-> Manifest changed too much to patch ({diff.summary()}); rebuilding.")
+    return None
+
+  print(f"-> 🌳 Patching tree: {diff.summary()}")
+  tree, _ = builder.patch_tree(tree, previous_manifest, flat_manifest)
+  if tree is None:
+    print("-> Could not place every page in the existing tree; rebuilding.")
+  return tree
+
+def _build_tree(
+  flat_manifest: list, output_dir: Path, builder: Any, store: ArtifactStore, incremental: bool = True
+) -> Optional[Path]:
+  """
+  Builds rtl_knowledge_tree.json unless the manifest is unchanged since the
+  last build. A modest change patches the existing tree (keeping node ids)
+  instead of rebuilding it; the manifest each tree reflects is kept next to it.
+  """
+  tree_path = output_dir / "rtl_knowledge_tree.json"
+  snapshot_path = output_dir / "rtl_knowledge_tree.manifest.json"
+
+  tree_inputs = {"manifest": hash_json(flat_manifest)}
+  tree_fingerprint = store.fingerprint(
+    tree_inputs, model=builder.model_name, prompt=builder.system_prompt, params=builder.build_params(flat_manifest)
+  )
+
+  if store.reuse("tree", "root", tree_fingerprint):
+    print(f"-> 🌳 Manifest unchanged. Keeping {tree_path.name}")
+  else:
+    tree = _patch_tree(flat_manifest, tree_path, snapshot_path, builder) if incremental else None
+    if tree is None:
+      tree = builder.build_tree(flat_manifest, device_name=output_dir.name.removesuffix("_context").upper())
+    
+    if tree:
+      atomic_write_text(tree_path, tree.model_dump_json(indent=2))
+      atomic_write_text(snapshot_path, json.dumps(flat_manifest, indent=2))
+      store.record(
+        "tree", "root", tree_fingerprint, tree_inputs, outputs=[tree_path],
+        model=builder.model_name, prompt=builder.system_prompt
+      )
+      print(f"-> 🌳 Hierarchy built and saved to {tree_path.name}")
+    else:
+      print("-> Failed to build tree structure (Check API Key).")
+  return tree_path if tree_path.exists() else None
 
 @app.command()
 def build_context(
   input_dir: Path = typer.Option(..., "--input-dir", "-i", exists=True),
   output_dir: Path = typer.Option(..., "--output-dir", "-o", help="Folder to save contexts."),
-  force: bool = typer.Option(False, "--force", "-f", help="Force re-classification even if cached.")
+  force: bool = typer.Option(False, "--force", "-f", help="Force re-classification even if cached."),
+  parallel: int = typer.Option(4, "--parallel", "-p", min=1, help="Classification requests in flight (set OLLAMA_NUM_PARALLEL to match)."),
+  prefilter: bool = typer.Option(True, "--prefilter/--no-prefilter", help="Settle clear-cut pages with a lexical scorer before the LLM."),
+  prefilter_low: float = typer.Option(0.1, "--prefilter-low", help="Pages scoring at or below this are irrelevant."),
+  prefilter_high: Optional[float] = typer.Option(None, "--prefilter-high", help="Also settle pages scoring at or above this as relevant, with regex types and summaries (default: they go to the LLM)."),
+  digest_budget: int = typer.Option(0, "--digest-budget", min=0, help="Send pages as ~N-token digests instead of the first 12,000 characters (0 = off; see 'digest-report')."),
+  tree_chunk: int = typer.Option(60, "--tree-chunk", min=1, help="Manifests above this many pages build the tree section by section."),
+  tree_workers: int = typer.Option(4, "--tree-workers", min=1, help="Sections built concurrently."),
+  rebuild_tree: bool = typer.Option(False, "--rebuild-tree", help="Build the tree from scratch instead of patching the existing one.")
 ):
   """
   Analyze pages using both Markdown text AND Gemini Timing Logic (if available).
   """
   try:
-    from rtl_context import PageClassifier, KnowledgeTreeBuilder
-    import json
+    from rtl_context import PageClassifier, KnowledgeTreeBuilder, LexicalPrefilter
   except ImportError as e:
     print(f"Error: {e}")
     raise typer.Exit(1)
@@ -128,8 +928,10 @@ def build_context(
   # --- Phase 1: Classification (Local Qwen) ---
   flat_path = output_dir / "rtl_context_flat.json"
   flat_manifest = []
+  store = ArtifactStore(output_dir)
 
-  if flat_path.exists() and not force:
+  if flat_path.exists() and not force and not store.has_stage("classify"):
+    # Context built before the artifact store existed: keep the old all-or-nothing cache
     print(f"--- Phase 1: Page Classification (Skipped) ---")
     print(f"[Cache] Found existing context at {flat_path.name}. Loading...")
     with open(flat_path, "r", encoding="utf-8") as f:
@@ -137,46 +939,19 @@ def build_context(
     print(f"Loaded {len(flat_manifest)} pages from cache.")
   else:
     print("--- Phase 1: Page Classification (Ollama) ---")
-    classifier = PageClassifier(model_name="qwen3:14b")
+    classifier = PageClassifier(model_name="qwen3:14b", digest_budget=digest_budget or None)
     
     files = sorted(list(input_dir.glob("*.md")))
     files = [f for f in files if not f.name.startswith("_")]
     
     print(f"Analyzing {len(files)} pages...")
     
-    for f in files:
-      print(f"Classifying {f.name}...", end=" ", flush=True)
-      
-      with open(f, "r", encoding="utf-8") as file_handle:
-        content = file_handle.read()
-        
-      # Context Injection
-      timing_json_path = input_dir / f"{f.stem}_timing.json"
-      
-      context_injection = ""
-      if timing_json_path.exists():
-        try:
-          with open(timing_json_path, "r") as jf:
-            data = json.load(jf)
-          mode = data.get("operating_mode", "Unknown Mode")
-          clock = data.get("clock_domain", {}).get("signal", "Unknown Clock")
-          
-          context_injection = (
-            f"\n[METADATA FROM GEMINI VISION]\n"
-            f"Verified Operating Mode: {mode}\n"
-            f"Clock Signal: {clock}\n"
-            f"Contains Timing Diagram: YES\n"
-            f"----------------------------------------\n"
-          )
-          print(f"[+JSON Mode: {mode}]", end=" ")
-        except Exception as e:
-          print(f"[JSON Error: {e}]", end=" ")
-
-      full_analysis_content = context_injection + content
-      
-      analysis = classifier.analyze_page(f.stem, full_analysis_content)
-      print(f"[{analysis.page_type.value.upper()}] Score: {analysis.relevance_score}")
-      
+    try:
+      page_filter = LexicalPrefilter(prefilter_low, prefilter_high) if prefilter else None
+    except ValueError as e:
+      print(f"Error: {e}")
+      raise typer.Exit(1)
+    for analysis in _classify_pages(files, input_dir, classifier, store, force, parallel, page_filter):
       if analysis.relevance_score >= 4:
         flat_manifest.append(analysis.model_dump())
 
@@ -187,21 +962,139 @@ def build_context(
   # --- Phase 2: Tree Construction (Cloud Gemini) ---
   if flat_manifest:
     print("\n--- Phase 2: Knowledge Tree Construction (GROVE) ---")
-    builder = KnowledgeTreeBuilder(model_name="gemini-2.5-flash")
-    tree = builder.build_tree(flat_manifest)
-    
-    if tree:
-      tree_path = output_dir / "rtl_knowledge_tree.json"
-      with open(tree_path, "w", encoding="utf-8") as f:
-        f.write(tree.model_dump_json(indent=2))
-      print(f"-> 🌳 Hierarchy built and saved to {tree_path.name}")
-    else:
-      print("-> Failed to build tree structure (Check API Key).")
+    builder = KnowledgeTreeBuilder(model_name="gemini-2.5-flash", max_pages_per_call=tree_chunk, workers=tree_workers)
+    _build_tree(flat_manifest, output_dir, builder, store, incremental=not rebuild_tree)
   else:
     print("-> No relevant pages found.")
 
+  store.save()
+  print(store.summary())
   print("\n--- Context Build Complete ---")
 
+@app.command()
+def prefilter_report(
+  md_dir: Path = typer.Option(..., "--md-dir", "-i", exists=True, file_okay=False, help="Folder of page_*.md files."),
+  flat: Path = typer.Option(..., "--flat", exists=True, dir_okay=False, help="rtl_context_flat.json from an LLM-only run (the reference)."),
+  low: float = typer.Option(0.1, "--low"),
+  high: Optional[float] = typer.Option(None, "--high", help="Also score auto-relevant labelling at this threshold (e.g. 0.85)."),
+  report: Optional[Path] = typer.Option(None, "--report", help="Save the results as JSON.")
+):
+  """
+  Precision/recall of the lexical pre-filter against an existing flat manifest,
+  and the share of LLM classifications it would save. The weights were tuned on
+  the AD7980 fixture, so results on that fixture are in-sample.
+  """
+  from rtl_context import LexicalPrefilter, prefilter_report as score_prefilter
+
+  try:
+    page_filter = LexicalPrefilter(low, high)
+  except ValueError as e:
+    print(f"Error: {e}")
+    raise typer.Exit(1)
+
+  pages = []
+  for f in sorted(md_dir.glob("*.md")):
+    if not f.name.startswith("_"):
+      pages.append((f.stem, f.read_text(encoding="utf-8")))
+  with open(flat, "r", encoding="utf-8") as f:
+    flat_manifest = json.load(f)
+
+  result = score_prefilter(page_filter, pages, flat_manifest)
+  for row in result["per_page"]:
+    mistake = row["verdict"] != "llm" and (row["verdict"] == "relevant") != row["relevant"]
+    print(
+      f"   {row['page_id']}: p={row['probability']:.2f} -> {row['verdict'].upper():<10} "
+      f"(reference: {'relevant' if row['relevant'] else 'irrelevant'}){'  <- WRONG' if mistake else ''}"
+      + (f" [type {row['page_type']} vs {row['reference_type']}]" if "reference_type" in row else "")
+    )
+  print(
+    f"\n{result['pages']} pages, {result['relevant_pages']} relevant. LLM calls saved: {result['llm_calls_saved']}\n"
+    f"Relevant precision: {result['relevant_precision']}  Irrelevant precision: {result['irrelevant_precision']}  "
+    f"Recall: {result['recall']}  Type agreement: {result['type_agreement']}"
+  )
+  if result["wrongly_dropped"]:
+    print(f"[WARN] Relevant pages dropped: {', '.join(result['wrongly_dropped'])}")
+  if result["wrongly_typed"]:
+    print(f"[WARN] Auto-relevant pages typed differently from the reference: {', '.join(result['wrongly_typed'])}")
+
+  if report:
+    with open(report, "w", encoding="utf-8") as f:
+      json.dump(result, f, indent=2)
+    print(f"Report saved to {report}")
+
+@app.command()
+def digest_report(
+  md_dir: Path = typer.Option(..., "--md-dir", "-i", exists=True, file_okay=False, help="Folder of page_*.md files."),
+  budget: int = typer.Option(1000, "--budget", min=50, help="Digest size in approximate tokens."),
+  classify: bool = typer.Option(False, "--classify", help="Also classify every page both ways (Ollama) and report agreement."),
+  parallel: int = typer.Option(4, "--parallel", "-p", min=1),
+  report: Optional[Path] = typer.Option(None, "--report", help="Save the results as JSON.")
+):
+  """
+  Prompt size of page digests versus the current 12,000-character cut, and
+  optionally how often both prompts lead to the same classification.
+  """
+  from rtl_context.digest import build_digest, estimate_tokens
+
+  pages = []
+  for f in sorted(md_dir.glob("*.md")):
+    if not f.name.startswith("_"):
+      pages.append((f.stem, f.read_text(encoding="utf-8")))
+  if not pages:
+    print(f"Error: no pages in {md_dir}")
+    raise typer.Exit(1)
+
+  rows = []
+  for page_id, content in pages:
+    raw_tokens = estimate_tokens(content[:12000])
+    digest_tokens = estimate_tokens(build_digest(content, budget))
+    rows.append({"page_id": page_id, "raw_tokens": raw_tokens, "digest_tokens": digest_tokens})
+    print(f"   {page_id}: ~{raw_tokens:>5} -> ~{digest_tokens:>5} tokens")
+
+  raw_total = sum(row["raw_tokens"] for row in rows)
+  digest_total = sum(row["digest_tokens"] for row in rows)
+  result: Dict[str, Any] = {
+    "budget": budget, "pages": len(rows), "raw_tokens": raw_total, "digest_tokens": digest_total,
+    "reduction": round(1 - digest_total / raw_total, 3) if raw_total else None, "per_page": rows
+  }
+  print(f"\nPrompt content: ~{raw_total} -> ~{digest_total} tokens ({result['reduction']:.0%} smaller, chars/4 estimate)")
+
+  if classify:
+    from rtl_context import PageClassifier
+
+    analyses = {}
+    for label, classifier in (
+      ("current", PageClassifier(model_name="qwen3:14b")),
+      ("digest", PageClassifier(model_name="qwen3:14b", digest_budget=budget))
+    ):
+      print(f"[Classify] {label} prompts...")
+      start_time = time.perf_counter()
+      analyses[label] = [None] * len(pages)
+      for index, analysis in classifier.analyze_pages(pages, max_concurrency=parallel):
+        analyses[label][index] = analysis
+      result[f"{label}_seconds"] = round(time.perf_counter() - start_time, 1)
+
+    disagreements = []
+    for row, current, digest in zip(rows, analyses["current"], analyses["digest"]):
+      row.update(current_type=current.page_type.value, current_score=current.relevance_score,
+                 digest_type=digest.page_type.value, digest_score=digest.relevance_score)
+      if (current.relevance_score >= 4) != (digest.relevance_score >= 4):
+        disagreements.append(row["page_id"])
+    result["type_agreement"] = round(sum(row["current_type"] == row["digest_type"] for row in rows) / len(rows), 3)
+    result["relevance_agreement"] = round(1 - len(disagreements) / len(rows), 3)
+    result["relevance_disagreements"] = disagreements
+    print(
+      f"Page type agreement: {result['type_agreement']:.0%}  Relevant/irrelevant agreement: {result['relevance_agreement']:.0%}  "
+      f"({result['current_seconds']}s current vs {result['digest_seconds']}s digest)"
+    )
+    if disagreements:
+      print(f"[WARN] Relevance flips: {', '.join(disagreements)}")
+
+  if report:
+    with open(report, "w", encoding="utf-8") as f:
+      json.dump(result, f, indent=2)
+    print(f"Report saved to {report}")
+
 @app.command()
 def list_options(
   context_dir: Path = typer.Option(..., "--context-dir", "-c", exists=True, help="Path to context folder.")
@@ -301,5 +1194,457 @@ def generate(
     traceback.print_exc()
     raise typer.Exit(1)
 
+class _Document(NamedTuple):
+  """One datasheet in 'run' / 'batch', with its <name>_images/_md/_context layout."""
+  pdf: Path
+  images_dir: Path
+  md_dir: Path
+  context_dir: Path
+  md_store: ArtifactStore
+  context_store: ArtifactStore
+
+def _open_document(pdf: Path, root: Path) -> _Document:
+  md_dir = root / f"{pdf.stem}_md"
+  context_dir = root / f"{pdf.stem}_context"
+  md_dir.mkdir(parents=True, exist_ok=True)
+  context_dir.mkdir(parents=True, exist_ok=True)
+  return _Document(
+    pdf, root / f"{pdf.stem}_images", md_dir, context_dir, ArtifactStore(md_dir), ArtifactStore(context_dir)
+  )
+
+class _RunOptions(NamedTuple):
+  pages: Optional[List[int]] = None
+  dpi: int = 150
+  adaptive_dpi: bool = False
+  text_layer: bool = False
+  figure_dpi: int = 200
+  extract_timing: bool = True
+  detector: bool = False
+  detector_low: float = 0.3
+  detector_high: float = 0.6
+  batch_size: int = 1
+  device: Optional[str] = None
+  quantization: Optional[str] = None
+  worker_url: Optional[str] = None
+  use_worker: bool = True
+  timing_workers: int = 4
+  classify_workers: int = 1
+  queue_size: int = 4
+
+class _Engines(NamedTuple):
+  """Models for _stream_documents, given explicitly (e.g. the benchmark's stubs) instead of loaded."""
+  ocr: Any
+  timing: Any  # None skips timing extraction
+  classifier: Any
+  builder: Any  # None skips tree building
+
+def _stream_documents(
+  documents: List[_Document], options: _RunOptions, engines: Optional[_Engines] = None
+) -> Dict[Path, Optional[Path]]:
+  """
+  Streams every page of every document through one OCR -> timing -> classify
+  pipeline, with each model loaded once and shared by all documents, then
+  builds each document's tree. Returns {pdf: tree path or None}.
+  """
+  from ocr_engine import (
+    OlmOCRProcessor, GeminiTimingExtractor, TIMING_PROMPT, connect_worker, DEFAULT_WORKER_URL, score_timing_diagram
+  )
+  from rtl_context import PageClassifier, KnowledgeTreeBuilder
+  from pipeline.runner import StreamingPipeline, Stage
+
+  # --- Engines: created once here and shared by the stage workers ---
+  engine_lock = threading.Lock()
+
+  quantization = options.quantization
+  worker = None
+  if not engines and options.use_worker:
+    worker = _connect_matching_worker(
+      connect_worker, options.worker_url or DEFAULT_WORKER_URL,
+      {"device": options.device, "quantization": options.quantization}
+    )
+  if worker:
+    quantization = worker.info.get("quantization")
+
+  @functools.cache
+  def get_ocr_engine():
+    if engines:
+      return engines.ocr
+    if worker:
+      return worker
+    return OlmOCRProcessor(batch_size=options.batch_size, device=options.device, quantization=options.quantization)
+
+  gemini_extractor = None
+  if engines:
+    gemini_extractor = engines.timing if options.extract_timing else None
+    classifier, builder = engines.classifier, engines.builder
+  else:
+    if options.extract_timing:
+      try:
+        gemini_extractor = GeminiTimingExtractor()
+      except Exception as e:
+        print(f"[WARN] Cloud Vision unavailable: {e}")
+
+    classifier = PageClassifier(model_name="qwen3:14b")
+    try:
+      builder = KnowledgeTreeBuilder(model_name="gemini-2.5-flash")
+    except ValueError as e:
+      print(f"[WARN] Tree building disabled: {e}")
+      builder = None
+
+  # Same prompts and parameters as 'ocr' defaults, so both share cache entries
+  ocr_prompt = OlmOCRProcessor.OCR_PROMPT
+  ocr_params = dict(OlmOCRProcessor.OCR_GENERATION)
+  if quantization:
+    ocr_params["quantization"] = quantization
+  if worker and worker.info.get("max_pixels"):
+    ocr_params["max_pixels"] = worker.info["max_pixels"]
+  if gemini_extractor:
+    timing_model = f"{OlmOCRProcessor.model_id}+{gemini_extractor.model_name}"
+    timing_prompt = OlmOCRProcessor.DIAGRAM_PROMPT + TIMING_PROMPT
+    # The detector band changes which pages count as diagrams
+    timing_params = {"figure_dpi": options.figure_dpi}
+    if options.detector:
+      timing_params["detector"] = [options.detector_low, options.detector_high]
+    timing_params["payload"] = gemini_extractor.payload_params
+
+  # --- Stages: items are (document, page) pairs ---
+  def sources():
+    for doc in documents:
+      for source in _iter_ocr_sources(
+        doc.pdf, options.dpi, options.pages, doc.images_dir, options.text_layer,
+        figure_dpi=options.figure_dpi, adaptive_dpi=options.adaptive_dpi
+      ):
+        yield doc, source
+
+  def ocr_stage(batch: List[Tuple[_Document, _PageSource]]) -> List[tuple]:
+    outputs = []
+    # A batch may straddle two documents; each keeps its own folder and store
+    for doc, group in itertools.groupby(batch, key=lambda item: item[0]):
+      chunk = [source for _, source in group]
+      # One model, so OCR batches and VLM diagram checks take turns
+      with engine_lock:
+        page_texts, diagram_flags = _ocr_chunk(
+          chunk, doc.md_dir, doc.md_store, get_ocr_engine, OlmOCRProcessor.model_id, ocr_prompt, ocr_params
+        )
+      doc.md_store.save()
+      outputs.extend(
+        (doc, source, page_texts[source.page_id], diagram_flags.get(source.page_id))
+        for source in chunk if source.page_id in page_texts
+      )
+    return outputs
+
+  def is_timing_diagram(candidate, dpi: Optional[int] = None) -> bool:
+    if options.detector:
+      verdict = score_timing_diagram(candidate, dpi).verdict(options.detector_low, options.detector_high)
+      if verdict != "ambiguous":
+        return verdict == "yes"
+    with engine_lock:
+      return get_ocr_engine().has_visual_diagram(candidate)
+
+  def timing_stage(item: tuple) -> Tuple[_Document, Path]:
+    doc, source, page_text, flag = item
+    md_path = doc.md_dir / f"{source.page_id}.md"
+    if not gemini_extractor or source.image is None or not any(k in page_text.lower() for k in TIMING_KEYWORDS):
+      return doc, md_path
+
+    json_path = doc.md_dir / f"{source.page_id}_timing.json"
+    timing_inputs = {"image": source.content_hash}
+    timing_fingerprint = doc.md_store.fingerprint(
+      timing_inputs, model=timing_model, prompt=timing_prompt, params=timing_params
+    )
+    try:
+      if not doc.md_store.reuse("timing", source.page_id, timing_fingerprint):
+        has_diagram, vision_input, regions = _find_diagram(source, flag, is_timing_diagram, options.figure_dpi)
+        if has_diagram:
+          logic_data = gemini_extractor.analyze_diagram(vision_input)
+          if regions:
+            logic_data["figure_regions"] = regions
+          # A _timing.json marks the page as holding a diagram, so only successes are written
+          if "error" not in logic_data:
+            atomic_write_text(json_path, json.dumps(logic_data, indent=2))
+            doc.md_store.record(
+              "timing", source.page_id, timing_fingerprint, timing_inputs, outputs=[json_path],
+              model=timing_model, prompt=timing_prompt, payload={"has_diagram": True}
+            )
+        else:
+          doc.md_store.record(
+            "timing", source.page_id, timing_fingerprint, timing_inputs,
+            model=timing_model, prompt=timing_prompt, payload={"has_diagram": False}
+          )
+        doc.md_store.save()
+    except Exception as e:
+      # The page is still classified from its text; the diagram is retried next run
+      print(f"\n[WARN] {doc.pdf.stem}/{source.page_id}: timing extraction failed: {e}")
+    return doc, md_path
+
+  def classify_stage(item: Tuple[_Document, Path]):
+    doc, md_path = item
+    return doc, _classify_page(md_path, doc.md_dir / f"{md_path.stem}_timing.json", classifier, doc.context_store)
+
+  pipeline = StreamingPipeline([
+    Stage("ocr", ocr_stage, workers=1, queue_size=options.queue_size, batch_size=options.batch_size, batched=True),
+    Stage("timing", timing_stage, workers=options.timing_workers, queue_size=options.queue_size),
+    Stage("classify", classify_stage, workers=options.classify_workers, queue_size=options.queue_size)
+  ])
+
+  results = pipeline.run(sources())
+  print(pipeline.summary())
+
+  # --- Trees, one per document ---
+  trees: Dict[Path, Optional[Path]] = {}
+  for doc in documents:
+    doc.md_store.save()
+    analyses = sorted((a for d, a in results if d is doc), key=lambda analysis: analysis.page_id)
+    flat_manifest = [analysis.model_dump() for analysis in analyses if analysis.relevance_score >= 4]
+    with open(doc.context_dir / "rtl_context_flat.json", "w", encoding="utf-8") as f:
+      json.dump(flat_manifest, f, indent=2)
+
+    print(f"\n[{doc.pdf.stem}] {len(analyses)} pages classified, {len(flat_manifest)} relevant.")
+    tree_path = None
+    if flat_manifest and builder is not None:
+      tree_path = _build_tree(flat_manifest, doc.context_dir, builder, doc.context_store)
+    doc.context_store.save()
+    trees[doc.pdf] = tree_path
+  return trees
+
+@app.command()
+def run(
+  input: Path = typer.Option(..., "--input", "-i", exists=True, dir_okay=False, help="Datasheet PDF."),
+  output_dir: Optional[Path] = typer.Option(None, "--output-dir", "-o", help="Parent of <name>_images/_md/_context (default: next to the PDF)."),
+  pages: Optional[str] = typer.Option(None, "--pages", help="1-based page selection, e.g. '1-20,25'."),
+  dpi: int = typer.Option(150, "--dpi"),
+  adaptive_dpi: bool = typer.Option(False, "--adaptive-dpi", help="Pick render DPI per page from its smallest text."),
+  text_layer: bool = typer.Option(False, "--text-layer", help="Use the PDF's native text where reliable."),
+  figure_dpi: int = typer.Option(200, "--figure-dpi", help="Render DPI for figure crops sent to vision models."),
+  extract_timing: bool = typer.Option(True, "--extract-timing/--no-extract-timing", help="Gemini timing extraction."),
+  detector: bool = typer.Option(False, "--detector/--no-detector", help="Settle clear diagram/no-diagram cases with the classical detector; ask the VLM only when ambiguous. Off until calibrated on your documents (see calibrate-detector)."),
+  detector_low: float = typer.Option(0.3, "--detector-low", help="Detector score at or below which a crop is not a diagram."),
+  detector_high: float = typer.Option(0.6, "--detector-high", help="Detector score at or above which a crop is a diagram."),
+  batch_size: int = typer.Option(1, "--batch-size", "-b", min=1, help="Max pages per OCR forward pass (whatever is queued)."),
+  device: Optional[str] = typer.Option(None, "--device", help="cuda or cpu (default: auto)."),
+  quantization: Optional[str] = typer.Option(None, "--quantization", "-q", help="int8 or 4bit weight quantization."),
+  worker_url: Optional[str] = typer.Option(None, "--worker-url", envvar="OLMOCR_WORKER_URL", help="Warm OCR worker to use if running."),
+  use_worker: bool = typer.Option(True, "--worker/--no-worker", help="Use a running 'ocr-worker' instead of loading the model."),
+  timing_workers: int = typer.Option(4, "--timing-workers", min=1, help="Concurrent diagram checks / Gemini extractions."),
+  classify_workers: int = typer.Option(1, "--classify-workers", min=1, help="Concurrent Ollama classifications."),
+  queue_size: int = typer.Option(4, "--queue-size", min=1, help="Pages buffered in front of each stage (bounds memory)."),
+  spec: Optional[str] = typer.Option(None, "--spec", help="Also draft a requirements spec for this configuration."),
+  rtl_prompt: Optional[str] = typer.Option(None, "--rtl-prompt", help="Also generate RTL for this request.")
+):
+  """
+  PDF -> OCR -> timing -> classification -> tree in one streaming pass.
+  Stages overlap page by page through bounded queues; the tree is built as
+  soon as classification drains. Reuses the caches of the single-stage commands.
+  """
+  try:
+    page_selection = parse_page_range(pages)
+    options = _RunOptions(
+      page_selection, dpi, adaptive_dpi, text_layer, figure_dpi, extract_timing,
+      detector, detector_low, detector_high, batch_size, device,
+      quantization, worker_url, use_worker, timing_workers, classify_workers, queue_size
+    )
+    root = output_dir or input.parent
+    doc = _open_document(input, root)
+    print(f"--- Streaming {input.name} -> {doc.md_dir.name} -> {doc.context_dir.name} ---")
+    trees = _stream_documents([doc], options)
+  except (ImportError, ValueError) as e:
+    print(f"Error: {e}")
+    raise typer.Exit(1)
+
+  if not trees[input]:
+    raise typer.Exit(1)
+
+  if spec:
+    from rtl_generator import SpecGenAgent
+    spec_path = root / f"{input.stem}_spec.md"
+    spec_text = SpecGenAgent(context_dir=doc.context_dir, md_dir=doc.md_dir).run(
+      f"Generate a full Requirements Specification for the '{spec}' mode of the {input.stem.upper()}."
+    )
+    atomic_write_text(spec_path, spec_text)
+    print(f"-> Spec saved to {spec_path}")
+
+  if rtl_prompt:
+    from rtl_generator import RTLAgent
+    rtl_path = root / f"{input.stem}_rtl.sv"
+    atomic_write_text(rtl_path, RTLAgent(context_dir=doc.context_dir, md_dir=doc.md_dir).run(rtl_prompt))
+    print(f"-> RTL saved to {rtl_path}")
+
+  print(f"\n--- Run Complete: {root} ---")
+
+def _read_pdf_list(input_path: Path) -> List[Path]:
+  """PDFs in a folder, or listed in a manifest (one path per line, or a JSON list; relative to the manifest)."""
+  if input_path.is_dir():
+    return sorted(input_path.glob("*.pdf"))
+
+  text = input_path.read_text(encoding="utf-8")
+  if input_path.suffix.lower() == ".json":
+    entries = json.loads(text)
+  else:
+    entries = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+  return [(input_path.parent / entry).resolve() for entry in entries]
+
+def _batch_conflicts(pdfs: List[Path], output_dir: Optional[Path]) -> List[str]:
+  """PDFs listed twice, or whose <stem>_images/_md/_context folders would coincide."""
+  conflicts = []
+  seen: Dict[Path, int] = {}
+  for pdf in pdfs:
+    seen[pdf.resolve()] = seen.get(pdf.resolve(), 0) + 1
+  conflicts += [f"{pdf} is listed {count} times" for pdf, count in seen.items() if count > 1]
+
+  targets: Dict[Path, List[Path]] = {}
+  for pdf in seen:
+    targets.setdefault((output_dir or pdf.parent).resolve() / pdf.stem, []).append(pdf)
+  conflicts += [
+    f"{', '.join(str(pdf) for pdf in group)} would share {target}_md (rename one or drop --output-dir)"
+    for target, group in targets.items() if len(group) > 1
+  ]
+  return conflicts
+
+@app.command()
+def batch(
+  input_path: Path = typer.Option(..., "--input", "-i", exists=True, help="Folder of PDFs, or a manifest (.txt lines / .json list)."),
+  output_dir: Optional[Path] = typer.Option(None, "--output-dir", "-o", help="Parent of each <name>_images/_md/_context (default: next to each PDF)."),
+  dpi: int = typer.Option(150, "--dpi"),
+  adaptive_dpi: bool = typer.Option(False, "--adaptive-dpi", help="Pick render DPI per page from its smallest text."),
+  text_layer: bool = typer.Option(False, "--text-layer", help="Use the PDF's native text where reliable."),
+  figure_dpi: int = typer.Option(200, "--figure-dpi", help="Render DPI for figure crops sent to vision models."),
+  extract_timing: bool = typer.Option(True, "--extract-timing/--no-extract-timing", help="Gemini timing extraction."),
+  detector: bool = typer.Option(False, "--detector/--no-detector", help="Settle clear diagram/no-diagram cases with the classical detector; ask the VLM only when ambiguous. Off until calibrated on your documents (see calibrate-detector)."),
+  detector_low: float = typer.Option(0.3, "--detector-low", help="Detector score at or below which a crop is not a diagram."),
+  detector_high: float = typer.Option(0.6, "--detector-high", help="Detector score at or above which a crop is a diagram."),
+  batch_size: int = typer.Option(1, "--batch-size", "-b", min=1, help="Max pages per OCR forward pass (whatever is queued)."),
+  device: Optional[str] = typer.Option(None, "--device", help="cuda or cpu (default: auto)."),
+  quantization: Optional[str] = typer.Option(None, "--quantization", "-q", help="int8 or 4bit weight quantization."),
+  worker_url: Optional[str] = typer.Option(None, "--worker-url", envvar="OLMOCR_WORKER_URL", help="Warm OCR worker to use if running."),
+  use_worker: bool = typer.Option(True, "--worker/--no-worker", help="Use a running 'ocr-worker' instead of loading the model."),
+  timing_workers: int = typer.Option(4, "--timing-workers", min=1, help="Concurrent diagram checks / Gemini extractions."),
+  classify_workers: int = typer.Option(1, "--classify-workers", min=1, help="Concurrent Ollama classifications."),
+  queue_size: int = typer.Option(4, "--queue-size", min=1, help="Pages buffered in front of each stage (bounds memory).")
+):
+  """
+  'run' for a whole part family: every datasheet goes through the same loaded
+  models, largest first, each into its own <name>_images/_md/_context folders.
+  """
+  try:
+    pdfs = _read_pdf_list(input_path)
+  except (OSError, ValueError) as e:
+    print(f"Error: cannot read {input_path}: {e}")
+    raise typer.Exit(1)
+
+  missing = [pdf for pdf in pdfs if not pdf.exists()]
+  if missing:
+    print(f"Error: not found: {', '.join(str(pdf) for pdf in missing)}")
+    raise typer.Exit(1)
+  if not pdfs:
+    print(f"Error: no PDFs in {input_path}")
+    raise typer.Exit(1)
+  conflicts = _batch_conflicts(pdfs, output_dir)
+  if conflicts:
+    for conflict in conflicts:
+      print(f"Error: {conflict}")
+    raise typer.Exit(1)
+
+  # Largest first, so the long documents don't trail at the end
+  page_counts = {}
+  for pdf in pdfs:
+    with PDFProcessor(pdf) as processor:
+      page_counts[pdf] = processor.document.page_count
+  pdfs.sort(key=lambda pdf: page_counts[pdf], reverse=True)
+
+  print(f"--- Batch: {len(pdfs)} datasheets, {sum(page_counts.values())} pages ---")
+  for pdf in pdfs:
+    print(f"   {pdf.name}: {page_counts[pdf]} pages")
+
+  options = _RunOptions(
+    None, dpi, adaptive_dpi, text_layer, figure_dpi, extract_timing,
+    detector, detector_low, detector_high, batch_size, device,
+    quantization, worker_url, use_worker, timing_workers, classify_workers, queue_size
+  )
+  try:
+    documents = [_open_document(pdf, output_dir or pdf.parent) for pdf in pdfs]
+    trees = _stream_documents(documents, options)
+  except (ImportError, ValueError) as e:
+    print(f"Error: {e}")
+    raise typer.Exit(1)
+
+  print("\n--- Batch Summary ---")
+  for pdf in pdfs:
+    status = f"tree -> {trees[pdf]}" if trees[pdf] else "no tree"
+    print(f"   {pdf.name}: {status}")
+  if not all(trees.values()):
+    raise typer.Exit(1)
+
+@app.command()
+def benchmark(
+  fixture: Path = typer.Option(Path(__file__).parent / "pdf" / "ad7980.pdf", "--fixture", exists=True, dir_okay=False, help="PDF with recorded <name>_md / <name>_context next to it."),
+  pages: int = typer.Option(0, "--pages", min=0, help="Repeat the fixture into a synthetic datasheet of this many pages (0 = as is)."),
+  output_dir: Optional[Path] = typer.Option(None, "--output-dir", "-o", help="Keep the run's artifacts here (default: a temporary folder). Reusing it benchmarks a warm rerun."),
+  dpi: int = typer.Option(150, "--dpi"),
+  batch_size: int = typer.Option(1, "--batch-size", "-b", min=1, help="Max pages per OCR forward pass."),
+  timing_workers: int = typer.Option(4, "--timing-workers", min=1),
+  classify_workers: int = typer.Option(1, "--classify-workers", min=1),
+  queue_size: int = typer.Option(4, "--queue-size", min=1),
+  scale: float = typer.Option(1.0, "--latency-scale", min=0.0, help="Multiply every stub latency (0 measures pipeline overhead only)."),
+  latency: List[str] = typer.Option([], "--latency", help="Override one stub latency, e.g. --latency gemini=0.5 (seconds)."),
+  agent: bool = typer.Option(True, "--agent/--no-agent", help="Also run a scripted agent loop over the built tree."),
+  report: Optional[Path] = typer.Option(None, "--report", help="Save the results as JSON.")
+):
+  """
+  Offline throughput benchmark: real rendering, detection and bookkeeping,
+  with deterministic stand-ins (configurable latencies) for OlmOCR, Gemini,
+  Ollama and the agents that replay the fixture's recorded outputs.
+  """
+  import tempfile
+  from benchmarks import (
+    Fixture, StubLatencies, StubOCREngine, StubTimingExtractor, StubClassifier, StubTreeBuilder, ScriptedAgent,
+    make_synthetic_datasheet, benchmark_report, format_report
+  )
+
+  try:
+    latencies = StubLatencies().scaled(scale).override(latency)
+    recorded = Fixture(fixture.parent / f"{fixture.stem}_md", fixture.parent / f"{fixture.stem}_context")
+  except (OSError, ValueError) as e:
+    print(f"Error: {e}")
+    raise typer.Exit(1)
+
+  tracer = get_tracer()
+  tracer.enable()
+  engines = _Engines(
+    StubOCREngine(recorded, latencies, fixture, dpi), StubTimingExtractor(recorded, latencies),
+    StubClassifier(recorded, latencies), StubTreeBuilder(recorded, latencies)
+  )
+  options = _RunOptions(
+    dpi=dpi, batch_size=batch_size, use_worker=False, timing_workers=timing_workers,
+    classify_workers=classify_workers, queue_size=queue_size
+  )
+
+  with tempfile.TemporaryDirectory(prefix="rtl_bench_") as scratch:
+    root = output_dir or Path(scratch)
+    pdf = fixture
+    if pages:
+      pdf = make_synthetic_datasheet(fixture, pages, root / f"{fixture.stem}_x{pages}.pdf")
+    with PDFProcessor(pdf) as processor:
+      page_count = processor.document.page_count
+
+    print(f"--- Benchmark: {pdf.name} ({page_count} pages), latencies {latencies} ---")
+    start_time = time.perf_counter()
+    doc = _open_document(pdf, root)
+    trees = _stream_documents([doc], options, engines)
+    if agent and trees[pdf]:
+      ScriptedAgent(doc.context_dir, doc.md_dir, latencies).run("Generate RTL for the default configuration.")
+    wall_seconds = time.perf_counter() - start_time
+
+  results = benchmark_report(tracer.spans, page_count, wall_seconds, {
+    "fixture": str(fixture), "pages": page_count, "dpi": dpi, "batch_size": batch_size,
+    "timing_workers": timing_workers, "classify_workers": classify_workers, "queue_size": queue_size,
+    "latencies": latencies.__dict__
+  })
+  print()
+  print(format_report(results))
+  if report:
+    with open(report, "w", encoding="utf-8") as f:
+      json.dump(results, f, indent=2)
+    print(f"Report saved to {report}")
+
 if __name__ == "__main__":
   app()
\ No newline at end of file
@@ -1,4 +1,10 @@
 from .local import OlmOCRProcessor
-from .cloud import GeminiTimingExtractor
+from .cloud import GeminiTimingExtractor, TimingExtractionPool, TIMING_PROMPT
+from .worker import OCRWorkerServer, OCRWorkerClient, connect_worker, DEFAULT_WORKER_URL
+from .diagram_detect import DiagramScore, score_timing_diagram
 
-__all__ = ["OlmOCRProcessor", "GeminiTimingExtractor"]
\ No newline at end of file
+__all__ = [
+  "OlmOCRProcessor", "GeminiTimingExtractor", "TimingExtractionPool", "TIMING_PROMPT",
+  "OCRWorkerServer", "OCRWorkerClient", "connect_worker", "DEFAULT_WORKER_URL",
+  "DiagramScore", "score_timing_diagram"
+]
\ No newline at end of file
@@ -1,39 +1,22 @@
+import io
 import os
 import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union, Callable, Iterator, Tuple, List
+from PIL import Image
 from pdf_processor.utils import setup_logger
+from pipeline.artifacts import hash_bytes, hash_file
+from pipeline.response_cache import ResponseCache, get_response_cache
+from pipeline.tracing import span
 
-class GeminiTimingExtractor:
-  def __init__(self, api_key: Optional[str] = None):
-    self.logger = setup_logger("GeminiVision")
-    
-    key = api_key or os.getenv("GEMINI_API_KEY")
-    if not key:
-      raise ValueError("GEMINI_API_KEY not found. Please set it in your environment.")
-      
-    genai.configure(api_key=key)
-    
-    # Use the 2.5 Pro Stable endpoint
-    self.model_name = 'gemini-2.5-pro'
-    
-    self.model = genai.GenerativeModel(self.model_name)
-    self.logger.info(f"Initialized {self.model_name} for Timing Analysis")
-
-  def analyze_diagram(self, image_path: Path) -> Dict[str, Any]:
-    """
-    Extracts timing logic from a datasheet crop.
-    """
-    if not image_path.exists():
-      raise FileNotFoundError(f"Image not found: {image_path}")
-      
-    self.logger.info(f"Uploading {image_path.name} to Gemini...")
-    
-    sample_file = genai.upload_file(path=str(image_path), display_name=image_path.name)
-    
-    # Verification Prompt
-    prompt = """
+# Verification Prompt
+TIMING_PROMPT = """
     Role: Senior FPGA Verification Engineer.
     Task: Extract the formal timing constraints and logic causality from this diagram.
     
@@ -57,10 +40,166 @@ class GeminiTimingExtractor:
     
     Warning: Be precise about "High-Z" (High Impedance) states shown by dashed lines.
     """
+
+# Quota and transient server errors; anything else fails the page immediately
+RETRYABLE_ERRORS = (
+  google_exceptions.ResourceExhausted,
+  google_exceptions.TooManyRequests,
+  google_exceptions.ServiceUnavailable,
+  google_exceptions.InternalServerError,
+  google_exceptions.DeadlineExceeded,
+  ConnectionError
+)
+RATE_LIMIT_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
+PAYLOAD_MIME_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+
+class GeminiTimingExtractor:
+  def __init__(
+    self,
+    api_key: Optional[str] = None,
+    endpoint: Optional[str] = None,
+    max_retries: int = 4,
+    backoff: float = 2.0,
+    cache: Optional[ResponseCache] = None,
+    max_side: int = 2048,
+    image_format: str = "webp",
+    quality: int = 85,
+    inline_limit: int = 4 * 1024 * 1024
+  ):
+    """
+    `endpoint` (or GEMINI_API_ENDPOINT) points the client at another host,
+    e.g. a local stub server; it switches to the REST transport.
+
+    Images are downscaled to `max_side` px (the model tiles larger inputs
+    down anyway), re-encoded as `image_format` at `quality`, and sent inline
+    when the result fits in `inline_limit` bytes; only larger payloads go
+    through the Files API.
+    """
+    self.logger = setup_logger("GeminiVision")
+    
+    key = api_key or os.getenv("GEMINI_API_KEY")
+    if not key:
+      raise ValueError("GEMINI_API_KEY not found. Please set it in your environment.")
+
+    endpoint = endpoint or os.getenv("GEMINI_API_ENDPOINT")
+    self.endpoint = endpoint
+    if endpoint:
+      genai.configure(api_key=key, transport="rest", client_options={"api_endpoint": endpoint})
+      self.logger.info(f"Using Gemini endpoint {endpoint}")
+    else:
+      genai.configure(api_key=key)
+
+    self.max_retries = max_retries
+    self.backoff = backoff
+    self.cache = cache or get_response_cache()
+
+    if image_format not in PAYLOAD_MIME_TYPES:
+      raise ValueError(f"Unsupported payload format '{image_format}' (expected one of {sorted(PAYLOAD_MIME_TYPES)})")
+    self.max_side = max_side
+    self.image_format = image_format
+    self.quality = quality
+    self.inline_limit = inline_limit
+    # One entry per extraction: bytes before/after optimization, transport, wall time
+    self.transfers: List[Dict[str, Any]] = []
+
+    # A quota error on one thread pauses every thread until this time
+    self._cooldown_lock = threading.Lock()
+    self._resume_at = 0.0
     
+    # Use the 2.5 Pro Stable endpoint
+    self.model_name = 'gemini-2.5-pro'
+    
+    self.model = genai.GenerativeModel(self.model_name)
+    self.logger.info(f"Initialized {self.model_name} for Timing Analysis")
+
+  def analyze_diagram(self, image_source: Union[Path, Image.Image]) -> Dict[str, Any]:
+    """
+    Extracts timing logic from a datasheet crop.
+    Answers for an identical image come from the response cache; failures are not cached.
+    """
+    if isinstance(image_source, Image.Image):
+      image_hash = hash_bytes(f"{image_source.mode}{image_source.size}".encode() + image_source.tobytes())
+    else:
+      if not image_source.exists():
+        raise FileNotFoundError(f"Image not found: {image_source}")
+      image_hash = hash_file(image_source)
+
+    key = ResponseCache.make_key(self.model_name, TIMING_PROMPT, image_hash, self.payload_params)
+    cached = self.cache.get(key)
+    if cached is not None:
+      self.logger.info("Using cached response.")
+      return json.loads(cached)
+
+    result = self._extract(image_source)
+    if "error" not in result:
+      self.cache.put(key, json.dumps(result), model=self.model_name)
+    return result
+
+  @property
+  def payload_params(self) -> Dict[str, Any]:
+    """Settings that change what the model sees, or who answers (part of cache keys)."""
+    params = {"max_side": self.max_side, "format": self.image_format, "quality": self.quality}
+    if self.endpoint:
+      # A stub or proxy host must not share answers with the real API
+      params["endpoint"] = self.endpoint
+    return params
+
+  def _prepare_payload(self, image_source: Union[Path, Image.Image]) -> Tuple[bytes, Tuple[int, int], int]:
+    """Downscales and re-encodes the image. Returns (data, size, source byte count)."""
+    if isinstance(image_source, Image.Image):
+      image = image_source
+      source_bytes = len(image.tobytes())
+    else:
+      image = Image.open(image_source)
+      source_bytes = image_source.stat().st_size
+
+    if image.mode not in ("RGB", "L"):
+      image = image.convert("RGB")
+
+    longest = max(image.size)
+    if longest > self.max_side:
+      scale = self.max_side / longest
+      image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=self.image_format.upper(), quality=self.quality)
+    return buffer.getvalue(), image.size, source_bytes
+
+  def _extract(self, image_source: Union[Path, Image.Image]) -> Dict[str, Any]:
+    """
+    Small payloads are sent inline with the prompt (one round trip); larger
+    ones are uploaded once and the handle is reused across retries.
+    """
+    start_time = time.perf_counter()
+    with span("encode", "gemini") as encode_span:
+      data, size, source_bytes = self._prepare_payload(image_source)
+      encode_span.add(source_bytes=source_bytes, payload_bytes=len(data))
+    mime_type = PAYLOAD_MIME_TYPES[self.image_format]
+
+    sample_file = None
+    if len(data) <= self.inline_limit:
+      self.logger.info(f"Sending {size[0]}x{size[1]} {self.image_format} inline ({len(data) / 1024:.0f} KB)...")
+      image_part = {"mime_type": mime_type, "data": data}
+    else:
+      self.logger.info(f"Uploading {size[0]}x{size[1]} {self.image_format} ({len(data) / 1024:.0f} KB)...")
+      with span("upload", "gemini", bytes_sent=len(data)):
+        sample_file = self._with_retry(
+          lambda: genai.upload_file(path=io.BytesIO(data), mime_type=mime_type, display_name="timing_diagram")
+        )
+      image_part = sample_file
+
     try:
       self.logger.info("Thinking...")
-      response = self.model.generate_content([sample_file, prompt])
+      inline_bytes = len(data) if sample_file is None else 0
+      with span("generate", "gemini", model=self.model_name, bytes_sent=inline_bytes) as generate_span:
+        # The client's own retry is off: _with_retry owns backoff and the shared cooldown
+        response = self._with_retry(
+          self.model.generate_content, [image_part, TIMING_PROMPT], request_options={"retry": None}
+        )
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+          generate_span.add(tokens_in=usage.prompt_token_count, tokens_out=usage.candidates_token_count)
       
       text = response.text.strip()
       if text.startswith("```json"):
@@ -73,4 +212,106 @@ class GeminiTimingExtractor:
       return {"error": str(e)}
       
     finally:
-      sample_file.delete()
\ No newline at end of file
+      if sample_file is not None:
+        with span("delete_upload", "gemini"):
+          sample_file.delete()
+      self.transfers.append({
+        "source_bytes": source_bytes,
+        "sent_bytes": len(data),
+        "size": list(size),
+        "transport": "upload" if sample_file is not None else "inline",
+        "seconds": round(time.perf_counter() - start_time, 2)
+      })
+
+  def transfer_summary(self) -> str:
+    if not self.transfers:
+      return "[Gemini] No extractions sent."
+    count = len(self.transfers)
+    sent = sum(t["sent_bytes"] for t in self.transfers)
+    source = sum(t["source_bytes"] for t in self.transfers)
+    inline = sum(1 for t in self.transfers if t["transport"] == "inline")
+    seconds = sum(t["seconds"] for t in self.transfers)
+    return (
+      f"[Gemini] {count} extractions: {sent / 1e6:.2f} MB sent (from {source / 1e6:.2f} MB), "
+      f"{inline}/{count} inline, {seconds / count:.1f}s per extraction"
+    )
+
+  def _with_retry(self, call: Callable, *args, **kwargs):
+    """Runs `call`, retrying quota and transient errors with jittered exponential backoff."""
+    for attempt in range(self.max_retries + 1):
+      with self._cooldown_lock:
+        wait = self._resume_at - time.monotonic()
+      if wait > 0:
+        time.sleep(wait)
+
+      try:
+        return call(*args, **kwargs)
+      except RETRYABLE_ERRORS as e:
+        if attempt == self.max_retries:
+          raise
+        delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+        if isinstance(e, RATE_LIMIT_ERRORS):
+          with self._cooldown_lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        self.logger.warning(f"{type(e).__name__}: retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+        time.sleep(delay)
+
+class TimingExtractionPool:
+  """
+  Runs analyze_diagram on a thread pool so local OCR keeps going while
+  cloud requests are in flight. At most `max_pending` jobs are queued or
+  running; submit() blocks beyond that.
+
+  `on_result(key, context, result)` runs on the worker thread as soon as
+  a job finishes (e.g. to write its JSON); finished jobs are then handed
+  back to the caller's thread by ready() / drain().
+  """
+
+  def __init__(
+    self,
+    extractor: GeminiTimingExtractor,
+    concurrency: int = 4,
+    max_pending: Optional[int] = None,
+    on_result: Optional[Callable[[Any, Any, Dict[str, Any]], None]] = None
+  ):
+    self.extractor = extractor
+    self.on_result = on_result
+    self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gemini")
+    self._slots = threading.BoundedSemaphore(max_pending or concurrency * 2)
+    self._futures: Dict[Future, Tuple[Any, Any]] = {}
+
+  @property
+  def in_flight(self) -> int:
+    return sum(1 for future in self._futures if not future.done())
+
+  def submit(self, key: Any, image_source: Union[Path, Image.Image], context: Any = None):
+    self._slots.acquire()
+    future = self._executor.submit(self._run, key, image_source, context)
+    future.add_done_callback(lambda _: self._slots.release())
+    self._futures[future] = (key, context)
+
+  def _run(self, key: Any, image_source: Union[Path, Image.Image], context: Any) -> Dict[str, Any]:
+    result = self.extractor.analyze_diagram(image_source)
+    if self.on_result:
+      self.on_result(key, context, result)
+    return result
+
+  def _collect(self, future: Future) -> Tuple[Any, Any, Dict[str, Any]]:
+    key, context = self._futures.pop(future)
+    try:
+      return key, context, future.result()
+    except Exception as e:
+      return key, context, {"error": str(e)}
+
+  def ready(self) -> Iterator[Tuple[Any, Any, Dict[str, Any]]]:
+    """Finished jobs, without waiting."""
+    for future in [f for f in self._futures if f.done()]:
+      yield self._collect(future)
+
+  def drain(self) -> Iterator[Tuple[Any, Any, Dict[str, Any]]]:
+    """Every remaining job, in completion order."""
+    for future in as_completed(list(self._futures)):
+      yield self._collect(future)
+
+  def close(self):
+    self._executor.shutdown(wait=True)
\ No newline at end of file
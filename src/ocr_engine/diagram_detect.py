@@ -0,0 +1,223 @@
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+from PIL import Image
+from pipeline.tracing import traced
+
+# Default decision band: below LOW is "no", above HIGH is "yes", in between ask the VLM
+DEFAULT_LOW = 0.3
+DEFAULT_HIGH = 0.6
+
+@dataclass
+class DiagramScore:
+  """Result of the classical detector. `score` is in [0, 1]."""
+  score: float
+  steps: int          # Square-wave edges: a level ends and a stroke joins it to the next level
+  long_runs: int      # Thin horizontal strokes longer than long_run_frac of the width
+  millis: float
+
+  def verdict(self, low: float = DEFAULT_LOW, high: float = DEFAULT_HIGH) -> str:
+    """'yes', 'no' or 'ambiguous' (the only case worth a VLM call)."""
+    if self.score >= high:
+      return "yes"
+    if self.score <= low:
+      return "no"
+    return "ambiguous"
+
+  def to_dict(self) -> Dict[str, Any]:
+    return asdict(self)
+
+# Steps at which the step evidence saturates
+FULL_STEPS = 40
+# Working resolution: a letter page at the 1000px work width
+WORK_DPI = 118
+
+def _horizontal_runs(mask: np.ndarray):
+  """(row, start, end) of every horizontal run of True pixels, row-major order."""
+  padded = np.pad(mask, ((0, 0), (1, 1))).astype(np.int8)
+  edges = np.diff(padded, axis=1)
+  starts = np.argwhere(edges == 1)
+  ends = np.argwhere(edges == -1)
+  return starts[:, 0], starts[:, 1], ends[:, 1]
+
+def _vertical_rules(dark: np.ndarray, min_length: int) -> np.ndarray:
+  """Pixels on vertical dark runs of at least min_length (table/grid rules, reference lines)."""
+  height = dark.shape[0]
+  if height < min_length:
+    return np.zeros_like(dark)
+  counts = np.pad(dark.astype(np.int32).cumsum(axis=0), ((1, 0), (0, 0)))
+  # full[i]: rows i .. i+min_length-1 are all dark
+  full = (counts[min_length:] - counts[:-min_length]) == min_length
+  starts = np.pad(full.astype(np.int32).cumsum(axis=0), ((1, 0), (0, 0)))
+  # A pixel is covered when a full window starts within min_length rows above it
+  rows = np.arange(height)
+  low = np.clip(rows - min_length + 1, 0, full.shape[0])
+  high = np.clip(rows + 1, 0, full.shape[0])
+  covered = starts[high] - starts[low]
+  return covered > 0
+
+def _box_density(integral: np.ndarray, y0, y1, x0, x1) -> np.ndarray:
+  """Dark share of boxes [y0, y1) x [x0, x1) from a padded integral image."""
+  ink = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+  return ink / np.maximum((y1 - y0) * (x1 - x0), 1)
+
+def _count_steps(
+  dark: np.ndarray, rows: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+  min_segment: int, max_segments: int, max_slant: int = 20, swing: tuple = (6, 60)
+) -> int:
+  """
+  Level segments whose end is joined to the start of another level by a
+  vertical or slanted stroke (ADI draws sloped edges) that stops at both
+  levels. Rules crossing the levels continue past them, and solid fills
+  (histogram bars) are not strokes, so neither counts.
+  """
+  height, width = dark.shape
+  keep = (ends - starts) >= min_segment
+  seg_rows, seg_starts, seg_ends = rows[keep], starts[keep], ends[keep]
+  if len(seg_rows) > max_segments:
+    sample = np.linspace(0, len(seg_rows) - 1, max_segments).astype(int)
+    seg_rows, seg_starts, seg_ends = seg_rows[sample], seg_starts[sample], seg_ends[sample]
+  if len(seg_rows) < 2:
+    return 0
+
+  column_gap = seg_starts[None, :] - seg_ends[:, None]
+  level_gap = np.abs(seg_rows[None, :] - seg_rows[:, None])
+  first, second = np.nonzero((column_gap >= -3) & (column_gap <= max_slant) & (level_gap >= swing[0]) & (level_gap <= swing[1]))
+  if len(first) == 0:
+    return 0
+
+  end_x, end_y = seg_ends[first] - 1, seg_rows[first]
+  start_x, start_y = seg_starts[second], seg_rows[second]
+
+  # Joined: samples along the edge are dark (with one pixel of slack)
+  near = dark.copy()
+  near[1:] |= dark[:-1]
+  near[:-1] |= dark[1:]
+  near[:, 1:] |= near[:, :-1].copy()
+  near[:, :-1] |= near[:, 1:].copy()
+  t = np.linspace(0.0, 1.0, 12)[None, :]
+  ys = np.clip(np.round(end_y[:, None] + (start_y - end_y)[:, None] * t).astype(int), 0, height - 1)
+  xs = np.clip(np.round(end_x[:, None] + (start_x - end_x)[:, None] * t).astype(int), 0, width - 1)
+  joined = near[ys, xs].mean(axis=1) >= 0.95
+
+  # Stops at both levels: light a few pixels beyond the upper and lower ends
+  upper_is_end = end_y < start_y
+  top_y, bottom_y = np.minimum(end_y, start_y), np.maximum(end_y, start_y)
+  top_x = np.where(upper_is_end, end_x, start_x)
+  bottom_x = np.where(upper_is_end, start_x, end_x)
+
+  def light(y, x):
+    return ~dark[np.clip(y, 0, height - 1), np.clip(x, 0, width - 1)]
+
+  stops = light(top_y - 5, top_x) & light(top_y - 8, top_x) & light(bottom_y + 5, bottom_x) & light(bottom_y + 8, bottom_x)
+
+  integral = np.pad(dark.astype(np.int32).cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+  x0 = np.clip(np.minimum(end_x, start_x) - 4, 0, width)
+  x1 = np.clip(np.maximum(end_x, start_x) + 5, 0, width)
+  stroke = _box_density(integral, top_y, np.clip(bottom_y + 1, 0, height), x0, x1) < 0.5
+
+  # Count each segment end at most once (thick lines give several pixel rows)
+  return int(len(np.unique(first[joined & stops & stroke])))
+
+@traced("detector", "ocr")
+def score_timing_diagram(
+  image: Union[Path, Image.Image],
+  dpi: Optional[int] = None,
+  work_width: int = 1000,
+  long_run_frac: float = 0.04,
+  max_segments: int = 2000
+) -> DiagramScore:
+  """
+  Scores how much a raster looks like a timing diagram, using only
+  vectorized NumPy operations (about 0.1s per page plus decoding):
+
+  1. Keep "thin" dark pixels: dark here but light 3px above and below.
+     This drops text glyphs (tall strokes) and keeps ruled lines. Thin
+     strokes are bridged across vertical rules, so a grid or table ruling
+     stays one line instead of breaking where the rules cross it.
+  2. Square-wave steps: a thin level segment ends where a vertical or
+     sloped stroke joins it to another level 6-60px up or down. The score
+     is the step count, saturating at FULL_STEPS.
+  Tables and plot grids give long runs but no steps, so they score low.
+
+  Pixel thresholds assume WORK_DPI: pass the render dpi for figure crops;
+  without it the image is taken to be a whole page and fit to work_width.
+  """
+  start_time = time.perf_counter()
+
+  if not isinstance(image, Image.Image):
+    image = Image.open(image)
+  gray = image.convert("L")
+  scale = WORK_DPI / dpi if dpi else work_width / gray.width
+  if scale < 1:
+    gray = gray.resize((max(1, round(gray.width * scale)), max(1, round(gray.height * scale))))
+
+  dark = np.asarray(gray) < 128
+  height, width = dark.shape
+
+  # 1. Thin horizontal strokes, bridged across vertical rules
+  above = np.zeros_like(dark)
+  below = np.zeros_like(dark)
+  above[3:] = dark[:-3]
+  below[:-3] = dark[3:]
+  thin = dark & ~above & ~below
+
+  rules = _vertical_rules(dark, 12)
+  rules[:, 1:] |= rules[:, :-1].copy()
+  rules[:, :-1] |= rules[:, 1:].copy()
+  left = np.zeros_like(thin)
+  right = np.zeros_like(thin)
+  left[:, 3:] = thin[:, :-3]
+  right[:, :-3] = thin[:, 3:]
+  lines = thin | (rules & left & right)
+
+  rows, starts, ends = _horizontal_runs(lines)
+  long_runs = int(np.count_nonzero((ends - starts) >= max(4, int(width * long_run_frac))))
+
+  # 2. Square-wave steps
+  steps = _count_steps(dark, rows, starts, ends, 12, max_segments)
+
+  return DiagramScore(
+    score=round(min(1.0, steps / FULL_STEPS), 4),
+    steps=steps,
+    long_runs=long_runs,
+    millis=round((time.perf_counter() - start_time) * 1000, 2)
+  )
+
+def calibrate(images: List[Path], positives: List[bool], low: float = DEFAULT_LOW, high: float = DEFAULT_HIGH) -> Dict[str, Any]:
+  """
+  Scores labelled pages and reports how the current band performs:
+  how many pages it settles without a VLM call, errors among the settled
+  ones, and a band that makes no errors on this set.
+  """
+  pages = []
+  for image_path, is_positive in zip(images, positives):
+    result = score_timing_diagram(image_path)
+    pages.append({"page_id": image_path.stem, "label": is_positive, **result.to_dict(), "verdict": result.verdict(low, high)})
+
+  positive_scores = [page["score"] for page in pages if page["label"]]
+  negative_scores = [page["score"] for page in pages if not page["label"]]
+
+  settled = [page for page in pages if page["verdict"] != "ambiguous"]
+  errors = [page for page in settled if (page["verdict"] == "yes") != page["label"]]
+
+  # Anything below the weakest positive is safely "no", anything above the strongest negative safely "yes"
+  suggested_low = min(positive_scores) - 1e-3 if positive_scores else None
+  suggested_high = max(negative_scores) + 1e-3 if negative_scores else None
+  if suggested_low is not None and suggested_high is not None and suggested_low >= suggested_high:
+    # Cleanly separable: settle every page seen, leave only scores between the classes to the VLM
+    suggested_low, suggested_high = suggested_high, suggested_low
+
+  return {
+    "pages": pages,
+    "low": low,
+    "high": high,
+    "settled_without_vlm": len(settled),
+    "ambiguous": len(pages) - len(settled),
+    "errors": [page["page_id"] for page in errors],
+    "suggested_low": round(suggested_low, 4) if suggested_low is not None else None,
+    "suggested_high": round(suggested_high, 4) if suggested_high is not None else None,
+    "mean_millis": round(sum(page["millis"] for page in pages) / max(len(pages), 1), 2)
+  }
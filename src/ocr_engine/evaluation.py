@@ -0,0 +1,46 @@
+import difflib
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+def normalize_markdown(text: str) -> str:
+  """Collapses whitespace and drops HTML/Markdown table scaffolding before comparison."""
+  text = re.sub(r"</?(table|tr|td|th|br|sup|sub)[^>]*>", " ", text, flags=re.IGNORECASE)
+  text = re.sub(r"[|*#`_-]{2,}", " ", text)
+  return re.sub(r"\s+", " ", text).strip().lower()
+
+def text_similarity(candidate: str, reference: str) -> float:
+  """Character-level similarity in [0, 1] between two transcriptions."""
+  return difflib.SequenceMatcher(None, normalize_markdown(candidate), normalize_markdown(reference)).ratio()
+
+def evaluate_ocr(engine: Any, images: List[Path], reference_dir: Path, batch_size: int = 1) -> Dict[str, Any]:
+  """
+  Runs `engine` over `images` and scores each page against the Markdown already
+  stored in `reference_dir` (e.g. src/pdf/ad7980_md from the bf16 GPU path).
+  Returns per-page similarity and latency plus aggregate throughput.
+  """
+  pages = []
+  start = time.perf_counter()
+
+  for offset in range(0, len(images), batch_size):
+    batch = images[offset:offset + batch_size]
+    batch_start = time.perf_counter()
+    outputs = engine.process_images(batch, batch_size=batch_size)
+    per_page = (time.perf_counter() - batch_start) / len(batch)
+
+    for image_path, output_text in zip(batch, outputs):
+      reference_path = reference_dir / f"{image_path.stem}.md"
+      similarity = None
+      if reference_path.exists():
+        similarity = text_similarity(output_text, reference_path.read_text(encoding="utf-8"))
+      pages.append({"page_id": image_path.stem, "seconds": round(per_page, 2), "similarity": similarity})
+
+  elapsed = time.perf_counter() - start
+  scored = [page["similarity"] for page in pages if page["similarity"] is not None]
+  return {
+    "pages": pages,
+    "total_seconds": round(elapsed, 2),
+    "seconds_per_page": round(elapsed / max(len(pages), 1), 2),
+    "mean_similarity": round(sum(scored) / len(scored), 4) if scored else None
+  }
@@ -1,29 +1,100 @@
+import os
+import re
 import torch
 from pathlib import Path
+from typing import List, Optional, Tuple, Union
 from PIL import Image
 from transformers import AutoProcessor, AutoModelForVision2Seq
 from pdf_processor.utils import setup_logger
+from pipeline.tracing import span
+
+try:
+  import resource
+except ImportError:  # Windows
+  resource = None
+
+# A page can be handed over as a file on disk or as an already-decoded image
+ImageSource = Union[Path, Image.Image]
+
+DIAGRAM_FLAG_PATTERN = re.compile(r"\[\[\s*TIMING_DIAGRAM\s*:\s*(YES|NO)\s*\]\]", re.IGNORECASE)
 
 class OlmOCRProcessor:
-  def __init__(self):
+  # 1. Configuration for OlmOCR 2 (Qwen2.5-VL based)
+  model_id = "allenai/olmOCR-2-7B-1025"
+  base_model_id = "Qwen/Qwen2.5-VL-7B-Instruct"
+
+  # The "No-Anchor" Prompt
+  OCR_PROMPT = (
+    "Accurately transcribe the text, tables, and layout of this document image into Markdown. "
+    "Use LaTeX for equations. Represent tables using standard Markdown syntax. "
+    "Do not output any conversational text, just the document content."
+  )
+
+  DIAGRAM_PROMPT = (
+    "Look at this image. Is there a visual 'Timing Diagram' or 'Waveform' chart present? "
+    "Ignore text references to other pages. "
+    "Answer with a single word: YES or NO."
+  )
+
+  # Single-pass variant: one generation answers both "what does it say" and
+  # "is there a timing diagram", so the page is vision-encoded only once
+  OCR_WITH_DIAGRAM_PROMPT = OCR_PROMPT + (
+    " After the transcription, add one final line that is exactly "
+    "[[TIMING_DIAGRAM: YES]] if the image visually contains a timing diagram or waveform chart, "
+    "otherwise [[TIMING_DIAGRAM: NO]]."
+  )
+
+  # Generation settings (also part of the artifact fingerprint)
+  OCR_GENERATION = {"max_new_tokens": 4096, "temperature": 0.1, "do_sample": True}
+
+  QUANTIZATION_MODES = (None, "int8", "4bit")
+
+  def __init__(
+    self,
+    batch_size: int = 1,
+    device: Optional[str] = None,
+    quantization: Optional[str] = None,
+    num_threads: Optional[int] = None,
+    max_pixels: Optional[int] = None
+  ):
+    """
+    Args:
+      batch_size: Pages per generate() call (see process_images).
+      device: "cuda" or "cpu". Defaults to CUDA when available.
+      quantization: None (bf16), "int8" or "4bit" weight quantization.
+      num_threads: CPU intra-op threads. Defaults to all cores on CPU.
+      max_pixels: Cap on image pixels fed to the vision tower. Fewer pixels
+                  means fewer vision tokens, the main CPU cost.
+    """
     self.logger = setup_logger("OlmOCR-2")
-    self.device = "cuda" if torch.cuda.is_available() else "cpu"
-    
-    # 1. Configuration for OlmOCR 2 (Qwen2.5-VL based)
-    self.model_id = "allenai/olmOCR-2-7B-1025"
-    self.base_model_id = "Qwen/Qwen2.5-VL-7B-Instruct" 
+    self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    self.batch_size = max(1, batch_size)
 
-    self.logger.info(f"Initializing {self.model_id} on {self.device}...")
+    if quantization not in self.QUANTIZATION_MODES:
+      raise ValueError(f"Unknown quantization '{quantization}'. Use one of {self.QUANTIZATION_MODES}.")
+    self.quantization = quantization
+
+    if self.device == "cpu":
+      self._configure_cpu_threads(num_threads)
+
+    self.logger.info(f"Initializing {self.model_id} on {self.device} (quantization: {quantization or 'none'})...")
 
     # 2. Load Processor
+    self.max_pixels = max_pixels
+    processor_kwargs = {"max_pixels": max_pixels} if max_pixels else {}
     try:
-      self.processor = AutoProcessor.from_pretrained(self.base_model_id)
+      self.processor = AutoProcessor.from_pretrained(self.base_model_id, **processor_kwargs)
     except Exception:
       self.logger.warning("Could not load base processor. Falling back to model ID.")
-      self.processor = AutoProcessor.from_pretrained(self.model_id)
+      self.processor = AutoProcessor.from_pretrained(self.model_id, **processor_kwargs)
 
-    # 3. Determine Attention Backend
+    # Decoder-only generation needs left padding once batches hold more than one page
+    self.processor.tokenizer.padding_side = "left"
+
+    # 3. Determine Attention Backend (flash-attn is CUDA-only)
     try:
+      if self.device != "cuda":
+        raise ImportError
       import flash_attn
       attn_impl = "flash_attention_2"
       self.logger.info("Using Flash Attention 2 ⚡")
@@ -32,93 +103,236 @@ class OlmOCRProcessor:
       self.logger.info("Using PyTorch SDPA (Standard Attention).")
 
     # 4. Load Model
-    self.model = AutoModelForVision2Seq.from_pretrained(
+    with span("load_model", "ocr", device=self.device, quantization=self.quantization):
+      self.model = self._load_model(attn_impl)
+    self.model.eval()
+    
+    self.logger.info(f"Model loaded. {self.memory_report()}")
+
+  def _configure_cpu_threads(self, num_threads: Optional[int]) -> None:
+    """One intra-op pool over all cores; no inter-op oversubscription."""
+    threads = num_threads or os.cpu_count() or 1
+    torch.set_num_threads(threads)
+    try:
+      torch.set_num_interop_threads(1)
+    except RuntimeError:
+      # Can only be set before the first parallel op in the process
+      pass
+    self.logger.info(f"CPU threads: {threads}")
+
+  def _load_model(self, attn_impl: str):
+    """Loads the weights for the selected device / quantization mode."""
+    if self.device == "cpu" and self.quantization == "int8":
+      # Load bf16 (half the RAM of fp32), then swap the decoder's nn.Linear
+      # layers for dynamically quantized int8 ones (fbgemm/onednn int8 GEMMs).
+      model = AutoModelForVision2Seq.from_pretrained(
+        self.model_id,
+        torch_dtype=torch.bfloat16,
+        attn_implementation=attn_impl,
+        low_cpu_mem_usage=True
+      )
+      return self._quantize_linear_int8(model)
+
+    if self.quantization in ("int8", "4bit"):
+      # bitsandbytes: CUDA, or its CPU backend on recent releases
+      from transformers import BitsAndBytesConfig
+      if self.quantization == "int8":
+        quantization_config = BitsAndBytesConfig(load_in_8bit=True)
+      else:
+        quantization_config = BitsAndBytesConfig(
+          load_in_4bit=True,
+          bnb_4bit_quant_type="nf4",
+          bnb_4bit_use_double_quant=True,
+          bnb_4bit_compute_dtype=torch.bfloat16
+        )
+      return AutoModelForVision2Seq.from_pretrained(
+        self.model_id,
+        quantization_config=quantization_config,
+        attn_implementation=attn_impl,
+        device_map={"": self.device},
+        low_cpu_mem_usage=True
+      )
+
+    return AutoModelForVision2Seq.from_pretrained(
       self.model_id,
       torch_dtype=torch.bfloat16,  # Native precision for 3090 Ti
       attn_implementation=attn_impl,
-      device_map="auto"
+      device_map="auto" if self.device == "cuda" else {"": "cpu"},
+      low_cpu_mem_usage=True
     )
-    
-    self.logger.info(f"Model loaded. VRAM usage: {torch.cuda.memory_allocated()/1024**3:.2f} GB")
 
-  def process_image(self, image_path: Path) -> str:
+  # Kept in bf16: the output projection (accuracy of every token) and the
+  # vision tower (runs once per image)
+  INT8_SKIP = ("lm_head", "visual")
+
+  def _quantize_linear_int8(self, model):
     """
-    Runs OlmOCR 2 on a single image.
+    Replaces the decoder's nn.Linear layers one at a time, so peak memory is
+    the bf16 model plus a single fp32 layer rather than a full fp32 copy.
+    lm_head, the vision tower and the token embeddings stay bf16; only the
+    decoder's small remaining weights (norms, biases) are upcast to fp32.
     """
-    if not image_path.exists():
-      raise FileNotFoundError(f"Image not found: {image_path}")
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicQuantizedLinear
+    from torch.ao.quantization import default_dynamic_qconfig
 
-    self.logger.debug(f"Processing image: {image_path.name}")
-    
-    image = Image.open(image_path).convert("RGB")
-    
-    # 5. The "No-Anchor" Prompt
-    prompt_text = (
-      "Accurately transcribe the text, tables, and layout of this document image into Markdown. "
-      "Use LaTeX for equations. Represent tables using standard Markdown syntax. "
-      "Do not output any conversational text, just the document content."
-    )
+    def skipped(module_name: str) -> bool:
+      return any(part in self.INT8_SKIP for part in module_name.split("."))
 
-    messages = [
-      {
-        "role": "user",
-        "content": [
-          {"type": "image", "image": image},
-          {"type": "text", "text": prompt_text}
-        ]
-      }
-    ]
+    replaced = 0
+    for parent_name, parent in list(model.named_modules()):
+      if skipped(parent_name):
+        continue
+      for name, child in list(parent.named_children()):
+        if type(child) is torch.nn.Linear and name not in self.INT8_SKIP:
+          child = child.float()
+          child.qconfig = default_dynamic_qconfig
+          setattr(parent, name, DynamicQuantizedLinear.from_float(child))
+          replaced += 1
 
-    # Preprocess inputs
-    text = self.processor.apply_chat_template(
-      messages, tokenize=False, add_generation_prompt=True
-    )
-    
-    inputs = self.processor(
-      images=[image],
-      text=[text],
-      padding=True,
-      return_tensors="pt"
-    ).to(self.device)
+    # Int8 dynamic Linear takes fp32 activations: upcast what is left of the
+    # decoder (norms), and cast at the bf16 boundaries instead of upcasting the
+    # ~1 GB embedding tables
+    embeddings = model.get_input_embeddings()
+    for module_name, module in model.named_modules():
+      if skipped(module_name) or module is embeddings:
+        continue
+      for param in module.parameters(recurse=False):
+        if param.dtype == torch.bfloat16:
+          param.data = param.data.float()
+
+    embeddings.register_forward_hook(lambda module, inputs, output: output.float())
+    lm_head = model.get_output_embeddings()
+    if lm_head is not None:
+      lm_head.register_forward_pre_hook(lambda module, inputs: tuple(x.to(torch.bfloat16) for x in inputs))
+      lm_head.register_forward_hook(lambda module, inputs, output: output.float())
+
+    self.logger.info(f"Quantized {replaced} Linear layers to int8 (lm_head, vision tower and embeddings kept in bf16).")
+    return model
+
+  def memory_report(self) -> str:
+    if self.device == "cuda":
+      return f"VRAM usage: {torch.cuda.memory_allocated()/1024**3:.2f} GB"
+    if resource is None:
+      return "Peak RSS: n/a"
+    # ru_maxrss is reported in KB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024**2
+    return f"Peak RSS: {peak_rss:.2f} GB"
+
+  def _load_image(self, source: ImageSource) -> Image.Image:
+    """Decodes a path to RGB; in-memory images are used as-is (no re-decode)."""
+    if isinstance(source, Image.Image):
+      return source if source.mode == "RGB" else source.convert("RGB")
+
+    if not source.exists():
+      raise FileNotFoundError(f"Image not found: {source}")
+    self.logger.debug(f"Processing image: {source.name}")
+    with span("decode", "ocr", file=source.name):
+      return Image.open(source).convert("RGB")
+
+  def process_image(self, image_source: ImageSource) -> str:
+    """
+    Runs OlmOCR 2 on a single image (path or in-memory PIL image).
+    """
+    return self.process_images([image_source], batch_size=1)[0]
+
+  def process_images(
+    self, image_sources: List[ImageSource], batch_size: Optional[int] = None, prompt: Optional[str] = None
+  ) -> List[str]:
+    """
+    Runs OlmOCR 2 on several pages, `batch_size` pages per forward pass.
+    Pages are grouped by pixel count (which fixes their vision-token count),
+    so each batch pads to similar lengths. Results come back in input order.
+    """
+    prompt = prompt or self.OCR_PROMPT
+    images = [self._load_image(source) for source in image_sources]
+    batch_size = max(1, batch_size or self.batch_size)
+
+    order = sorted(range(len(images)), key=lambda i: images[i].width * images[i].height)
+    results: List[str] = [""] * len(images)
+
+    for start in range(0, len(order), batch_size):
+      chunk = order[start:start + batch_size]
+      outputs = self._transcribe_batch([images[i] for i in chunk], prompt)
+      for index, output_text in zip(chunk, outputs):
+        results[index] = output_text
+
+    return results
+
+  def process_images_with_diagram_flag(
+    self, image_sources: List[ImageSource], batch_size: Optional[int] = None
+  ) -> List[Tuple[str, Optional[bool]]]:
+    """
+    Single-pass OCR + diagram detection: one generation per page yields the
+    transcription and a YES/NO diagram flag, so timing pages are encoded once
+    instead of twice. The flag is None if the model omitted the marker line;
+    callers should then fall back to has_visual_diagram().
+    """
+    results = []
+    for output_text in self.process_images(image_sources, batch_size, prompt=self.OCR_WITH_DIAGRAM_PROMPT):
+      matches = DIAGRAM_FLAG_PATTERN.findall(output_text)
+      flag = matches[-1].upper() == "YES" if matches else None
+      results.append((DIAGRAM_FLAG_PATTERN.sub("", output_text).rstrip(), flag))
+    return results
+
+  def _transcribe_batch(self, images: List[Image.Image], prompt: str) -> List[str]:
+    """One padded generate() call over a batch of already-decoded pages."""
+    texts = []
+    for image in images:
+      messages = [
+        {
+          "role": "user",
+          "content": [
+            {"type": "image", "image": image},
+            {"type": "text", "text": prompt}
+          ]
+        }
+      ]
+      texts.append(self.processor.apply_chat_template(
+        messages, tokenize=False, add_generation_prompt=True
+      ))
+
+    # Preprocess inputs (left padding, see __init__)
+    with span("preprocess", "ocr", pages=len(images)):
+      inputs = self.processor(
+        images=images,
+        text=texts,
+        padding=True,
+        return_tensors="pt"
+      ).to(self.device)
 
     # Generate
-    with torch.no_grad():
+    with span("generate", "ocr", pages=len(images)) as generate_span, torch.no_grad():
       generated_ids = self.model.generate(
         **inputs,
-        max_new_tokens=4096,
-        temperature=0.1,
-        do_sample=True,
+        **self.OCR_GENERATION,
         use_cache=True
       )
     
-    # Trim inputs from outputs
+    # Trim inputs from outputs (all prompts share the padded length)
     generated_ids_trimmed = [
       out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
     ]
+    pad_id = self.processor.tokenizer.pad_token_id
+    generate_span.add(
+      tokens_in=int(inputs.attention_mask.sum()),
+      tokens_out=sum(int((ids != pad_id).sum()) for ids in generated_ids_trimmed)
+    )
     
-    output_text = self.processor.batch_decode(
+    return self.processor.batch_decode(
       generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
-    )[0]
-    
-    return output_text
+    )
 
-  def has_visual_diagram(self, image_path: Path) -> bool:
+  def has_visual_diagram(self, image_source: ImageSource) -> bool:
     """
     Asks the local vision model if a timing diagram is VISUALLY present.
     Returns True/False.
     """
-    image = Image.open(image_path).convert("RGB")
-    
-    prompt_text = (
-      "Look at this image. Is there a visual 'Timing Diagram' or 'Waveform' chart present? "
-      "Ignore text references to other pages. "
-      "Answer with a single word: YES or NO."
-    )
-    
+    image = self._load_image(image_source)
+
     messages = [
       {"role": "user", "content": [
         {"type": "image", "image": image},
-        {"type": "text", "text": prompt_text}
+        {"type": "text", "text": self.DIAGRAM_PROMPT}
       ]}
     ]
 
@@ -133,8 +347,9 @@ class OlmOCRProcessor:
       return_tensors="pt"
     ).to(self.device)
 
-    with torch.no_grad():
+    with span("diagram_check", "ocr") as check_span, torch.no_grad():
       generated_ids = self.model.generate(**inputs, max_new_tokens=10)
+    check_span.add(tokens_in=int(inputs.attention_mask.sum()))
       
     output = self.processor.batch_decode(
       [out_ids[len(in_ids):] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)], 
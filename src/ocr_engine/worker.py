@@ -0,0 +1,177 @@
+import base64
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from PIL import Image
+from pdf_processor.utils import setup_logger
+
+DEFAULT_WORKER_URL = "http://127.0.0.1:8765"
+
+# --- Wire Format ---
+
+def _encode_image(source: Union[Path, Image.Image]) -> str:
+  """Files are sent as-is (no decode); in-memory images as lossless PNG."""
+  if isinstance(source, Image.Image):
+    buffer = io.BytesIO()
+    source.save(buffer, format="PNG")
+    data = buffer.getvalue()
+  else:
+    data = Path(source).read_bytes()
+  return base64.b64encode(data).decode("ascii")
+
+def _decode_image(payload: str) -> Image.Image:
+  return Image.open(io.BytesIO(base64.b64decode(payload))).convert("RGB")
+
+# --- Server ---
+
+class OCRWorkerServer:
+  """
+  Keeps one OlmOCRProcessor resident and serves it on a local HTTP endpoint.
+  Requests are handled on threads (so /health stays responsive) but model
+  calls are serialized behind a lock.
+  """
+
+  def __init__(self, engine: Any, host: str = "127.0.0.1", port: int = 8765):
+    self.logger = setup_logger("OCRWorker")
+    self.engine = engine
+    self.lock = threading.Lock()
+    self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+
+  @property
+  def url(self) -> str:
+    host, port = self.httpd.server_address[:2]
+    return f"http://{host}:{port}"
+
+  def describe(self) -> Dict[str, Any]:
+    return {
+      "model_id": self.engine.model_id,
+      "device": self.engine.device,
+      "quantization": getattr(self.engine, "quantization", None),
+      "max_pixels": getattr(self.engine, "max_pixels", None),
+      "batch_size": self.engine.batch_size
+    }
+
+  def handle(self, route: str, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Dispatches one decoded JSON request to the resident model (None = unknown route)."""
+    if route == "/ocr":
+      images = [_decode_image(item) for item in request["images"]]
+      with self.lock:
+        if request.get("with_diagram_flag"):
+          results = self.engine.process_images_with_diagram_flag(images, request.get("batch_size"))
+          return {"results": [[text, flag] for text, flag in results]}
+        return {"texts": self.engine.process_images(images, request.get("batch_size"))}
+
+    if route == "/diagram":
+      image = _decode_image(request["image"])
+      with self.lock:
+        return {"has_diagram": self.engine.has_visual_diagram(image)}
+
+    return None
+
+  def _make_handler(self):
+    server = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def _reply(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+      def do_GET(self):
+        if self.path == "/health":
+          self._reply(200, server.describe())
+        else:
+          self._reply(404, {"error": f"Unknown route {self.path}"})
+
+      def do_POST(self):
+        try:
+          length = int(self.headers.get("Content-Length", 0))
+          request = json.loads(self.rfile.read(length) or b"{}")
+          response = server.handle(self.path, request)
+          if response is None:
+            self._reply(404, {"error": f"Unknown route {self.path}"})
+          else:
+            self._reply(200, response)
+        except (KeyError, ValueError) as e:
+          self._reply(400, {"error": f"Bad request: {e}"})
+        except Exception as e:
+          server.logger.error(f"{self.path} failed: {e}")
+          self._reply(500, {"error": str(e)})
+
+      def log_message(self, format, *args):
+        server.logger.debug(format % args)
+
+    return Handler
+
+  def serve_forever(self) -> None:
+    self.logger.info(f"OCR worker ready at {self.url} ({self.engine.model_id})")
+    try:
+      self.httpd.serve_forever()
+    finally:
+      self.httpd.server_close()
+
+# --- Client ---
+
+class OCRWorkerClient:
+  """
+  Drop-in stand-in for OlmOCRProcessor that forwards calls to a running
+  OCRWorkerServer. Class-level prompts/model ids stay on OlmOCRProcessor.
+  """
+
+  def __init__(self, url: str = DEFAULT_WORKER_URL, timeout: float = 3600.0):
+    self.url = url.rstrip("/")
+    self.timeout = timeout
+    self.info: Dict[str, Any] = {}
+
+  def _request(self, route: str, body: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(
+      f"{self.url}{route}", data=data, method="POST" if body is not None else "GET",
+      headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+      return json.loads(response.read())
+
+  def health(self, timeout: float = 0.5) -> Dict[str, Any]:
+    self.info = self._request("/health", timeout=timeout)
+    return self.info
+
+  def process_image(self, image_source: Union[Path, Image.Image]) -> str:
+    return self.process_images([image_source], batch_size=1)[0]
+
+  def process_images(self, image_sources: List[Union[Path, Image.Image]], batch_size: Optional[int] = None) -> List[str]:
+    response = self._request("/ocr", {
+      "images": [_encode_image(source) for source in image_sources],
+      "batch_size": batch_size
+    })
+    return response["texts"]
+
+  def process_images_with_diagram_flag(
+    self, image_sources: List[Union[Path, Image.Image]], batch_size: Optional[int] = None
+  ) -> List[Tuple[str, Optional[bool]]]:
+    response = self._request("/ocr", {
+      "images": [_encode_image(source) for source in image_sources],
+      "batch_size": batch_size,
+      "with_diagram_flag": True
+    })
+    return [(text, flag) for text, flag in response["results"]]
+
+  def has_visual_diagram(self, image_source: Union[Path, Image.Image]) -> bool:
+    return self._request("/diagram", {"image": _encode_image(image_source)})["has_diagram"]
+
+def connect_worker(url: str = DEFAULT_WORKER_URL, timeout: float = 0.5) -> Optional[OCRWorkerClient]:
+  """Returns a client if a worker answers /health at `url`, else None."""
+  client = OCRWorkerClient(url)
+  try:
+    client.health(timeout=timeout)
+    return client
+  except (urllib.error.URLError, ConnectionError, TimeoutError, OSError, ValueError):
+    return None
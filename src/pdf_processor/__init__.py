@@ -1,4 +1,6 @@
-from .core import PDFProcessor, PDFExportConfig
-from .utils import setup_logger
+from .core import PDFProcessor, PDFExportConfig, RenderedPage
+from .text_layer import TextLayerConfig, TextLayerDecision
+from .figures import FigureConfig, FigureRegion
+from .utils import setup_logger, parse_page_range
 
-__all__ = ["PDFProcessor", "PDFExportConfig", "setup_logger"]
\ No newline at end of file
+__all__ = ["PDFProcessor", "PDFExportConfig", "RenderedPage", "TextLayerConfig", "TextLayerDecision", "FigureConfig", "FigureRegion", "setup_logger", "parse_page_range"]
\ No newline at end of file
@@ -1,8 +1,15 @@
-from dataclasses import dataclass
+import hashlib
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Tuple, Iterator, Any, Dict
 import fitz  # PyMuPDF
+from pipeline.tracing import span
 from .utils import setup_logger
+from .text_layer import TextLayerConfig, TextLayerDecision, analyze_text_layer, page_to_markdown
+from .figures import FigureConfig, FigureRegion, find_figure_regions, find_section_headings
+from .raster import SUPPORTED_FORMATS, SUPPORTED_COLORSPACES, choose_page_dpi, render_pixmap, save_pixmap
 
 # --- Configuration Object ---
 
@@ -10,10 +17,109 @@ from .utils import setup_logger
 class PDFExportConfig:
   """
   Configuration for the PDF to Image conversion process.
-  Default: 150 DPI, PNG format.
+  Default: 150 DPI, PNG format, RGB.
   """
   dpi: int = 150
-  image_format: str = "png"
+  image_format: str = "png"  # png | jpg | webp
+  # Parallel rendering: number of worker processes (1 = serial, in-process)
+  workers: int = 1
+  # Optional 1-based page selection (e.g. [1, 2, 5]). None = all pages.
+  pages: Optional[List[int]] = None
+  # Adaptive resolution: size each page so its small print gets target_px_per_em
+  adaptive_dpi: bool = False
+  min_dpi: int = 100
+  max_dpi: int = 300
+  target_px_per_em: float = 20.0
+  # Pixel format: rgb | gray | mono (1-bit on disk)
+  colorspace: str = "rgb"
+  # Encoder settings for jpg/webp
+  quality: int = 80
+  lossless: bool = False
+
+  def __post_init__(self):
+    if self.image_format not in SUPPORTED_FORMATS:
+      raise ValueError(f"Unsupported image format '{self.image_format}'. Use one of {SUPPORTED_FORMATS}.")
+    if self.colorspace not in SUPPORTED_COLORSPACES:
+      raise ValueError(f"Unsupported colorspace '{self.colorspace}'. Use one of {SUPPORTED_COLORSPACES}.")
+
+  def render_params(self) -> dict:
+    """Settings that change the rendered pixels (excludes scheduling options)."""
+    params = asdict(self)
+    params.pop("workers")
+    params.pop("pages")
+    return params
+
+  def page_dpi(self, page: fitz.Page) -> int:
+    """Resolution for one page: fixed, or chosen from its content when adaptive."""
+    if not self.adaptive_dpi:
+      return self.dpi
+    return choose_page_dpi(page, self.dpi, self.min_dpi, self.max_dpi, self.target_px_per_em)
+
+# --- In-Memory Page ---
+
+@dataclass
+class RenderedPage:
+  """
+  A rasterized page held in memory (raw RGB or gray pixmap buffer).
+  The PIL view is decoded lazily, once, and shared by every consumer.
+  """
+  page_num: int  # 1-based
+  width: int
+  height: int
+  samples: bytes = field(repr=False)
+  mode: str = "RGB"  # PIL mode of the buffer: RGB or L
+  dpi: int = 150
+  _image: Any = field(default=None, repr=False, compare=False)
+
+  @property
+  def page_id(self) -> str:
+    """Matches the on-disk naming scheme: page_001."""
+    return f"page_{self.page_num:03d}"
+
+  def to_image(self):
+    """Returns the page as a PIL image (built from the buffer on first access)."""
+    if self._image is None:
+      from PIL import Image
+      self._image = Image.frombytes(self.mode, (self.width, self.height), self.samples)
+    return self._image
+
+  def save(self, output_path: Path) -> Path:
+    """Optionally persists the page (format inferred from the suffix)."""
+    self.to_image().save(output_path)
+    return output_path
+
+# --- Rendering Helpers (shared by the serial path and worker processes) ---
+
+def _render_to_file(document: fitz.Document, page_index: int, config: PDFExportConfig, target_dir: Path) -> Path:
+  """Renders one page at its (possibly adaptive) DPI and saves it: page_001.png"""
+  page = document[page_index]
+  pix = render_pixmap(page, config.page_dpi(page), config.colorspace)
+  output_path = Path(target_dir) / f"page_{page_index + 1:03d}.{config.image_format}"
+  return save_pixmap(pix, output_path, config.image_format, config.colorspace, config.quality, config.lossless)
+
+def _render_page_slice(
+  file_path: str, page_indices: List[int], config: PDFExportConfig, target_dir: str
+) -> List[Tuple[int, str]]:
+  """
+  Renders a slice of pages inside a worker process.
+  Each worker opens its own document handle (fitz.Document is not shareable).
+  Returns (page_index, output_path) pairs for the pages that succeeded.
+  """
+  logger = setup_logger()
+  results = []
+
+  with fitz.open(file_path) as document:
+    for page_index in page_indices:
+      try:
+        output_path = _render_to_file(document, page_index, config, Path(target_dir))
+        results.append((page_index, str(output_path)))
+      except Exception as e:
+        logger.error(f"Failed to convert page {page_index + 1}: {e}")
+
+  return results
+
+# Indirect reference inside a PDF object's source, e.g. "12 0 R"
+_OBJECT_REF = re.compile(r"(\d+) \d+ R\b")
 
 # --- Main Processor Facade ---
 
@@ -24,6 +130,8 @@ class PDFProcessor:
     
     self.file_path = Path(file_path)
     self.document: Optional[fitz.Document] = None
+    # xref -> digest of the object and everything it references (fonts are shared by many pages)
+    self._object_digests: Dict[int, bytes] = {}
     
     # Define default output directory: ./filename_images/
     self.default_output_dir = self.file_path.parent / f"{self.file_path.stem}_images"
@@ -59,53 +167,252 @@ class PDFProcessor:
     if self.document:
       self.document.close()
       self.document = None
+      self._object_digests.clear()
       self.logger.debug("Document closed.")
 
-  def convert_to_images(self, config: PDFExportConfig, output_dir: Optional[Path] = None) -> List[Path]:
-      """
-      Converts all pages to images.
-      Args:
-        config: The DPI/Format settings.
-        output_dir: Optional override for where to save images. 
-                    If None, defaults to ./filename_images/
-      """
-      if not self.document:
-        raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
-  
-      # Determine the actual target directory
-      target_dir = output_dir if output_dir else self.default_output_dir
-  
-      # 1. Ensure output directory exists
-      if not target_dir.exists():
-        target_dir.mkdir(parents=True)
-        self.logger.info(f"Created output directory: {target_dir}")
+  def resolve_pages(self, pages: Optional[List[int]] = None) -> List[int]:
+    """
+    Maps an optional 1-based page selection onto 0-based page indices.
+    Out-of-range pages are dropped with a warning.
+    """
+    if not self.document:
+      raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
+
+    page_count = self.document.page_count
+    if pages is None:
+      return list(range(page_count))
+
+    indices = []
+    for page in sorted(set(pages)):
+      if 1 <= page <= page_count:
+        indices.append(page - 1)
       else:
-        self.logger.info(f"Using existing output directory: {target_dir}")
-  
-      generated_files = []
-  
-      # 2. Iterate through pages
-      for page_num, page in enumerate(self.document):
+        self.logger.warning(f"Page {page} is out of range (1-{page_count}). Skipping.")
+    return indices
+
+  def page_content_hash(self, page_index: int) -> str:
+    """
+    Hash of everything a page renders from: its content streams, geometry
+    and rotation, and every resource they draw with (fonts, images, Form
+    XObjects and their own resources, graphics states...), followed through
+    references. Object numbers are left out, so unchanged pages in a new
+    datasheet revision hash identically even when the file is renumbered.
+    """
+    if not self.document:
+      raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
+
+    page = self.document[page_index]
+    digest = hashlib.sha256()
+    digest.update(page.read_contents())
+    digest.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    digest.update(self._source_digest(self._page_resources(page.xref), set()))
+    return digest.hexdigest()
+
+  def _page_resources(self, xref: int) -> str:
+    """Source of the page's /Resources, inherited from the page tree if the page has none."""
+    while xref:
+      kind, value = self.document.xref_get_key(xref, "Resources")
+      if kind != "null":
+        return value
+      kind, parent = self.document.xref_get_key(xref, "Parent")
+      xref = int(parent.split()[0]) if kind == "xref" else 0
+    return ""
+
+  def _source_digest(self, source: str, visiting: set) -> bytes:
+    """Digest of an object's source with each reference replaced by the referenced object's digest."""
+    digest = hashlib.sha256(_OBJECT_REF.sub("R", source).encode("utf-8"))
+    for match in _OBJECT_REF.finditer(source):
+      digest.update(self._object_digest(int(match.group(1)), visiting))
+    return digest.digest()
+
+  def _object_digest(self, xref: int, visiting: set) -> bytes:
+    if xref in self._object_digests:
+      return self._object_digests[xref]
+    if xref in visiting or not 0 < xref < self.document.xref_length():
+      # Reference cycle (or dangling reference): its content is hashed where the walk entered it
+      return b"cycle"
+    visiting.add(xref)
+    digest = hashlib.sha256(self._source_digest(self.document.xref_object(xref, compressed=True), visiting))
+    if self.document.xref_is_stream(xref):
+      digest.update(self.document.xref_stream_raw(xref) or b"")
+    visiting.discard(xref)
+    self._object_digests[xref] = digest.digest()
+    return self._object_digests[xref]
+
+  def convert_to_images(
+    self, config: PDFExportConfig, output_dir: Optional[Path] = None, store: Optional[Any] = None
+  ) -> List[Path]:
+    """
+    Converts pages to images.
+    Args:
+      config: The DPI/Format/Parallelism settings.
+      output_dir: Optional override for where to save images.
+                  If None, defaults to ./filename_images/
+      store: Optional pipeline.ArtifactStore rooted at the output directory.
+             Pages whose content and render settings are unchanged are reused.
+    """
+    if not self.document:
+      raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
+
+    # Determine the actual target directory
+    target_dir = output_dir if output_dir else self.default_output_dir
+
+    # 1. Ensure output directory exists
+    if not target_dir.exists():
+      target_dir.mkdir(parents=True)
+      self.logger.info(f"Created output directory: {target_dir}")
+    else:
+      self.logger.info(f"Using existing output directory: {target_dir}")
+
+    page_indices = self.resolve_pages(config.pages)
+
+    # 2. Skip pages that are already rendered from identical content
+    reused_files: List[Path] = []
+    fingerprints = {}
+    if store is not None:
+      pending = []
+      for page_index in page_indices:
+        inputs = {"page": self.page_content_hash(page_index)}
+        fingerprint = store.fingerprint(inputs, params=config.render_params())
+        fingerprints[page_index] = (fingerprint, inputs)
+
+        if store.reuse("rasterize", f"page_{page_index + 1:03d}", fingerprint):
+          reused_files.append(target_dir / f"page_{page_index + 1:03d}.{config.image_format}")
+        else:
+          pending.append(page_index)
+      page_indices = pending
+
+    workers = max(1, min(config.workers, len(page_indices)))
+
+    # 3. Render pages (serially, or split across worker processes)
+    if workers == 1:
+      generated_files = self._convert_serial(page_indices, config, target_dir)
+    else:
+      generated_files = self._convert_parallel(page_indices, config, target_dir, workers)
+
+    if store is not None:
+      for output_path in generated_files:
+        page_index = int(output_path.stem.split("_")[1]) - 1
+        fingerprint, inputs = fingerprints[page_index]
+        store.record("rasterize", output_path.stem, fingerprint, inputs, outputs=[output_path])
+      store.save()
+      generated_files = sorted(reused_files + generated_files)
+
+    self.logger.info(f"Conversion complete. {len(generated_files)} images saved to {target_dir}")
+    return generated_files
+
+  def _convert_serial(self, page_indices: List[int], config: PDFExportConfig, target_dir: Path) -> List[Path]:
+    """Renders pages one by one through the already-open document handle."""
+    generated_files = []
+
+    for page_index in page_indices:
+      try:
+        output_path = _render_to_file(self.document, page_index, config, target_dir)
+        generated_files.append(output_path)
+
+        self.logger.debug(f"Saved {output_path.name}")
+
+      except Exception as e:
+        self.logger.error(f"Failed to convert page {page_index + 1}: {e}")
+
+    return generated_files
+
+  def _convert_parallel(
+    self, page_indices: List[int], config: PDFExportConfig, target_dir: Path, workers: int
+  ) -> List[Path]:
+    """
+    Splits the page list into interleaved slices (page i goes to worker i % N),
+    so expensive pages clustered together in the document are spread evenly.
+    """
+    slices = [page_indices[w::workers] for w in range(workers)]
+    self.logger.info(f"Rendering {len(page_indices)} pages with {workers} worker processes...")
+
+    rendered: List[Tuple[int, str]] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+      futures = [
+        pool.submit(
+          _render_page_slice, str(self.file_path), page_slice, config, str(target_dir)
+        )
+        for page_slice in slices
+      ]
+      for future in futures:
         try:
-          # Calculate Matrix for DPI (72 is base PDF DPI)
-          zoom = config.dpi / 72
-          matrix = fitz.Matrix(zoom, zoom)
-          
-          # Render page to pixel map
-          pix = page.get_pixmap(matrix=matrix)
-          
-          # Construct filename: page_001.png
-          filename = f"page_{page_num + 1:03d}.{config.image_format}"
-          output_path = target_dir / filename
-          
-          # Save to disk
-          pix.save(output_path)
-          generated_files.append(output_path)
-          
-          self.logger.debug(f"Saved {filename}")
-          
+          rendered.extend(future.result())
         except Exception as e:
-          self.logger.error(f"Failed to convert page {page_num + 1}: {e}")
-  
-      self.logger.info(f"Conversion complete. {len(generated_files)} images saved to {target_dir}")
-      return generated_files
\ No newline at end of file
+          self.logger.error(f"Render worker failed: {e}")
+
+    # Restore page order regardless of which worker finished first
+    return [Path(path) for _, path in sorted(rendered)]
+
+  def render_page(self, page_index: int, config: PDFExportConfig, clip: Optional[fitz.Rect] = None) -> RenderedPage:
+    """
+    Renders one page (0-based index) into an in-memory buffer at its
+    (possibly adaptive) DPI. With clip (PDF points), only that region is rasterized.
+    Mono pages are kept as 8-bit gray in memory; 1-bit only matters on disk.
+    """
+    if not self.document:
+      raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
+
+    page = self.document[page_index]
+    dpi = config.dpi if clip is not None else config.page_dpi(page)
+    with span("rasterize" if clip is None else "rasterize_crop", "pdf", page=page_index + 1, dpi=dpi):
+      pix = render_pixmap(page, dpi, config.colorspace, clip=clip)
+    return RenderedPage(
+      page_num=page_index + 1,
+      width=pix.width,
+      height=pix.height,
+      samples=bytes(pix.samples),
+      mode="RGB" if pix.n >= 3 else "L",
+      dpi=dpi
+    )
+
+  def iter_pages(self, config: PDFExportConfig) -> Iterator[RenderedPage]:
+    """
+    Streams pages as in-memory RGB buffers, in page order, without touching disk.
+    Honors config.dpi and config.pages.
+    """
+    if not self.document:
+      raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
+
+    for page_index in self.resolve_pages(config.pages):
+      try:
+        yield self.render_page(page_index, config)
+      except Exception as e:
+        self.logger.error(f"Failed to render page {page_index + 1}: {e}")
+
+  def text_layer_decision(self, page_index: int, config: Optional[TextLayerConfig] = None) -> TextLayerDecision:
+    """Decides whether the page's native text layer can replace VLM OCR."""
+    if not self.document:
+      raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
+    with span("text_layer", "pdf", page=page_index + 1):
+      return analyze_text_layer(self.document[page_index], config or TextLayerConfig())
+
+  def extract_markdown(self, page_index: int) -> str:
+    """Converts the page's native text layer to Markdown (no rendering, no model)."""
+    if not self.document:
+      raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
+    with span("extract_markdown", "pdf", page=page_index + 1):
+      return page_to_markdown(self.document[page_index])
+
+  def find_figures(self, page_index: int, config: Optional[FigureConfig] = None) -> List[FigureRegion]:
+    """Locates figure bounding boxes from the page's vector drawings and embedded images."""
+    if not self.document:
+      raise RuntimeError("Document is not open. Use 'with PDFProcessor(...)'.")
+    with span("find_figures", "pdf", page=page_index + 1):
+      return find_figure_regions(self.document[page_index], config or FigureConfig())
+
+  def render_figures(
+    self, page_index: int, dpi: int = 200, config: Optional[FigureConfig] = None
+  ) -> List[Tuple[FigureRegion, RenderedPage]]:
+    """
+    Tight crops of every figure on the page, rendered at their own (typically
+    higher) DPI, preceded by strips of the section headings they sit under.
+    """
+    config = config or FigureConfig()
+    crop_config = PDFExportConfig(dpi=dpi)
+    figures = self.find_figures(page_index, config)
+    headings = find_section_headings(self.document[page_index], figures, config) if figures else []
+    return [
+      (region, self.render_page(page_index, crop_config, clip=region.rect))
+      for region in headings + figures
+    ]
\ No newline at end of file
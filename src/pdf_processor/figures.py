@@ -0,0 +1,186 @@
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Tuple
+import fitz  # PyMuPDF
+from .text_layer import _rect_area, _table_boxes
+
+# --- Configuration Object ---
+
+@dataclass
+class FigureConfig:
+  """Tuning knobs for locating figures from a page's vector drawings and images."""
+  merge_gap: float = 12.0         # Points: drawings closer than this belong to one figure
+  label_margin: float = 36.0      # Points: pull in signal labels / captions around the art
+  min_area_ratio: float = 0.02    # Ignore specks (logos, bullets) below this share of the page
+  min_paths: int = 8              # A vector figure needs at least this many paths
+  padding: float = 4.0            # Points added around the final box
+  running_band: float = 0.07      # Share of the page height holding running headers/footers
+  min_sloped: int = 4             # A "table" with this many sloped strokes is artwork (waveforms, plots)
+
+@dataclass
+class FigureRegion:
+  """A figure's bounding box in PDF points (72 per inch, origin top-left)."""
+  x0: float
+  y0: float
+  x1: float
+  y1: float
+  kind: str  # "vector", "image", "mixed" or "heading" (section title strip)
+  path_count: int
+
+  @property
+  def rect(self) -> fitz.Rect:
+    return fitz.Rect(self.x0, self.y0, self.x1, self.y1)
+
+  def to_dict(self) -> Dict[str, Any]:
+    return asdict(self)
+
+# --- Detection ---
+
+def _sloped_strokes(drawings: List[Dict[str, Any]], box: fitz.Rect) -> int:
+  """Curves and non-axis-aligned lines drawn inside box."""
+  count = 0
+  for drawing in drawings:
+    if not box.contains(fitz.Rect(drawing["rect"])):
+      continue
+    for item in drawing["items"]:
+      if item[0] == "c":
+        count += 1
+      elif item[0] == "l" and abs(item[1].x - item[2].x) > 0.5 and abs(item[1].y - item[2].y) > 0.5:
+        count += 1
+  return count
+
+def _running_band(page_rect: fitz.Rect, config: FigureConfig) -> Tuple[float, float]:
+  """Top and bottom limits of the body, between the running header and footer."""
+  band = page_rect.height * config.running_band
+  return page_rect.y0 + band, page_rect.y1 - band
+
+def _merge_boxes(boxes: List[Dict[str, Any]], gap: float) -> List[Dict[str, Any]]:
+  """Greedy single-linkage merge of boxes whose gap-expanded rects touch."""
+  clusters = [dict(box) for box in boxes]
+  merged = True
+  while merged:
+    merged = False
+    result: List[Dict[str, Any]] = []
+    for box in clusters:
+      grown = fitz.Rect(box["rect"]) + (-gap, -gap, gap, gap)
+      for other in result:
+        if grown.intersects(other["rect"]):
+          other["rect"] = fitz.Rect(other["rect"]) | box["rect"]
+          other["paths"] += box["paths"]
+          other["images"] += box["images"]
+          merged = True
+          break
+      else:
+        result.append(box)
+    clusters = result
+  return clusters
+
+def find_figure_regions(page: fitz.Page, config: FigureConfig) -> List[FigureRegion]:
+  """
+  Locates figures (timing diagrams, block diagrams, embedded images) on a page.
+  Vector paths inside detected tables are ignored so table rulings are not
+  mistaken for waveforms. Nearby text (signal names, captions) is absorbed
+  into the box so the crop stays self-explanatory.
+  """
+  page_rect = page.rect
+  page_area = _rect_area(page_rect) or 1.0
+  body_top, body_bottom = _running_band(page_rect, config)
+  drawings = page.get_drawings()
+  # find_tables also boxes ruled artwork such as waveform grids; those have sloped edges
+  tables = [table for table in _table_boxes(page) if _sloped_strokes(drawings, table) < config.min_sloped]
+  words = [fitz.Rect(word[:4]) for word in page.get_text("words")]
+
+  boxes: List[Dict[str, Any]] = []
+  for drawing in drawings:
+    rect = fitz.Rect(drawing["rect"])
+    if any(table.contains(rect) for table in tables):
+      continue
+    # Give pure horizontal/vertical strokes (square-wave edges) a 1pt body,
+    # otherwise they are empty rects and never intersect anything
+    rect = fitz.Rect(rect.x0, rect.y0, max(rect.x1, rect.x0 + 1), max(rect.y1, rect.y0 + 1))
+    boxes.append({"rect": rect, "paths": 1, "images": 0})
+
+  for info in page.get_image_info():
+    boxes.append({"rect": fitz.Rect(info["bbox"]) & page_rect, "paths": 0, "images": 1})
+
+  regions: List[FigureRegion] = []
+  for cluster in _merge_boxes(boxes, config.merge_gap):
+    rect = fitz.Rect(cluster["rect"])
+    if _rect_area(rect) / page_area < config.min_area_ratio:
+      continue
+    if not cluster["images"] and cluster["paths"] < config.min_paths:
+      continue
+    if rect.y0 < body_top or rect.y1 > body_bottom:
+      # Logo and rules of the running header/footer
+      continue
+
+    # Absorb labels and captions that sit next to the artwork, word by word,
+    # so a neighbouring paragraph does not come along whole
+    reach = rect + (-config.label_margin, -config.label_margin, config.label_margin, config.label_margin)
+    for word_rect in words:
+      if word_rect.intersects(reach) and not any(table.intersects(word_rect) for table in tables):
+        rect |= word_rect
+
+    rect = (rect + (-config.padding, -config.padding, config.padding, config.padding)) & page_rect
+    kind = "mixed" if cluster["images"] and cluster["paths"] else ("image" if cluster["images"] else "vector")
+    regions.append(FigureRegion(rect.x0, rect.y0, rect.x1, rect.y1, kind, cluster["paths"]))
+
+  regions.sort(key=lambda region: (region.y0, region.x0))
+  return regions
+
+def find_section_headings(page: fitz.Page, regions: List[FigureRegion], config: FigureConfig) -> List[FigureRegion]:
+  """
+  The section title each figure sits under: the nearest bold line above it,
+  in its column, set larger than the body text. Tight crops rarely include
+  it, but it usually names the operating mode the diagram belongs to.
+  """
+  body_top, body_bottom = _running_band(page.rect, config)
+  lines = []
+  sizes: Dict[float, int] = {}
+  for block in page.get_text("dict")["blocks"]:
+    for line in block.get("lines", []):
+      spans = [span for span in line["spans"] if span["text"].strip()]
+      if not spans:
+        continue
+      for span in spans:
+        sizes[round(span["size"], 1)] = sizes.get(round(span["size"], 1), 0) + len(span["text"])
+      lines.append((fitz.Rect(line["bbox"]), spans))
+  if not sizes:
+    return []
+  body_size = max(sizes, key=sizes.get)
+
+  headings: List[FigureRegion] = []
+  for region in regions:
+    best = None
+    for rect, spans in lines:
+      if rect.y0 < body_top or rect.y1 > region.y0 or rect.x1 <= region.x0 or rect.x0 >= region.x1:
+        continue
+      bold = all(span["flags"] & 16 or "bold" in span["font"].lower() for span in spans)
+      if bold and min(span["size"] for span in spans) > body_size + 0.5 and (best is None or rect.y1 > best.y1):
+        best = rect
+    if best is None:
+      continue
+    box = (best + (-config.padding, -config.padding, config.padding, config.padding)) & page.rect
+    heading = FigureRegion(box.x0, box.y0, box.x1, box.y1, "heading", 0)
+    if heading not in headings:
+      headings.append(heading)
+  return headings
+
+def stack_images(images: List[Any], gap: int = 16):
+  """
+  Stacks several crops vertically on a white canvas so a page's diagrams
+  can be sent to a vision model as a single (still small) image.
+  """
+  from PIL import Image
+
+  if len(images) == 1:
+    return images[0]
+
+  width = max(image.width for image in images)
+  height = sum(image.height for image in images) + gap * (len(images) - 1)
+  canvas = Image.new("RGB", (width, height), "white")
+
+  y = 0
+  for image in images:
+    canvas.paste(image, (0, y))
+    y += image.height + gap
+  return canvas
@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import List
+import fitz  # PyMuPDF
+
+SUPPORTED_FORMATS = ("png", "jpg", "webp")
+SUPPORTED_COLORSPACES = ("rgb", "gray", "mono")
+
+# Threshold used when collapsing grayscale to 1-bit (keeps thin table rules)
+MONO_THRESHOLD = 160
+
+def _small_font_size(page: fitz.Page, percentile: float = 0.1) -> float:
+  """
+  Font size (pt) below which `percentile` of the page's characters fall.
+  Using a low percentile instead of the minimum ignores a stray footnote
+  marker but still catches table superscripts and waveform labels.
+  """
+  sizes: List[tuple] = []
+  for block in page.get_text("dict")["blocks"]:
+    for line in block.get("lines", []):
+      for span in line["spans"]:
+        chars = len(span["text"].strip())
+        if chars:
+          sizes.append((span["size"], chars))
+
+  if not sizes:
+    return 0.0
+
+  sizes.sort()
+  total = sum(chars for _, chars in sizes)
+  running = 0
+  for size, chars in sizes:
+    running += chars
+    if running >= total * percentile:
+      return size
+  return sizes[-1][0]
+
+def choose_page_dpi(
+  page: fitz.Page, default_dpi: int, min_dpi: int, max_dpi: int, target_px_per_em: float
+) -> int:
+  """
+  Picks the lowest resolution at which the page's small print still gets
+  `target_px_per_em` pixels per em. Pages without a text layer (scans) or with
+  drawn figures never drop below the default DPI, since waveform strokes and
+  labels have no font size to reason about.
+  """
+  small_font = _small_font_size(page)
+  if small_font <= 0:
+    return default_dpi
+
+  dpi = target_px_per_em * 72 / small_font
+  if page.get_drawings() or page.get_image_info():
+    dpi = max(dpi, default_dpi)
+
+  # Round to a multiple of 10 so neighbouring pages share zoom factors
+  dpi = int(round(dpi / 10.0) * 10)
+  return max(min_dpi, min(max_dpi, dpi))
+
+def render_pixmap(page: fitz.Page, dpi: int, colorspace: str, clip=None) -> fitz.Pixmap:
+  """Renders without alpha, in RGB or single-channel gray (gray also feeds 1-bit output)."""
+  zoom = dpi / 72
+  cs = fitz.csRGB if colorspace == "rgb" else fitz.csGRAY
+  return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=cs, clip=clip, alpha=False)
+
+def save_pixmap(
+  pix: fitz.Pixmap, output_path: Path, image_format: str, colorspace: str, quality: int, lossless: bool
+) -> Path:
+  """
+  Writes a pixmap in the requested format. Plain RGB/gray PNG goes through
+  PyMuPDF directly; WebP, JPEG and 1-bit output are encoded with Pillow.
+  """
+  if image_format == "png" and colorspace != "mono":
+    pix.save(output_path)
+    return output_path
+
+  from PIL import Image
+
+  mode = "RGB" if pix.n >= 3 else "L"
+  image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+  if colorspace == "mono":
+    image = image.point(lambda value: 255 if value > MONO_THRESHOLD else 0, mode="1")
+
+  if image_format == "webp":
+    # WebP has no 1-bit mode; gray is still compact for bilevel content
+    if image.mode == "1":
+      image = image.convert("L")
+    image.save(output_path, "WEBP", quality=quality, lossless=lossless, method=6)
+  elif image_format == "jpg":
+    if image.mode == "1":
+      image = image.convert("L")
+    image.save(output_path, "JPEG", quality=quality, optimize=True)
+  else:
+    image.save(output_path, "PNG", optimize=True)
+  return output_path
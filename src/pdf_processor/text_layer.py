@@ -0,0 +1,210 @@
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+import fitz  # PyMuPDF
+
+# --- Configuration Object ---
+
+@dataclass
+class TextLayerConfig:
+  """
+  Thresholds deciding whether a page's native text layer is trustworthy
+  enough to skip the VLM OCR pass.
+  """
+  min_chars: int = 100              # Fewer characters -> scanned page or empty text layer
+  min_text_coverage: float = 0.05   # Fraction of the page covered by text spans
+  max_image_coverage: float = 0.15  # Raster images above this -> figure or scan
+  max_figure_paths: int = 30        # Vector paths outside tables above this -> drawn figure
+  max_garbled_ratio: float = 0.02   # Share of U+FFFD / unmapped glyphs tolerated
+
+@dataclass
+class TextLayerDecision:
+  """Per-page routing decision (text layer vs. VLM OCR) and the evidence behind it."""
+  page_id: str
+  path: str  # "text" or "ocr"
+  reason: str
+  char_count: int
+  text_coverage: float
+  image_coverage: float
+  figure_paths: int
+  figures: int  # Regions find_figure_regions locates (any one sends the page to OCR)
+
+  def to_dict(self) -> Dict[str, Any]:
+    return asdict(self)
+
+# --- Analysis ---
+
+def _rect_area(rect: fitz.Rect) -> float:
+  return max(0.0, rect.width) * max(0.0, rect.height)
+
+def _inside_any(rect: fitz.Rect, boxes: List[fitz.Rect]) -> bool:
+  return any(box.contains(rect) for box in boxes)
+
+def _table_boxes(page: fitz.Page) -> List[fitz.Rect]:
+  try:
+    return [fitz.Rect(table.bbox) for table in page.find_tables().tables]
+  except Exception:
+    # find_tables is unavailable on old PyMuPDF builds
+    return []
+
+def analyze_text_layer(page: fitz.Page, config: TextLayerConfig) -> TextLayerDecision:
+  """
+  Measures the page's text layer and decides which extraction path to take.
+  Table rulings are excluded from the figure count, so spec tables stay on the text path;
+  a page with any located figure goes to OCR, however few paths the figure is drawn with.
+  """
+  from .figures import FigureConfig, find_figure_regions  # figures imports this module
+
+  page_id = f"page_{page.number + 1:03d}"
+  page_area = _rect_area(page.rect) or 1.0
+
+  text = page.get_text("text")
+  char_count = len(text.strip())
+  garbled = text.count("\ufffd")
+
+  text_area = 0.0
+  for block in page.get_text("dict")["blocks"]:
+    if block.get("type") == 0:
+      text_area += _rect_area(fitz.Rect(block["bbox"]))
+  text_coverage = min(1.0, text_area / page_area)
+
+  image_area = 0.0
+  for info in page.get_image_info():
+    image_area += _rect_area(fitz.Rect(info["bbox"]) & page.rect)
+  image_coverage = min(1.0, image_area / page_area)
+
+  tables = _table_boxes(page)
+  figure_paths = sum(
+    1 for drawing in page.get_drawings() if not _inside_any(fitz.Rect(drawing["rect"]), tables)
+  )
+  figures = len(find_figure_regions(page, FigureConfig()))
+
+  def decide(path: str, reason: str) -> TextLayerDecision:
+    return TextLayerDecision(
+      page_id=page_id, path=path, reason=reason, char_count=char_count,
+      text_coverage=round(text_coverage, 3), image_coverage=round(image_coverage, 3),
+      figure_paths=figure_paths, figures=figures
+    )
+
+  if char_count < config.min_chars:
+    return decide("ocr", f"scanned or empty text layer ({char_count} chars)")
+  if garbled / max(char_count, 1) > config.max_garbled_ratio:
+    return decide("ocr", f"unreliable text encoding ({garbled} unmapped glyphs)")
+  if image_coverage > config.max_image_coverage:
+    return decide("ocr", f"raster images cover {image_coverage:.0%} of the page")
+  if figure_paths > config.max_figure_paths:
+    return decide("ocr", f"vector figure detected ({figure_paths} paths outside tables)")
+  if figures:
+    return decide("ocr", f"{figures} figure(s) located on the page")
+  if text_coverage < config.min_text_coverage:
+    return decide("ocr", f"low text coverage ({text_coverage:.0%})")
+  return decide("text", "complete text layer")
+
+# --- Markdown Conversion ---
+
+def _body_font_size(blocks: List[Dict[str, Any]]) -> float:
+  """The most common span size (weighted by characters) is treated as body text."""
+  sizes: Dict[float, int] = {}
+  for block in blocks:
+    for line in block.get("lines", []):
+      for span in line["spans"]:
+        size = round(span["size"], 1)
+        sizes[size] = sizes.get(size, 0) + len(span["text"].strip())
+  return max(sizes, key=sizes.get) if sizes else 0.0
+
+def _block_to_markdown(block: Dict[str, Any], body_size: float) -> str:
+  lines = []
+  max_size = 0.0
+  all_bold = True
+  for line in block.get("lines", []):
+    spans = [span for span in line["spans"] if span["text"].strip()]
+    if not spans:
+      continue
+    lines.append(" ".join(span["text"].strip() for span in spans))
+    max_size = max(max_size, max(span["size"] for span in spans))
+    all_bold = all_bold and all(span["flags"] & 16 for span in spans)
+
+  text = " ".join(lines).strip()
+  if not text:
+    return ""
+
+  # Headings: noticeably larger than body text, or short all-bold lines
+  if body_size and max_size >= body_size * 1.3:
+    return f"## {text}"
+  if all_bold and len(text) < 80:
+    return f"### {text}"
+  return text
+
+def page_to_markdown(page: fitz.Page) -> str:
+  """
+  Converts a born-digital page into the same Markdown shape as the OCR output:
+  text blocks in reading order, headings by font size, tables as Markdown tables.
+  """
+  tables: List[Tuple[fitz.Rect, str]] = []
+  try:
+    for table in page.find_tables().tables:
+      tables.append((fitz.Rect(table.bbox), table.to_markdown()))
+  except Exception:
+    pass
+  table_boxes = [box for box, _ in tables]
+
+  blocks = [block for block in page.get_text("dict", sort=True)["blocks"] if block.get("type") == 0]
+  body_size = _body_font_size(blocks)
+
+  # (rect, markdown) fragments, merged so tables land where they sit on the page
+  fragments: List[Tuple[fitz.Rect, str]] = []
+  for block in blocks:
+    bbox = fitz.Rect(block["bbox"])
+    if any(box.intersects(bbox) and _rect_area(box & bbox) > 0.5 * _rect_area(bbox) for box in table_boxes):
+      continue
+    markdown = _block_to_markdown(block, body_size)
+    if markdown:
+      fragments.append((bbox, markdown))
+
+  for box, markdown in tables:
+    fragments.append((box, markdown.strip()))
+
+  return "\n\n".join(_reading_order(fragments, page.rect.width))
+
+def _column_ranges(fragments: List[Tuple[fitz.Rect, str]], page_width: float, min_ratio: float, max_ratio: float) -> List[List[float]]:
+  """x-ranges of the text columns, merged from body-width fragments only (labels and folios can straddle the gutter)."""
+  ranges: List[List[float]] = []
+  for rect, _ in sorted(fragments, key=lambda fragment: fragment[0].x0):
+    if not min_ratio * page_width <= rect.width <= max_ratio * page_width:
+      continue
+    if ranges and rect.x0 < ranges[-1][1] - 2:
+      ranges[-1][1] = max(ranges[-1][1], rect.x1)
+    else:
+      ranges.append([rect.x0, rect.x1])
+  return ranges
+
+def _reading_order(fragments: List[Tuple[fitz.Rect, str]], page_width: float, min_ratio: float = 0.2, max_ratio: float = 0.5) -> List[str]:
+  """
+  Column-aware reading order for multi-column (e.g. ADI two-column) pages.
+  Fragments that cross a gutter (titles, wide tables and figures, folios)
+  cut the page into bands; each band is read column by column, narrow
+  fragments joining the column under their centre.
+  """
+  by_position = sorted(fragments, key=lambda fragment: (fragment[0].y0, fragment[0].x0))
+  ranges = _column_ranges(fragments, page_width, min_ratio, max_ratio)
+  if len(ranges) < 2:
+    return [markdown for _, markdown in by_position]
+
+  def column_of(rect: fitz.Rect) -> Optional[int]:
+    covered = [index for index, (x0, x1) in enumerate(ranges) if min(rect.x1, x1) - max(rect.x0, x0) > 10]
+    if len(covered) > 1:
+      return None
+    center = (rect.x0 + rect.x1) / 2
+    return next((index for index, (x0, x1) in enumerate(ranges) if x0 - 2 <= center <= x1 + 2), None)
+
+  ordered: List[str] = []
+  band: List[List[str]] = [[] for _ in ranges]
+  for rect, markdown in by_position:
+    column = column_of(rect)
+    if column is None:
+      ordered.extend(markdown for members in band for markdown in members)
+      band = [[] for _ in ranges]
+      ordered.append(markdown)
+    else:
+      band[column].append(markdown)
+  ordered.extend(markdown for members in band for markdown in members)
+  return ordered
\ No newline at end of file
@@ -1,5 +1,8 @@
 import logging
+import os
 import sys
+from pathlib import Path
+from typing import List, Optional
 
 def setup_logger(name: str = "PDFProcessor", level: int = logging.INFO) -> logging.Logger:
   """
@@ -26,4 +29,44 @@ def setup_logger(name: str = "PDFProcessor", level: int = logging.INFO) -> loggi
     
     logger.addHandler(handler)
     
-  return logger
\ No newline at end of file
+  return logger
+
+def parse_page_range(spec: Optional[str]) -> Optional[List[int]]:
+  """
+  Parses a 1-based page selection string into a sorted list of page numbers.
+
+  Examples: "5" -> [5], "1-3,7" -> [1, 2, 3, 7]. None/empty -> None (all pages).
+  """
+  if not spec or not spec.strip():
+    return None
+
+  pages = set()
+  for part in spec.split(","):
+    part = part.strip()
+    if not part:
+      continue
+    if "-" in part:
+      start_str, end_str = part.split("-", 1)
+      start, end = int(start_str), int(end_str)
+      if start > end:
+        raise ValueError(f"Invalid page range '{part}' (start > end).")
+      pages.update(range(start, end + 1))
+    else:
+      pages.add(int(part))
+
+  if any(p < 1 for p in pages):
+    raise ValueError(f"Page numbers are 1-based: '{spec}'")
+  return sorted(pages)
+
+def atomic_write_text(path: Path, text: str, encoding: str = "utf-8") -> None:
+  """
+  Writes text via a temp file + rename, so readers never see a half-written file
+  (a crash leaves either the old content or the new one).
+  """
+  path = Path(path)
+  tmp_path = path.with_name(f".{path.name}.tmp")
+  with open(tmp_path, "w", encoding=encoding) as f:
+    f.write(text)
+    f.flush()
+    os.fsync(f.fileno())
+  os.replace(tmp_path, path)
\ No newline at end of file
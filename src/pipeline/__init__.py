@@ -0,0 +1,11 @@
+from .artifacts import ArtifactStore, hash_bytes, hash_file, hash_text, hash_json
+from .response_cache import ResponseCache, configure_response_cache, get_response_cache
+from .progress import ProgressManifest, write_combined_markdown
+from .tracing import Tracer, get_tracer, span, traced
+
+__all__ = [
+  "ArtifactStore", "hash_bytes", "hash_file", "hash_text", "hash_json",
+  "ResponseCache", "configure_response_cache", "get_response_cache",
+  "ProgressManifest", "write_combined_markdown",
+  "Tracer", "get_tracer", "span", "traced"
+]
\ No newline at end of file
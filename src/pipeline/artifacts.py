@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from pdf_processor.utils import setup_logger, atomic_write_text
+
+STORE_FILENAME = "_artifacts.json"
+
+# --- Hash Helpers ---
+
+def hash_bytes(data: bytes) -> str:
+  return hashlib.sha256(data).hexdigest()
+
+def hash_text(text: str) -> str:
+  return hash_bytes(text.encode("utf-8"))
+
+def hash_json(obj: Any) -> str:
+  """Order-independent hash of a JSON-serializable object."""
+  return hash_text(json.dumps(obj, sort_keys=True, ensure_ascii=False))
+
+def hash_file(path: Path, chunk_size: int = 1 << 20) -> str:
+  digest = hashlib.sha256()
+  with open(path, "rb") as f:
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+# --- Store ---
+
+class ArtifactStore:
+  """
+  Content-addressed index of derived artifacts for one output directory.
+
+  Every artifact is recorded per (stage, key) together with a fingerprint of
+  everything that produced it (input hashes, model name, prompt, parameters)
+  and the hashes of the files it wrote. An artifact is reused only if the
+  fingerprint matches AND its output files are still present and unmodified.
+  Safe to share between pipeline threads.
+  """
+
+  def __init__(self, root: Path, filename: str = STORE_FILENAME):
+    self.logger = setup_logger("ArtifactStore")
+    self.root = Path(root)
+    self.path = self.root / filename
+    self.records: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    self.stats: Dict[str, Dict[str, int]] = {}
+    self._lock = threading.RLock()
+
+    if self.path.exists():
+      try:
+        with open(self.path, "r", encoding="utf-8") as f:
+          self.records = json.load(f)
+      except (OSError, json.JSONDecodeError) as e:
+        self.logger.warning(f"Ignoring unreadable artifact index {self.path.name}: {e}")
+
+  @staticmethod
+  def fingerprint(
+    inputs: Dict[str, Optional[str]],
+    model: Optional[str] = None,
+    prompt: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None
+  ) -> str:
+    """Single hash over input hashes, model identity, prompt text and parameters."""
+    return hash_json({
+      "inputs": inputs,
+      "model": model,
+      "prompt": hash_text(prompt) if prompt is not None else None,
+      "params": params or {}
+    })
+
+  def has_stage(self, stage: str) -> bool:
+    return bool(self.records.get(stage))
+
+  def lookup(self, stage: str, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Returns the record if it is fresh, else None. Does not touch the stats."""
+    with self._lock:
+      record = self.records.get(stage, {}).get(key)
+    if not record or record.get("fingerprint") != fingerprint:
+      return None
+
+    for rel_path, digest in record.get("outputs", {}).items():
+      output_path = self.root / rel_path
+      if not output_path.exists() or hash_file(output_path) != digest:
+        return None
+    return record
+
+  def reuse(self, stage: str, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Like lookup(), but counts a hit as 'reused' in the summary."""
+    record = self.lookup(stage, key, fingerprint)
+    if record is not None:
+      self._count(stage, "reused")
+    return record
+
+  def record(
+    self,
+    stage: str,
+    key: str,
+    fingerprint: str,
+    inputs: Dict[str, Optional[str]],
+    outputs: Optional[List[Path]] = None,
+    model: Optional[str] = None,
+    prompt: Optional[str] = None,
+    payload: Any = None
+  ) -> Dict[str, Any]:
+    """Registers a freshly built artifact (counted as 'rebuilt')."""
+    entry = {
+      "fingerprint": fingerprint,
+      "inputs": inputs,
+      "model": model,
+      "prompt_hash": hash_text(prompt) if prompt is not None else None,
+      "outputs": {
+        self._relative(path): hash_file(path) for path in (outputs or []) if Path(path).exists()
+      },
+      "payload": payload
+    }
+    with self._lock:
+      self.records.setdefault(stage, {})[key] = entry
+      self._count(stage, "rebuilt")
+    return entry
+
+  def save(self) -> None:
+    self.root.mkdir(parents=True, exist_ok=True)
+    with self._lock:
+      atomic_write_text(self.path, json.dumps(self.records, indent=2, sort_keys=True))
+
+  def summary(self) -> str:
+    """Human-readable reused/rebuilt table for the stages touched this run."""
+    if not self.stats:
+      return "[Artifacts] Nothing processed."
+
+    lines = [f"[Artifacts] {self.path}"]
+    for stage, counts in self.stats.items():
+      lines.append(
+        f"  {stage:<12} reused: {counts.get('reused', 0):>4}   rebuilt: {counts.get('rebuilt', 0):>4}"
+      )
+    return "\n".join(lines)
+
+  def _count(self, stage: str, outcome: str) -> None:
+    with self._lock:
+      counts = self.stats.setdefault(stage, {})
+      counts[outcome] = counts.get(outcome, 0) + 1
+
+  def _relative(self, path: Path) -> str:
+    return Path(os.path.relpath(Path(path), self.root)).as_posix()
@@ -0,0 +1,52 @@
+from typing import Any, Callable, Optional
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from .artifacts import hash_text
+from .response_cache import ResponseCache, get_response_cache
+
+class LangChainResponseCache(BaseCache):
+  """
+  Adapter that lets LangChain chat models (passed as `cache=`) store their
+  generations in the shared ResponseCache. The key covers the serialized
+  messages and the model's full parameter string (model name, temperature,
+  bound tools...), so agent turns are cached per exact conversation state.
+
+  With `validate` (e.g. the chain's output parser), only generations it
+  accepts are stored, and stored ones it rejects are treated as misses, so
+  a malformed answer is re-asked instead of replayed on every run.
+  """
+
+  def __init__(self, cache: Optional[ResponseCache] = None, validate: Optional[Callable[[str], Any]] = None):
+    self.cache = cache or get_response_cache()
+    self.validate = validate
+
+  def _valid(self, return_val: RETURN_VAL_TYPE) -> bool:
+    if self.validate is None:
+      return True
+    try:
+      for generation in return_val:
+        self.validate(generation.text)
+    except Exception:
+      return False
+    return True
+
+  def _key(self, prompt: str, llm_string: str) -> str:
+    return ResponseCache.make_key("langchain", None, hash_text(prompt), {"llm": hash_text(llm_string)})
+
+  def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+    value = self.cache.get(self._key(prompt, llm_string))
+    if value is None:
+      return None
+    try:
+      return_val = loads(value)
+    except Exception:
+      # Written by an incompatible LangChain version: treat as a miss
+      return None
+    return return_val if self._valid(return_val) else None
+
+  def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+    if self._valid(return_val):
+      self.cache.put(self._key(prompt, llm_string), dumps(return_val))
+
+  def clear(self, **kwargs: Any) -> None:
+    self.cache.clear()
@@ -0,0 +1,61 @@
+import threading
+from typing import Any, Dict, List
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from .tracing import get_tracer
+
+class TraceCallbackHandler(BaseCallbackHandler):
+  """
+  Records a span per chat-model call (with token usage) and per tool call.
+  Pass it as `callbacks=[...]` to a chat model, or in the `config` of a
+  LangGraph invoke to cover the tools as well. Does nothing unless tracing
+  is enabled.
+  """
+
+  def __init__(self, category: str):
+    self.category = category
+    self._open: Dict[UUID, tuple] = {}
+    self._lock = threading.Lock()
+
+  def _start(self, run_id: UUID, name: str) -> None:
+    tracer = get_tracer()
+    if not tracer.enabled:
+      return
+    manager = tracer.span(name, self.category)
+    current = manager.__enter__()
+    with self._lock:
+      self._open[run_id] = (manager, current)
+
+  def _finish(self, run_id: UUID, **counters: Any) -> None:
+    with self._lock:
+      entry = self._open.pop(run_id, None)
+    if entry:
+      manager, current = entry
+      current.add(**counters)
+      manager.__exit__(None, None, None)
+
+  def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+    params = kwargs.get("invocation_params") or {}
+    self._start(run_id, f"llm:{params.get('model') or params.get('model_name') or 'chat'}")
+
+  def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+    tokens_in = tokens_out = 0
+    for generations in response.generations:
+      for generation in generations:
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+        tokens_in += usage.get("input_tokens", 0)
+        tokens_out += usage.get("output_tokens", 0)
+    self._finish(run_id, tokens_in=tokens_in, tokens_out=tokens_out)
+
+  def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+    self._finish(run_id, error=str(error))
+
+  def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+    self._start(run_id, f"tool:{(serialized or {}).get('name', 'tool')}")
+
+  def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+    self._finish(run_id)
+
+  def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+    self._finish(run_id, error=str(error))
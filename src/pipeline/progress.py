@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+from pdf_processor.utils import setup_logger, atomic_write_text
+from .artifacts import hash_json
+
+PROGRESS_FILENAME = "_progress.json"
+
+class ProgressManifest:
+  """
+  Pages a run has fully finished, saved atomically after every chunk so an
+  interrupted run can resume where it stopped. A page is complete once its
+  markdown is on disk and any timing extraction for it has finished, under
+  the same run `settings` (e.g. a page finished without timing extraction is
+  not complete for a run with it).
+  """
+
+  def __init__(self, root: Path, filename: str = PROGRESS_FILENAME, settings: Optional[Dict[str, Any]] = None):
+    self.logger = setup_logger("Progress")
+    self.root = Path(root)
+    self.path = self.root / filename
+    self.settings = settings or {}
+    self.settings_hash = hash_json(self.settings)
+    self.pages: Dict[str, Dict[str, Any]] = {}
+    # hash -> settings, for every settings hash a recorded page refers to
+    self._known_settings: Dict[str, Dict[str, Any]] = {}
+    self._lock = threading.Lock()
+
+    if self.path.exists():
+      try:
+        with open(self.path, "r", encoding="utf-8") as f:
+          data = json.load(f)
+        self.pages = data.get("pages", {})
+        self._known_settings = data.get("settings", {})
+      except (OSError, json.JSONDecodeError) as e:
+        self.logger.warning(f"Ignoring unreadable progress file {self.path.name}: {e}")
+
+  def is_complete(self, page_id: str) -> bool:
+    """Complete per the manifest, under the current settings, AND its markdown still exists."""
+    with self._lock:
+      entry = self.pages.get(page_id)
+      if entry is None or entry.get("settings") != self.settings_hash:
+        return False
+    return (self.root / f"{page_id}.md").exists()
+
+  def complete(self, page_id: str, **info: Any) -> None:
+    with self._lock:
+      self.pages[page_id] = {"completed_at": round(time.time(), 3), "settings": self.settings_hash, **info}
+
+  def discard(self, page_id: str) -> None:
+    with self._lock:
+      self.pages.pop(page_id, None)
+
+  def save(self) -> None:
+    self.root.mkdir(parents=True, exist_ok=True)
+    with self._lock:
+      known = {**self._known_settings, self.settings_hash: self.settings}
+      used = {entry.get("settings") for entry in self.pages.values()}
+      document = {"settings": {key: value for key, value in known.items() if key in used}, "pages": self.pages}
+      atomic_write_text(self.path, json.dumps(document, indent=2, sort_keys=True))
+
+def write_combined_markdown(
+  root: Path, page_ids: Optional[Iterable[str]] = None, filename: str = "_full_datasheet.md"
+) -> Path:
+  """
+  Rebuilds the combined document by streaming the per-page files in order,
+  so only one page is in memory at a time. Written via temp file + rename.
+  Without page_ids, every page_*.md in root is included (earlier runs' too).
+  """
+  root = Path(root)
+  if page_ids is None:
+    page_ids = sorted(page_path.stem for page_path in root.glob("page_*.md"))
+  path = root / filename
+  tmp_path = path.with_name(f".{path.name}.tmp")
+  with open(tmp_path, "w", encoding="utf-8") as out:
+    separator = ""
+    for page_id in page_ids:
+      page_path = root / f"{page_id}.md"
+      if not page_path.exists():
+        continue
+      with open(page_path, "r", encoding="utf-8") as f:
+        text = f.read().removeprefix("\n\n")
+      out.write(f"{separator}\n\n\n{text}")
+      separator = "\n"
+  tmp_path.replace(path)
+  return path
@@ -0,0 +1,165 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from .artifacts import hash_json, hash_text
+
+DEFAULT_CACHE_DIR = Path(os.getenv("RTL_CACHE_DIR", Path.home() / ".cache" / "rtl_pipeline"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30.0
+
+class ResponseCache:
+  """
+  On-disk cache of model responses shared by every model call in the pipeline.
+
+  Entries are keyed by model name, prompt template, call parameters and a
+  hash of the input (page text, image bytes, manifest...). Old entries are
+  dropped after `max_age_days`; past `max_bytes` the least recently used
+  ones go first. A disabled cache (bypass) misses every lookup and stores
+  nothing. Safe to share between threads.
+  """
+
+  def __init__(
+    self,
+    path: Optional[Path] = None,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+    enabled: bool = True
+  ):
+    self.path = Path(path) if path else DEFAULT_CACHE_DIR / "responses.sqlite3"
+    self.max_bytes = max_bytes
+    self.max_age = max_age_days * 86400
+    self.enabled = enabled
+    self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+    self._lock = threading.Lock()
+    self._conn: Optional[sqlite3.Connection] = None
+
+  def _db(self) -> sqlite3.Connection:
+    """Opens the database on first use (call with the lock held)."""
+    if self._conn is None:
+      self.path.parent.mkdir(parents=True, exist_ok=True)
+      self._conn = sqlite3.connect(self.path, check_same_thread=False)
+      self._conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses ("
+        " key TEXT PRIMARY KEY, model TEXT, value TEXT NOT NULL,"
+        " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+      )
+      self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+      self._conn.commit()
+    return self._conn
+
+  @staticmethod
+  def make_key(
+    model: str,
+    prompt: Optional[str],
+    input_hash: str,
+    params: Optional[Dict[str, Any]] = None
+  ) -> str:
+    return hash_json({
+      "model": model,
+      "prompt": hash_text(prompt) if prompt is not None else None,
+      "input": input_hash,
+      "params": params or {}
+    })
+
+  def get(self, key: str) -> Optional[str]:
+    if not self.enabled:
+      self.stats["misses"] += 1
+      return None
+
+    now = time.time()
+    with self._lock:
+      db = self._db()
+      row = db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+      if row and now - row[1] <= self.max_age:
+        db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        db.commit()
+        self.stats["hits"] += 1
+        return row[0]
+      self.stats["misses"] += 1
+      return None
+
+  def put(self, key: str, value: str, model: Optional[str] = None) -> None:
+    if not self.enabled:
+      return
+
+    now = time.time()
+    with self._lock:
+      db = self._db()
+      db.execute(
+        "INSERT OR REPLACE INTO responses (key, model, value, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+        (key, model, value, len(value.encode("utf-8")), now, now)
+      )
+      self.stats["writes"] += 1
+      self._evict(db, now)
+      db.commit()
+
+  def cached(
+    self,
+    model: str,
+    prompt: Optional[str],
+    input_hash: str,
+    compute: Callable[[], str],
+    params: Optional[Dict[str, Any]] = None
+  ) -> str:
+    """Returns the cached response, or computes and stores it."""
+    key = self.make_key(model, prompt, input_hash, params)
+    value = self.get(key)
+    if value is None:
+      value = compute()
+      self.put(key, value, model=model)
+    return value
+
+  def clear(self) -> None:
+    if not self.enabled:
+      return
+    with self._lock:
+      db = self._db()
+      db.execute("DELETE FROM responses")
+      db.commit()
+
+  def _evict(self, db: sqlite3.Connection, now: float) -> None:
+    """Drops expired entries, then least recently used ones until under max_bytes."""
+    expired = db.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age,)).rowcount
+    self.stats["evictions"] += max(expired, 0)
+
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= self.max_bytes:
+      return
+
+    for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+      if total <= self.max_bytes:
+        break
+      db.execute("DELETE FROM responses WHERE key = ?", (key,))
+      total -= size
+      self.stats["evictions"] += 1
+
+  def summary(self) -> str:
+    if not self.enabled:
+      return "[Response Cache] Bypassed."
+    lookups = self.stats["hits"] + self.stats["misses"]
+    if not lookups:
+      return f"[Response Cache] {self.path}: no model calls."
+    return (
+      f"[Response Cache] {self.path}: {self.stats['hits']}/{lookups} hits, "
+      f"{self.stats['writes']} stored, {self.stats['evictions']} evicted"
+    )
+
+# --- Process-wide default ---
+
+_default_cache: Optional[ResponseCache] = None
+
+def configure_response_cache(**kwargs) -> ResponseCache:
+  """Replaces the shared cache (e.g. from CLI flags); see ResponseCache for options."""
+  global _default_cache
+  _default_cache = ResponseCache(**kwargs)
+  return _default_cache
+
+def get_response_cache() -> ResponseCache:
+  """The shared cache used by model wrappers that were not given one explicitly."""
+  global _default_cache
+  if _default_cache is None:
+    _default_cache = ResponseCache(enabled=os.getenv("RTL_NO_CACHE") != "1")
+  return _default_cache
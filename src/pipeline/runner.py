@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List
+from pdf_processor.utils import setup_logger
+from .tracing import span
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+@dataclass
+class Stage:
+  """
+  One step of a StreamingPipeline.
+
+  `fn` takes an item and returns the item for the next stage (None drops
+  it). A batched stage's `fn` always takes a list of whatever is queued (up
+  to batch_size, without waiting for more) and returns a list, even when
+  batch_size is 1.
+  """
+  name: str
+  fn: Callable[[Any], Any]
+  workers: int = 1
+  queue_size: int = 4
+  batch_size: int = 1
+  batched: bool = False
+
+@dataclass
+class StageStats:
+  items: int = 0
+  errors: int = 0
+  busy_seconds: float = 0.0
+  max_queued: int = 0
+  _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+class StreamingPipeline:
+  """
+  Runs stages concurrently, connected by bounded queues.
+
+  Each stage has its own worker threads, so page N can be in stage 2 while
+  page N+1 is in stage 1. A full queue blocks the stage feeding it
+  (back-pressure): at most queue_size items wait in front of each stage,
+  and the source iterable is only advanced when the first queue has room.
+  An exception in a stage drops that item, is logged, and counted.
+  """
+
+  def __init__(self, stages: List[Stage]):
+    if not stages:
+      raise ValueError("A pipeline needs at least one stage.")
+    self.logger = setup_logger("Pipeline")
+    self.stages = stages
+    self.stats: Dict[str, StageStats] = {stage.name: StageStats() for stage in stages}
+    self.errors: List[Dict[str, Any]] = []
+    self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+    self._finished = [0] * len(stages)
+    self._finish_lock = threading.Lock()
+
+  def run(self, source: Iterable[Any]) -> List[Any]:
+    """Feeds `source` through every stage; returns the last stage's outputs in completion order."""
+    results: List[Any] = []
+    threads = [threading.Thread(target=self._feed, args=(source,), name="pipeline-source", daemon=True)]
+    for index, stage in enumerate(self.stages):
+      for worker in range(stage.workers):
+        threads.append(threading.Thread(
+          target=self._work, args=(index, results), name=f"pipeline-{stage.name}-{worker}", daemon=True
+        ))
+
+    start_time = time.perf_counter()
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.wall_seconds = time.perf_counter() - start_time
+    return results
+
+  def _feed(self, source: Iterable[Any]):
+    try:
+      for item in source:
+        self._put(0, item)
+    except Exception as e:
+      self.logger.error(f"Source failed: {e}")
+      self.errors.append({"stage": "source", "error": str(e)})
+    finally:
+      for _ in range(self.stages[0].workers):
+        self._queues[0].put(_DONE)
+
+  def _put(self, index: int, item: Any):
+    self._queues[index].put(item)
+    stats = self.stats[self.stages[index].name]
+    with stats._lock:
+      stats.max_queued = max(stats.max_queued, self._queues[index].qsize())
+
+  def _take(self, index: int) -> List[Any]:
+    """Blocks for one item, then tops up the batch with whatever is already queued."""
+    stage = self.stages[index]
+    items = [self._queues[index].get()]
+    while len(items) < stage.batch_size and items[-1] is not _DONE:
+      try:
+        items.append(self._queues[index].get_nowait())
+      except queue.Empty:
+        break
+    return items
+
+  def _work(self, index: int, results: List[Any]):
+    stage = self.stages[index]
+    stats = self.stats[stage.name]
+    last = index == len(self.stages) - 1
+
+    while True:
+      items = self._take(index)
+      done = items[-1] is _DONE
+      if done:
+        items.pop()
+
+      if items:
+        start_time = time.perf_counter()
+        try:
+          with span(stage.name, "stage", items=len(items)):
+            if stage.batched:
+              outputs = stage.fn(items) or []
+            else:
+              outputs = [stage.fn(items[0])]
+        except Exception as e:
+          outputs = []
+          with stats._lock:
+            stats.errors += len(items)
+          self.errors.append({"stage": stage.name, "error": str(e)})
+          self.logger.error(f"[{stage.name}] {e}")
+
+        with stats._lock:
+          stats.items += len(items)
+          stats.busy_seconds += time.perf_counter() - start_time
+
+        for output in outputs:
+          if output is None:
+            continue
+          if last:
+            results.append(output)
+          else:
+            self._put(index + 1, output)
+
+      if done:
+        break
+
+    # The last worker of a stage to finish closes the next queue
+    with self._finish_lock:
+      self._finished[index] += 1
+      closing = self._finished[index] == stage.workers
+    if closing and not last:
+      for _ in range(self.stages[index + 1].workers):
+        self._queues[index + 1].put(_DONE)
+
+  def summary(self) -> str:
+    lines = [f"[Pipeline] {getattr(self, 'wall_seconds', 0.0):.1f}s wall"]
+    for stage in self.stages:
+      stats = self.stats[stage.name]
+      lines.append(
+        f"  {stage.name:<10} x{stage.workers}  items: {stats.items:>4}  errors: {stats.errors:>3}  "
+        f"busy: {stats.busy_seconds:>7.1f}s  max queued: {stats.max_queued}/{stage.queue_size}"
+      )
+    return "\n".join(lines)
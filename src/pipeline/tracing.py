@@ -0,0 +1,200 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+  import psutil
+except ImportError:  # optional; /proc/self/statm is enough on Linux
+  psutil = None
+
+# Counters summed per stage in the summary table
+COUNTERS = ("tokens_in", "tokens_out", "bytes_sent")
+
+# Seconds between RSS samples while spans are open
+RSS_SAMPLE_INTERVAL = 0.05
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _rss_mb() -> Optional[float]:
+  """Current resident set size (not the lifetime high-water mark)."""
+  if psutil is not None:
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+  except (OSError, IndexError, ValueError):
+    return None
+
+class Span:
+  """One timed operation. Counters (tokens, bytes...) can be added while it runs."""
+
+  __slots__ = ("name", "category", "args", "start", "end", "thread_id", "rss_start", "rss_peak")
+
+  def __init__(self, name: str, category: str, args: Dict[str, Any]):
+    self.name = name
+    self.category = category
+    self.args = args
+    self.thread_id = threading.get_ident()
+    self.start = time.perf_counter()
+    self.end: Optional[float] = None
+    self.rss_start = self.rss_peak = _rss_mb()
+
+  def sample_rss(self, rss: Optional[float]) -> None:
+    if rss is not None and self.rss_peak is not None:
+      self.rss_peak = max(self.rss_peak, rss)
+
+  def finish(self) -> None:
+    """Stops the clock and records RSS at the end, the delta and the in-span peak."""
+    self.end = time.perf_counter()
+    rss_end = _rss_mb()
+    self.sample_rss(rss_end)
+    if self.rss_start is None or rss_end is None:
+      return
+    self.args["rss_start_mb"] = round(self.rss_start, 1)
+    self.args["rss_delta_mb"] = round(rss_end - self.rss_start, 1)
+    self.args["rss_peak_mb"] = round(self.rss_peak, 1)
+
+  def add(self, **counters: Any) -> None:
+    for key, value in counters.items():
+      if value is None:
+        continue
+      if isinstance(value, (int, float)) and isinstance(self.args.get(key), (int, float)):
+        self.args[key] += value
+      else:
+        self.args[key] = value
+
+  @property
+  def seconds(self) -> float:
+    return (self.end or time.perf_counter()) - self.start
+
+class _NullSpan:
+  """Returned while tracing is off, so instrumented code needs no checks."""
+
+  def add(self, **counters: Any) -> None:
+    pass
+
+_NULL_SPAN = _NullSpan()
+
+class Tracer:
+  """
+  Collects spans from every thread of the process while enabled.
+
+  Exports a Chrome / Perfetto trace (chrome://tracing, ui.perfetto.dev) and
+  a per-stage summary of wall time, tokens, bytes sent and RSS. RSS is read
+  at each span's start and end, and sampled by a background thread while
+  spans are open, so every span gets its own growth and in-span peak.
+  """
+
+  def __init__(self):
+    self.enabled = False
+    self.spans: List[Span] = []
+    self._open: Dict[int, Span] = {}
+    self._lock = threading.Lock()
+    self._origin = time.perf_counter()
+    self._sampler: Optional[threading.Thread] = None
+
+  def enable(self) -> None:
+    self.enabled = True
+    self._origin = time.perf_counter()
+    if self._sampler is None and _rss_mb() is not None:
+      self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+      self._sampler.start()
+
+  def _sample_rss(self) -> None:
+    while self.enabled:
+      time.sleep(RSS_SAMPLE_INTERVAL)
+      with self._lock:
+        open_spans = list(self._open.values())
+      if open_spans:
+        rss = _rss_mb()
+        for current in open_spans:
+          current.sample_rss(rss)
+    self._sampler = None
+
+  @contextmanager
+  def span(self, name: str, category: str = "pipeline", **args: Any) -> Iterator[Any]:
+    if not self.enabled:
+      yield _NULL_SPAN
+      return
+
+    current = Span(name, category, dict(args))
+    with self._lock:
+      self._open[id(current)] = current
+    try:
+      yield current
+    finally:
+      current.finish()
+      with self._lock:
+        del self._open[id(current)]
+        self.spans.append(current)
+
+  def write_chrome_trace(self, path: Path) -> Path:
+    events = []
+    thread_ids: Dict[int, int] = {}
+    for span in self.spans:
+      tid = thread_ids.setdefault(span.thread_id, len(thread_ids) + 1)
+      events.append({
+        "name": span.name,
+        "cat": span.category,
+        "ph": "X",
+        "ts": round((span.start - self._origin) * 1e6, 1),
+        "dur": round(span.seconds * 1e6, 1),
+        "pid": os.getpid(),
+        "tid": tid,
+        "args": span.args
+      })
+    path = Path(path)
+    with open(path, "w", encoding="utf-8") as f:
+      json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+  def summary(self) -> str:
+    if not self.spans:
+      return "[Profile] No spans recorded."
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    for span in self.spans:
+      stage = stages.setdefault(f"{span.category}/{span.name}", {"count": 0, "seconds": 0.0, "max": 0.0, "rss": 0.0, "delta": 0.0})
+      stage["count"] += 1
+      stage["seconds"] += span.seconds
+      stage["max"] = max(stage["max"], span.seconds)
+      stage["rss"] = max(stage["rss"], span.args.get("rss_peak_mb") or 0.0)
+      stage["delta"] = max(stage["delta"], span.args.get("rss_delta_mb") or 0.0)
+      for counter in COUNTERS:
+        stage[counter] = stage.get(counter, 0) + (span.args.get(counter) or 0)
+
+    lines = [
+      f"[Profile] {'stage':<32} {'calls':>6} {'total s':>9} {'mean s':>8} {'max s':>8} "
+      f"{'tok in':>9} {'tok out':>9} {'MB sent':>8} {'peak RSS':>9} {'max +RSS':>9}"
+    ]
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]["seconds"]):
+      lines.append(
+        f"          {name:<32} {stage['count']:>6} {stage['seconds']:>9.2f} {stage['seconds'] / stage['count']:>8.3f} "
+        f"{stage['max']:>8.2f} {stage['tokens_in']:>9} {stage['tokens_out']:>9} "
+        f"{stage['bytes_sent'] / 1e6:>8.2f} {stage['rss']:>8.0f}M {stage['delta']:>8.0f}M"
+      )
+    return "\n".join(lines)
+
+_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+  return _tracer
+
+def span(name: str, category: str = "pipeline", **args: Any):
+  """`with span("generate", "ocr") as s: ...; s.add(tokens_out=n)` on the process-wide tracer."""
+  return _tracer.span(name, category, **args)
+
+def traced(name: Optional[str] = None, category: str = "pipeline") -> Callable:
+  """Decorator form of span() (span name defaults to the function name)."""
+  def decorator(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+      with _tracer.span(name or fn.__name__, category):
+        return fn(*args, **kwargs)
+    return wrapper
+  return decorator
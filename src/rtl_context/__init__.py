@@ -2,8 +2,10 @@ from .schema import PageAnalysis, PageType, KnowledgeNode, NodeType
 from .classifier import PageClassifier
 from .tree_builder import KnowledgeTreeBuilder
 from .tree_utils import TreeNavigator
+from .prefilter import LexicalPrefilter, prefilter_report
 
 __all__ = [
   "PageAnalysis", "PageType", "KnowledgeNode", "NodeType",
-  "PageClassifier", "KnowledgeTreeBuilder", "TreeNavigator"
+  "PageClassifier", "KnowledgeTreeBuilder", "TreeNavigator",
+  "LexicalPrefilter", "prefilter_report"
 ]
\ No newline at end of file
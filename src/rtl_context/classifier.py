@@ -1,15 +1,29 @@
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
+from typing import Iterator, List, Optional, Tuple
+from pipeline.response_cache import ResponseCache
+from pipeline.langchain_cache import LangChainResponseCache
+from pipeline.langchain_tracing import TraceCallbackHandler
+from pipeline.tracing import span
 from .schema import PageAnalysis, PageType
+from .digest import build_digest
 
 class PageClassifier:
   # UPDATED: Defaults to the Qwen3 14B model you pulled
-  def __init__(self, model_name: str = "qwen3:14b"):
-    self.llm = ChatOllama(model=model_name, temperature=0, format="json")
+  def __init__(
+    self, model_name: str = "qwen3:14b", cache: Optional[ResponseCache] = None, digest_budget: Optional[int] = None
+  ):
+    self.model_name = model_name
+    # With a budget, pages are sent as compact digests instead of truncated markdown
+    self.digest_budget = digest_budget
     self.parser = PydanticOutputParser(pydantic_object=PageAnalysis)
+    # Only answers that parse are cached, so failed classifications are retried
+    self.llm = ChatOllama(model=model_name, temperature=0, format="json",
+      cache=LangChainResponseCache(cache, validate=self.parser.parse), callbacks=[TraceCallbackHandler("rtl_context")]
+    )
     
-    system_prompt = (
+    self.system_prompt = (
       "You are a Senior FPGA Verification Engineer. "
       "Your job is to analyze datasheet pages and filter them for RTL development.\n"
       "Ignore marketing fluff, mechanical drawings, and ordering guides.\n"
@@ -19,28 +33,52 @@ class PageClassifier:
     )
     
     self.prompt = ChatPromptTemplate.from_messages([
-      ("system", system_prompt),
+      ("system", self.system_prompt),
       ("human", "Page ID: {page_id}\n\nContent Snippet:\n{page_content}")
     ])
     
     self.chain = self.prompt | self.llm | self.parser
 
-  def analyze_page(self, page_id: str, content: str) -> PageAnalysis:
+  @property
+  def prompt_params(self) -> dict:
+    """Part of the classification cache key: a digest is a different input than raw markdown."""
+    return {"digest_budget": self.digest_budget} if self.digest_budget else {}
+
+  def _chain_input(self, page_id: str, content: str) -> dict:
     # Qwen3 has a large context window, so we can be generous
-    safe_content = content[:12000]
-    
+    page_content = build_digest(content, self.digest_budget) if self.digest_budget else content[:12000]
+    return {
+      "page_id": page_id,
+      "page_content": page_content,
+      "format_instructions": self.parser.get_format_instructions()
+    }
+
+  @staticmethod
+  def _failed(page_id: str, error: Exception) -> PageAnalysis:
+    print(f"   [X] Classification error on {page_id}: {error}")
+    return PageAnalysis(
+      page_id=page_id,
+      page_type=PageType.IRRELEVANT,
+      relevance_score=0,
+      summary="Classification Failed",
+      key_signals=[]
+    )
+
+  def analyze_page(self, page_id: str, content: str) -> PageAnalysis:
     try:
-      return self.chain.invoke({
-        "page_id": page_id,
-        "page_content": safe_content,
-        "format_instructions": self.parser.get_format_instructions()
-      })
+      with span("classify", "rtl_context", page=page_id):
+        return self.chain.invoke(self._chain_input(page_id, content))
     except Exception as e:
-      print(f"   [X] Classification error on {page_id}: {e}")
-      return PageAnalysis(
-        page_id=page_id,
-        page_type=PageType.IRRELEVANT,
-        relevance_score=0,
-        summary="Classification Failed",
-        key_signals=[]
-      )
\ No newline at end of file
+      return self._failed(page_id, e)
+
+  def analyze_pages(self, pages: List[Tuple[str, str]], max_concurrency: int = 4) -> Iterator[Tuple[int, PageAnalysis]]:
+    """
+    Classifies (page_id, content) pairs with up to max_concurrency requests in
+    flight. Yields (index into pages, analysis) in completion order. Ollama
+    only runs them in parallel up to its OLLAMA_NUM_PARALLEL setting.
+    """
+    inputs = [self._chain_input(page_id, content) for page_id, content in pages]
+    for index, result in self.chain.batch_as_completed(
+      inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+    ):
+      yield index, self._failed(pages[index][0], result) if isinstance(result, Exception) else result
\ No newline at end of file
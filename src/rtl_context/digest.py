@@ -0,0 +1,107 @@
+import html
+import re
+from typing import List, Tuple
+
+DEFAULT_BUDGET = 1000  # Approximate tokens
+CHARS_PER_TOKEN = 4
+
+# Line priorities: lower survives the budget first
+HEADING, TABLE_HEADER, TIMING_ROW, SIGNAL_LINE, PROSE = range(5)
+
+_TABLE = re.compile(r"<table.*?</table>", re.IGNORECASE | re.DOTALL)
+_ROW = re.compile(r"<tr.*?</tr>", re.IGNORECASE | re.DOTALL)
+_CELL = re.compile(r"<(t[hd])[^>]*>(.*?)</t[hd]>", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+_BREAK = re.compile(r"<br\s*/?>", re.IGNORECASE)
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LATEX_DELIMITERS = re.compile(r"\\[()\[\]]")
+_LATEX_COMMAND = re.compile(r"\\(?:mathrm|text|mathbf|operatorname)\s*")
+_OVERLINE = re.compile(r"\\(?:overline|bar)\s*\{+\s*([^{}]*?)\s*\}+")
+_BRACES = re.compile(r"[{}]")
+_PIPE_RULE = re.compile(r"^\s*\|?\s*:?-{3,}.*$")
+_FURNITURE = re.compile(r"^(?:data sheet|rev\.\s*\S+(?:\s*\|\s*page \d+ of \d+)?|page \d+ of \d+|\d+)$", re.IGNORECASE)
+
+_CAPTION = re.compile(r"^(?:figure|table)\s+\d+", re.IGNORECASE)
+_TIMING = re.compile(r"\bt_\w+|\d\s*(?:ns|ps|µs|μs|us|ms|MHz|kHz|GHz|MSPS|kSPS)\b")
+_SIGNAL = re.compile(r"\b[A-Z][A-Z0-9]{1,6}(?:_[A-Z0-9]+)?\b")
+
+def _clean(text: str) -> str:
+  text = _LATEX_DELIMITERS.sub("", text)
+  text = _LATEX_COMMAND.sub("", text)
+  text = _OVERLINE.sub(r"/\1", text)  # active-low: \overline{CS} -> /CS
+  text = text.replace("\\mu", "µ").replace("\\pm", "±").replace("\\times", "×").replace("\\", "")
+  text = _BRACES.sub("", text)
+  return " ".join(html.unescape(text).split())
+
+def _table_lines(table_html: str) -> List[Tuple[int, str]]:
+  lines = []
+  for index, row in enumerate(_ROW.findall(table_html)):
+    cells = [_clean(_TAG.sub("", _BREAK.sub("; ", content))) for _, content in _CELL.findall(row)]
+    cells = [cell for cell in cells if cell]
+    if not cells:
+      continue
+    header = index == 0 or "<th" in row.lower()
+    lines.append((TABLE_HEADER if header else None, " | ".join(cells)))
+  return lines
+
+def _classify(line: str) -> int:
+  if line.startswith("#") or _CAPTION.match(line):
+    return HEADING
+  letters = [c for c in line if c.isalpha()]
+  if letters and len(line) <= 80 and all(c.isupper() for c in letters) and len(letters) > 3:
+    return HEADING
+  if _TIMING.search(line):
+    return TIMING_ROW
+  if len(_SIGNAL.findall(line)) >= 2:
+    return SIGNAL_LINE
+  return PROSE
+
+def page_lines(markdown: str) -> List[Tuple[int, str]]:
+  """(priority, text) for every line worth keeping, in page order, duplicates and page furniture removed."""
+  parts: List[Tuple[int, str]] = []
+  position = 0
+  for match in _TABLE.finditer(markdown):
+    parts.extend(_text_lines(markdown[position:match.start()]))
+    parts.extend(_table_lines(match.group(0)))
+    position = match.end()
+  parts.extend(_text_lines(markdown[position:]))
+
+  seen = set()
+  lines = []
+  for priority, text in parts:
+    if not text or text.lower() in seen or _FURNITURE.match(text):
+      continue
+    seen.add(text.lower())
+    lines.append((_classify(text) if priority is None else min(priority, _classify(text)), text))
+  return lines
+
+def _text_lines(markdown: str) -> List[Tuple[None, str]]:
+  lines = []
+  for raw in markdown.splitlines():
+    if _PIPE_RULE.match(raw):
+      continue
+    raw = _IMAGE.sub(lambda m: m.group(1), raw)
+    if raw.lstrip().startswith("|"):
+      raw = " | ".join(cell.strip() for cell in raw.strip().strip("|").split("|") if cell.strip())
+    lines.append((None, _clean(raw)))
+  return lines
+
+def estimate_tokens(text: str) -> int:
+  return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def build_digest(markdown: str, budget: int = DEFAULT_BUDGET) -> str:
+  """
+  Compresses a page to about `budget` tokens for the classifier prompt.
+  Headings and captions go in first, then table headers and timing rows,
+  then lines naming signals, then prose; the kept lines stay in page order.
+  """
+  lines = page_lines(markdown)
+  remaining = budget * CHARS_PER_TOKEN
+  keep = set()
+  for index in sorted(range(len(lines)), key=lambda i: (lines[i][0], i)):
+    cost = len(lines[index][1]) + 1
+    if cost > remaining:
+      continue
+    keep.add(index)
+    remaining -= cost
+  return "\n".join(text for index, (_, text) in enumerate(lines) if index in keep)
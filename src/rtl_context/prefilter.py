@@ -0,0 +1,170 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .schema import PageAnalysis, PageType
+
+@dataclass(frozen=True)
+class LexicalFeature:
+  name: str
+  pattern: str
+  weight: float  # Log-odds added per log1p(match count)
+  page_type: PageType  # Type suggested when this feature dominates
+  ignore_case: bool = True
+
+SIGNAL_PATTERN = r"\b(?:CNV|SCK|SCLK|SDI|SDO|MISO|MOSI|CS|BUSY|SDA|SCL|DRDY|RESET|CLK)\b"
+
+# Hand-weighted on the ad7980 fixture: relevant pages sit above 0.9, front
+# matter, ordering and package pages below 0.1 (see 'prefilter-report').
+# That report on the same fixture is in-sample; check other datasheets
+# before trusting the thresholds there.
+FEATURES = (
+  LexicalFeature("timing_param", r"\bt_?\{?\s*[A-Z]{2,}|\\\(\s*t_\{?[A-Za-z]", 1.2, PageType.TIMING_SPEC, ignore_case=False),
+  LexicalFeature("timing_words", r"\b(?:setup|hold|propagation|delay|period|pulse width|rising|falling|edge)\b", 0.8, PageType.TIMING_SPEC),
+  LexicalFeature("timing_units", r"\d(?:\s*\\\))?\s*(?:ns|MHz)\b", 0.6, PageType.TIMING_SPEC),
+  LexicalFeature("diagram", r"\b(?:timing diagram|waveform|see figure)\b", 0.8, PageType.TIMING_SPEC),
+  LexicalFeature("signal_names", SIGNAL_PATTERN, 0.5, PageType.PROTOCOL, ignore_case=False),
+  LexicalFeature("interface", r"\b(?:mode|interface|protocol|serial|daisy|chain|conversion|read(?:back)?|write|transfer)\b", 0.4, PageType.PROTOCOL),
+  LexicalFeature("pin_table", r"\b(?:pins?|mnemonic|pin no\.?|function(?:al)? description)\b", 0.5, PageType.PINOUT),
+  LexicalFeature("register", r"\b(?:register|bits?\s+\d|address|reset value)\b", 0.6, PageType.REGISTER_MAP),
+  LexicalFeature("marketing", r"\b(?:features|applications|general description|product highlights|trademarks?|patents?)\b", -0.9, PageType.MARKETING),
+  LexicalFeature("revision", r"\b(?:revision history|rev\.\s*[A-Z]|changes to|changed)\b", -1.2, PageType.IRRELEVANT),
+  LexicalFeature("ordering", r"\b(?:ordering guide|model|temperature range|package option|branding|RoHS|compliant)\b", -0.8, PageType.MECHANICAL),
+  LexicalFeature("mechanical", r"\b(?:outline dimensions|JEDEC|MO-\d+|mm|dimensions shown)\b", -0.7, PageType.MECHANICAL),
+  LexicalFeature("contents", r"\.{8,}", -0.6, PageType.IRRELEVANT),
+  LexicalFeature("performance", r"\b(?:SNR|THD|SINAD|SFDR|ENOB|INL|DNL|histogram|vs\.|typical performance)\b", -0.35, PageType.ELECTRICAL),
+)
+BIAS = -2.0
+
+class LexicalPrefilter:
+  """
+  Keyword/regex feature model that settles clear-cut pages without the LLM.
+
+  Each page becomes a row of log1p(match counts); one matrix product with
+  the feature weights gives every page's probability of being RTL-relevant.
+  Pages at or below `low` are labelled irrelevant and the rest are left for
+  the classifier. Only with `high` set are pages at or above it labelled
+  relevant; their type and summary then come from the regexes, not the LLM,
+  and feed the tree builder as they are.
+  """
+
+  def __init__(
+    self, low: float = 0.1, high: Optional[float] = None, features: Tuple[LexicalFeature, ...] = FEATURES, bias: float = BIAS
+  ):
+    if not 0.0 <= low < (1.0 if high is None else high) <= 1.0:
+      raise ValueError(f"Pre-filter thresholds must satisfy 0 <= low < high <= 1 (got {low}, {high}).")
+    self.low = low
+    self.high = high
+    self.features = features
+    self.bias = bias
+    self._patterns = [re.compile(f.pattern, re.IGNORECASE if f.ignore_case else 0) for f in features]
+    self._weights = np.array([f.weight for f in features], dtype=np.float64)
+
+  def feature_matrix(self, texts: List[str]) -> np.ndarray:
+    counts = np.zeros((len(texts), len(self.features)), dtype=np.float64)
+    for row, text in enumerate(texts):
+      for column, pattern in enumerate(self._patterns):
+        counts[row, column] = sum(1 for _ in pattern.finditer(text))
+    return counts
+
+  def probabilities(self, texts: List[str]) -> np.ndarray:
+    if not texts:
+      return np.zeros(0)
+    logits = self.bias + np.log1p(self.feature_matrix(texts)) @ self._weights
+    return 1.0 / (1.0 + np.exp(-logits))
+
+  def settles(self, probability: float) -> Optional[str]:
+    """'relevant', 'irrelevant', or None when the page goes to the classifier."""
+    if probability <= self.low:
+      return "irrelevant"
+    if self.high is not None and probability >= self.high:
+      return "relevant"
+    return None
+
+  def _label(self, page_id: str, text: str, probability: float, contributions: np.ndarray) -> PageAnalysis:
+    relevant = probability > self.low
+    # The feature pulling hardest in the winning direction names the page type
+    direction = contributions if relevant else -contributions
+    dominant = self.features[int(np.argmax(direction))]
+    page_type = dominant.page_type if direction.max() > 0 else PageType.IRRELEVANT
+
+    top = [self.features[i].name for i in np.argsort(-direction)[:3] if direction[i] > 0]
+    signals = [name for name, _ in Counter(re.findall(SIGNAL_PATTERN, text)).most_common(8)] if relevant else []
+    return PageAnalysis(
+      page_id=page_id,
+      page_type=page_type,
+      # Stays on the right side of build-context's relevance_score >= 4 cut
+      relevance_score=max(4, round(probability * 10)) if relevant else min(3, round(probability * 10)),
+      # The tree builder reads summaries, so relevant pages keep their opening text
+      summary=f"Pre-filter {'relevant' if relevant else 'irrelevant'} ({', '.join(top) or 'no features'})"
+        + (f": {' '.join(text.split())[:240]}" if relevant else "."),
+      key_signals=signals,
+      confidence=round(float(probability if relevant else 1.0 - probability), 3)
+    )
+
+  def triage(self, pages: List[Tuple[str, str]]) -> List[Optional[PageAnalysis]]:
+    """Labels (page_id, markdown) pairs; None marks an uncertain page for the LLM."""
+    texts = [text for _, text in pages]
+    if not texts:
+      return []
+    contributions = np.log1p(self.feature_matrix(texts)) * self._weights
+    probabilities = 1.0 / (1.0 + np.exp(-(self.bias + contributions.sum(axis=1))))
+
+    results: List[Optional[PageAnalysis]] = []
+    for (page_id, text), probability, row in zip(pages, probabilities, contributions):
+      if self.settles(float(probability)) is None:
+        results.append(None)
+      else:
+        results.append(self._label(page_id, text, float(probability), row))
+    return results
+
+def prefilter_report(
+  prefilter: LexicalPrefilter, pages: List[Tuple[str, str]], flat_manifest: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+  """
+  Scores the pre-filter against an LLM-built flat manifest (its pages are the
+  relevant ones). Auto-dropping a relevant page is the costly mistake, so
+  recall counts a relevant page as kept unless it was labelled irrelevant.
+  Pages it would label relevant are also checked against the manifest's
+  page_type, since that label feeds the tree builder.
+  """
+  truth = {entry["page_id"]: entry for entry in flat_manifest}
+  probabilities = prefilter.probabilities([text for _, text in pages])
+  decisions = prefilter.triage(pages)
+
+  rows = []
+  for (page_id, _), probability, decision in zip(pages, probabilities, decisions):
+    verdict = prefilter.settles(float(probability)) or "llm"
+    record = {"page_id": page_id, "probability": round(float(probability), 3), "verdict": verdict, "relevant": page_id in truth}
+    if verdict == "relevant":
+      record["page_type"] = decision.page_type.value
+      if page_id in truth:
+        record["reference_type"] = truth[page_id]["page_type"]
+    rows.append(record)
+
+  auto_relevant = [row for row in rows if row["verdict"] == "relevant"]
+  auto_irrelevant = [row for row in rows if row["verdict"] == "irrelevant"]
+  relevant_total = sum(row["relevant"] for row in rows)
+  dropped = [row["page_id"] for row in auto_irrelevant if row["relevant"]]
+  admitted = [row["page_id"] for row in auto_relevant if not row["relevant"]]
+  typed = [row for row in auto_relevant if "reference_type" in row]
+  mistyped = [row["page_id"] for row in typed if row["page_type"] != row["reference_type"]]
+
+  def ratio(numerator: int, denominator: int) -> Optional[float]:
+    return round(numerator / denominator, 3) if denominator else None
+
+  return {
+    "thresholds": [prefilter.low, prefilter.high],
+    "pages": len(rows),
+    "relevant_pages": relevant_total,
+    "llm_calls_saved": ratio(len(auto_relevant) + len(auto_irrelevant), len(rows)),
+    "relevant_precision": ratio(len(auto_relevant) - len(admitted), len(auto_relevant)),
+    "irrelevant_precision": ratio(len(auto_irrelevant) - len(dropped), len(auto_irrelevant)),
+    "recall": ratio(relevant_total - len(dropped), relevant_total),
+    "type_agreement": ratio(len(typed) - len(mistyped), len(typed)),
+    "wrongly_dropped": dropped,
+    "wrongly_admitted": admitted,
+    "wrongly_typed": mistyped,
+    "per_page": rows
+  }
\ No newline at end of file
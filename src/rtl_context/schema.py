@@ -1,5 +1,6 @@
 from typing import List, Optional
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 from enum import Enum
 
 # --- Page Definitions ---
@@ -21,6 +22,9 @@ class PageAnalysis(BaseModel):
   relevance_score: int = Field(..., description="Score 0-10 for RTL utility.")
   summary: str
   key_signals: List[str]
+  # Set by the pre-filter only; kept out of the JSON schema the classifier prompt shows the LLM,
+  # and out of dumps, so flat manifest entries (and their fingerprints and diffs) only carry the classification
+  confidence: SkipJsonSchema[Optional[float]] = Field(None, exclude=True, description="Pre-filter certainty 0-1; unset for LLM classifications.")
 
 # --- Tree Definitions ---
 class NodeType(str, Enum):
@@ -1,29 +1,55 @@
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
+from typing import List, Optional, Tuple
+from pipeline.response_cache import ResponseCache
+from pipeline.langchain_cache import LangChainResponseCache
+from pipeline.langchain_tracing import TraceCallbackHandler
+from pipeline.tracing import span
 from .schema import KnowledgeNode
+from .tree_merge import ManifestCluster, cluster_manifest, fallback_subtree, merge_subtrees
+from .tree_patch import (
+  ManifestDiff, apply_placements, diff_manifests, locate_pages, prune_empty_leaves, strip_page_refs, tree_outline
+)
 
 class KnowledgeTreeBuilder:
-  def __init__(self, model_name: str = "gemini-2.5-flash"):
+  def __init__(
+    self,
+    model_name: str = "gemini-2.5-flash",
+    cache: Optional[ResponseCache] = None,
+    max_pages_per_call: int = 60,
+    workers: int = 4,
+    retries: int = 2
+  ):
+    self.model_name = model_name
+    # Larger manifests are built section by section and merged (map-reduce)
+    self.max_pages_per_call = max_pages_per_call
+    self.workers = workers
+    self.retries = retries
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
       raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
       
-    self.llm = ChatGoogleGenerativeAI(
-      model=model_name,
-      temperature=0,
-      google_api_key=api_key,
-      convert_system_message_to_human=True
-    )
+    def llm(llm_cache) -> ChatGoogleGenerativeAI:
+      return ChatGoogleGenerativeAI(
+        model=model_name,
+        temperature=0,
+        google_api_key=api_key,
+        convert_system_message_to_human=True,
+        cache=llm_cache,
+        callbacks=[TraceCallbackHandler("rtl_context")]
+      )
 
-  def build_tree(self, flat_manifest: list) -> KnowledgeNode:
-    """
-    Constructs a hierarchical Knowledge Tree from a flat list of datasheet pages.
-    """
-    manifest_str = json.dumps(flat_manifest, indent=2)
+    # Only responses that parse are cached, so a failed build is re-asked on rerun
+    self.llm = llm(LangChainResponseCache(cache, validate=self._parse_node))
+    self.placement_llm = llm(LangChainResponseCache(cache, validate=self._parse_placements))
+    # Retries go to the model, never to a cached answer of the failed attempt
+    self.uncached_llm = llm(False)
 
-    system_prompt = (
+    self.system_prompt = (
       "You are a Senior System Architect building an RTL generation context tree. "
       "Review the provided list of datasheet pages (metadata and summaries).\n\n"
       "Your Goal: Organize these pages into a Hierarchical Knowledge Tree (GROVE architecture) "
@@ -45,8 +71,49 @@ class KnowledgeTreeBuilder:
       "}}\n"
     )
 
+  def build_params(self, flat_manifest: list) -> dict:
+    """Part of the tree cache key: a map-reduce build differs from a single-call one."""
+    if len(flat_manifest) > self.max_pages_per_call:
+      return {"map_reduce": self.max_pages_per_call}
+    return {}
+
+  @staticmethod
+  def _parse_node(content: str) -> KnowledgeNode:
+    # Robust Markdown Cleanup
+    content = content.strip()
+    if content.startswith("```json"):
+      content = content[7:]
+    elif content.startswith("```"):
+      content = content[3:]
+    
+    if content.endswith("```"):
+      content = content[:-3]
+    
+    data = json.loads(content.strip())
+    return KnowledgeNode(**data)
+
+  @staticmethod
+  def _parse_placements(content: str) -> List[dict]:
+    content = content.strip()
+    if content.startswith("```"):
+      content = content.split("\n", 1)[1] if "\n" in content else content[3:]
+    placements = json.loads(content.removesuffix("```").strip())
+    if not isinstance(placements, list):
+      raise ValueError("expected a JSON list")
+    return placements
+
+  def build_tree(self, flat_manifest: list, device_name: Optional[str] = None) -> KnowledgeNode:
+    """
+    Constructs a hierarchical Knowledge Tree from a flat list of datasheet pages.
+    Manifests over max_pages_per_call go through build_tree_hierarchical.
+    """
+    if len(flat_manifest) > self.max_pages_per_call:
+      return self.build_tree_hierarchical(flat_manifest, device_name or "Device")
+
+    manifest_str = json.dumps(flat_manifest, indent=2)
+
     prompt = ChatPromptTemplate.from_messages([
-      ("system", system_prompt),
+      ("system", self.system_prompt),
       ("human", "Here is the flat page manifest:\n{manifest}\n\nGenerate the Tree:")
     ])
 
@@ -54,23 +121,122 @@ class KnowledgeTreeBuilder:
     
     try:
       chain = prompt | self.llm
-      response = chain.invoke({"manifest": manifest_str})
-      
-      # Robust Markdown Cleanup
-      content = response.content.strip()
-      if content.startswith("```json"):
-        content = content[7:]
-      elif content.startswith("```"):
-        content = content[3:]
-      
-      if content.endswith("```"):
-        content = content[:-3]
-      
-      content = content.strip()
-      
-      data = json.loads(content)
-      return KnowledgeNode(**data)
+      with span("build_tree", "rtl_context", pages=len(flat_manifest)):
+        response = chain.invoke({"manifest": manifest_str})
+      return self._parse_node(response.content)
       
     except Exception as e:
       print(f"   [TreeBuilder] Error: {e}")
-      return None
\ No newline at end of file
+      return None
+
+  def build_subtree(self, cluster: ManifestCluster) -> KnowledgeNode:
+    """One section's subtree; retried on its own, falling back to one leaf per page."""
+    prompt = ChatPromptTemplate.from_messages([
+      ("system", self.system_prompt),
+      ("human",
+       "These pages are one section ({family}) of a larger datasheet. Build ONLY this section's subtree: "
+       "its top node must have type \"mode_group\" and be titled after the section. Do not add a device_root.\n\n"
+       "Pages:\n{manifest}\n\nGenerate the Subtree:")
+    ])
+    inputs = {"family": cluster.family, "manifest": json.dumps(cluster.entries, indent=2)}
+
+    for attempt in range(self.retries + 1):
+      chain = prompt | (self.llm if attempt == 0 else self.uncached_llm)
+      try:
+        with span("build_subtree", "rtl_context", cluster=cluster.id, pages=len(cluster.entries)):
+          return self._parse_node(chain.invoke(inputs).content)
+      except Exception as e:
+        print(f"   [TreeBuilder] {cluster.id} attempt {attempt + 1}/{self.retries + 1} failed: {e}")
+        if attempt < self.retries:
+          time.sleep(2 ** attempt)
+
+    print(f"   [TreeBuilder] {cluster.id}: using one leaf per page.")
+    return fallback_subtree(cluster)
+
+  def build_tree_hierarchical(self, flat_manifest: list, device_name: str) -> Optional[KnowledgeNode]:
+    """
+    Map-reduce build: clusters the manifest by section and page type, builds
+    the subtrees concurrently, then merges them deterministically under one
+    root. A failed section degrades to plain page leaves instead of failing
+    the whole tree; rerunning re-asks only the sections the response cache
+    does not already hold.
+    """
+    if not flat_manifest:
+      return None
+    clusters: List[ManifestCluster] = cluster_manifest(flat_manifest, max_pages=self.max_pages_per_call)
+    print(f"   [TreeBuilder] {len(flat_manifest)} pages -> {len(clusters)} sections, {self.workers} at a time...")
+
+    with ThreadPoolExecutor(max_workers=self.workers) as executor:
+      subtrees = list(executor.map(self.build_subtree, clusters))
+
+    with span("merge_tree", "rtl_context", sections=len(clusters)):
+      return merge_subtrees(device_name, list(zip(clusters, subtrees)))
+
+  def place_pages(self, tree: KnowledgeNode, entries: List[dict]) -> List[dict]:
+    """Asks where each page belongs in the existing tree; returns the raw placement list ([] on failure)."""
+    prompt = ChatPromptTemplate.from_messages([
+      ("system",
+       "You maintain an RTL generation context tree (GROVE architecture). New or updated datasheet pages "
+       "must be placed into the EXISTING tree without restructuring it. Use only node ids from the outline."),
+      ("human",
+       "Existing tree outline (id [type] title :: apply_condition):\n{outline}\n\n"
+       "Pages to place (previously_at lists where an updated page used to be):\n{pages}\n\n"
+       "Output a SINGLE JSON list with one object per page, either\n"
+       "{{\"page_id\": \"...\", \"action\": \"attach\", \"node_id\": \"<existing node covering this page>\"}}\n"
+       "or, when no node fits,\n"
+       "{{\"page_id\": \"...\", \"action\": \"new_leaf\", \"parent_id\": \"<existing node>\", "
+       "\"title\": \"...\", \"description\": \"...\", \"apply_condition\": \"...\"}}")
+    ])
+    inputs = {"outline": tree_outline(tree), "pages": json.dumps(entries, indent=2)}
+
+    for attempt in range(self.retries + 1):
+      chain = prompt | (self.placement_llm if attempt == 0 else self.uncached_llm)
+      try:
+        with span("place_pages", "rtl_context", pages=len(entries)):
+          content = chain.invoke(inputs).content
+        return self._parse_placements(content)
+      except Exception as e:
+        print(f"   [TreeBuilder] Placement attempt {attempt + 1}/{self.retries + 1} failed: {e}")
+        if attempt < self.retries:
+          time.sleep(2 ** attempt)
+    return []
+
+  def patch_tree(
+    self, tree: KnowledgeNode, previous_manifest: list, flat_manifest: list
+  ) -> Tuple[Optional[KnowledgeNode], ManifestDiff]:
+    """
+    Updates a tree for a changed manifest instead of rebuilding it. Refs to
+    removed pages are dropped locally; only added and changed pages go to the
+    model, which places them among the existing nodes. Every other node keeps
+    its id and position. Returns None for the tree when placement fails or
+    leaves a new page unplaced, so the caller can rebuild instead.
+    """
+    diff = diff_manifests(previous_manifest, flat_manifest)
+    patched = tree.model_copy(deep=True)
+    if diff.empty:
+      return patched, diff
+
+    to_place = diff.added + diff.changed
+    locations = locate_pages(patched, {entry["page_id"] for entry in diff.changed})
+    strip_page_refs(patched, set(diff.removed) | set(locations))
+
+    if to_place:
+      print(f"   [TreeBuilder] Placing {len(to_place)} pages into the existing tree with {self.llm.model}...")
+      entries = [
+        {**entry, "previously_at": locations[entry["page_id"]]} if locations.get(entry["page_id"]) else entry
+        for entry in to_place
+      ]
+      placements = self.place_pages(patched, entries)
+      if not placements:
+        print("   [TreeBuilder] Placement failed.")
+        return None, diff
+      unplaced = apply_placements(patched, placements, entries)
+      if unplaced:
+        print(f"   [TreeBuilder] No valid placement for {', '.join(unplaced)}.")
+        return None, diff
+
+    # After placement, so a leaf that got its page re-attached survives
+    pruned = prune_empty_leaves(patched)
+    if pruned:
+      print(f"   [TreeBuilder] Removed {pruned} empty leaves.")
+    return patched, diff
\ No newline at end of file
@@ -0,0 +1,162 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Set, Tuple
+from .schema import KnowledgeNode, NodeType, PageType
+
+# Page types that usually describe the same part of a datasheet
+FAMILIES = {
+  PageType.TIMING_SPEC: "interface",
+  PageType.PROTOCOL: "interface",
+  PageType.REGISTER_MAP: "registers",
+  PageType.PINOUT: "pinout",
+  PageType.BLOCK_DIAGRAM: "functional",
+  PageType.ELECTRICAL: "electrical",
+}
+# Timing specs in a section without protocol pages are the shared timing
+# tables (e.g. the specifications ahead of the mode descriptions), not a mode
+SHARED_TIMING_FAMILY = "timing"
+# Sections that apply to every configuration; TreeNavigator includes root
+# children titled "Global ..." in every node's context
+GLOBAL_FAMILIES = {"pinout", "electrical", SHARED_TIMING_FAMILY}
+
+PAGE_NUMBER = re.compile(r"(\d+)")
+
+@dataclass
+class ManifestCluster:
+  """A slice of the flat manifest that gets its own subtree call."""
+  id: str
+  family: str
+  entries: List[dict]
+
+  @property
+  def page_ids(self) -> List[str]:
+    return [entry["page_id"] for entry in self.entries]
+
+def slug(text: str) -> str:
+  return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+def _page_number(page_id: str) -> int:
+  match = PAGE_NUMBER.search(page_id)
+  return int(match.group(1)) if match else 0
+
+def cluster_manifest(flat_manifest: List[dict], max_pages: int = 40, max_gap: int = 3) -> List[ManifestCluster]:
+  """
+  Splits the manifest into sections (runs of pages less than max_gap apart),
+  groups each section by page-type family, and cuts groups to max_pages.
+  Timing specs of a section with no protocol pages form a global "timing"
+  group, so every mode's context includes the shared timing tables.
+  Depends only on page ids and types, so ids are stable across runs.
+  """
+  entries = sorted(flat_manifest, key=lambda entry: (_page_number(entry["page_id"]), entry["page_id"]))
+  sections: List[List[dict]] = []
+  previous = None
+  for entry in entries:
+    number = _page_number(entry["page_id"])
+    if previous is None or number - previous > max_gap:
+      sections.append([])
+    sections[-1].append(entry)
+    previous = number
+
+  groups: Dict[Tuple[int, str], List[dict]] = {}
+  for section, members in enumerate(sections):
+    has_protocol = any(PageType(entry["page_type"]) == PageType.PROTOCOL for entry in members)
+    for entry in members:
+      page_type = PageType(entry["page_type"])
+      family = FAMILIES.get(page_type, "other")
+      if page_type == PageType.TIMING_SPEC and not has_protocol:
+        family = SHARED_TIMING_FAMILY
+      groups.setdefault((section, family), []).append(entry)
+
+  clusters = []
+  for (section, family), members in sorted(groups.items(), key=lambda item: _page_number(item[1][0]["page_id"])):
+    for start in range(0, len(members), max_pages):
+      chunk = members[start:start + max_pages]
+      suffix = f"_{start // max_pages + 1}" if len(members) > max_pages else ""
+      clusters.append(ManifestCluster(f"{family}_s{section + 1:02d}{suffix}", family, chunk))
+  return clusters
+
+def fallback_subtree(cluster: ManifestCluster) -> KnowledgeNode:
+  """Subtree with one leaf per page, used when the model keeps failing on a cluster."""
+  pages = cluster.page_ids
+  return KnowledgeNode(
+    id=cluster.id,
+    type=NodeType.MODE_GROUP,
+    title=f"{cluster.family.title()} ({pages[0]} - {pages[-1]})",
+    description="Pages grouped without model structuring.",
+    apply_condition="ALWAYS",
+    children=[_page_leaf(entry) for entry in cluster.entries]
+  )
+
+def _page_leaf(entry: dict) -> KnowledgeNode:
+  return KnowledgeNode(
+    id=entry["page_id"],
+    type=NodeType.LEAF_FACT,
+    title=f"{entry['page_type'].replace('_', ' ').title()} ({entry['page_id']})",
+    description=entry.get("summary", ""),
+    apply_condition="ALWAYS",
+    content_refs=[entry["page_id"]]
+  )
+
+def _unique_id(node_id: str, used: Set[str]) -> str:
+  """node_id, or node_id_2, node_id_3... if taken; records the result in used."""
+  candidate, counter = node_id, 2
+  while candidate in used:
+    candidate = f"{node_id}_{counter}"
+    counter += 1
+  used.add(candidate)
+  return candidate
+
+def _namespaced(node: KnowledgeNode, prefix: str, pages: Set[str], used: Set[str]) -> KnowledgeNode:
+  """Copy of node with ids '<prefix>.<id>' (unique across the tree) and refs limited to the cluster's pages."""
+  return KnowledgeNode(
+    id=_unique_id(f"{prefix}.{slug(node.id) or 'node'}", used),
+    type=node.type,
+    title=node.title,
+    description=node.description,
+    apply_condition=node.apply_condition,
+    content_refs=[ref for ref in dict.fromkeys(node.content_refs) if ref in pages],
+    children=[_namespaced(child, prefix, pages, used) for child in node.children]
+  )
+
+def _referenced(node: KnowledgeNode, refs: Set[str]) -> Set[str]:
+  refs.update(node.content_refs)
+  for child in node.children:
+    _referenced(child, refs)
+  return refs
+
+def merge_subtrees(device_name: str, subtrees: List[Tuple[ManifestCluster, KnowledgeNode]]) -> KnowledgeNode:
+  """
+  Combines per-cluster subtrees, in cluster order, under one device root.
+  Subtrees with the same title are merged; pages a subtree forgot are added
+  back as leaves, so every manifest page stays reachable.
+  """
+  root = KnowledgeNode(
+    id=slug(device_name) or "device",
+    type=NodeType.ROOT,
+    title=device_name,
+    description=f"{device_name} knowledge tree built from {len(subtrees)} sections.",
+    apply_condition="ALWAYS"
+  )
+  used = {root.id}
+  by_title: Dict[str, KnowledgeNode] = {}
+
+  for cluster, subtree in subtrees:
+    node = _namespaced(subtree, cluster.id, set(cluster.page_ids), used)
+    if node.type == NodeType.ROOT:
+      node.type = NodeType.MODE_GROUP
+    missing = [entry for entry in cluster.entries if entry["page_id"] not in _referenced(node, set())]
+    for entry in missing:
+      leaf = _page_leaf(entry)
+      leaf.id = _unique_id(f"{cluster.id}.{leaf.id}", used)
+      node.children.append(leaf)
+    if cluster.family in GLOBAL_FAMILIES and not node.title.lower().startswith("global"):
+      node.title = f"Global {node.title}"
+
+    existing = by_title.get(node.title.lower())
+    if existing:
+      existing.children.extend(node.children)
+      existing.content_refs = list(dict.fromkeys(existing.content_refs + node.content_refs))
+    else:
+      by_title[node.title.lower()] = node
+      root.children.append(node)
+  return root
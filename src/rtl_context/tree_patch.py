@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Set
+from .schema import KnowledgeNode, NodeType
+
+@dataclass
+class ManifestDiff:
+  """Pages added, changed (any field) or removed between two flat manifests."""
+  added: List[dict] = field(default_factory=list)
+  changed: List[dict] = field(default_factory=list)
+  removed: List[str] = field(default_factory=list)
+  unchanged: int = 0
+
+  @property
+  def empty(self) -> bool:
+    return not (self.added or self.changed or self.removed)
+
+  def summary(self) -> str:
+    return f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed, {self.unchanged} unchanged"
+
+def diff_manifests(previous: List[dict], current: List[dict]) -> ManifestDiff:
+  before = {entry["page_id"]: entry for entry in previous}
+  diff = ManifestDiff()
+  for entry in current:
+    old = before.pop(entry["page_id"], None)
+    if old is None:
+      diff.added.append(entry)
+    elif old != entry:
+      diff.changed.append(entry)
+    else:
+      diff.unchanged += 1
+  diff.removed = sorted(before)
+  return diff
+
+def walk(node: KnowledgeNode) -> Iterator[KnowledgeNode]:
+  yield node
+  for child in node.children:
+    yield from walk(child)
+
+def tree_outline(tree: KnowledgeNode) -> str:
+  """Ids, types, titles and conditions only: enough for the model to pick a place."""
+  lines = []
+
+  def _outline(node: KnowledgeNode, depth: int):
+    lines.append(f"{'  ' * depth}- {node.id} [{node.type.value}] {node.title} :: {node.apply_condition}")
+    for child in node.children:
+      _outline(child, depth + 1)
+
+  _outline(tree, 0)
+  return "\n".join(lines)
+
+def locate_pages(tree: KnowledgeNode, page_ids: Set[str]) -> Dict[str, List[str]]:
+  """page_id -> ids of the nodes referencing it."""
+  found: Dict[str, List[str]] = {page_id: [] for page_id in page_ids}
+  for node in walk(tree):
+    for ref in node.content_refs:
+      if ref in found:
+        found[ref].append(node.id)
+  return found
+
+def strip_page_refs(tree: KnowledgeNode, page_ids: Set[str]) -> None:
+  for node in walk(tree):
+    node.content_refs = [ref for ref in node.content_refs if ref not in page_ids]
+
+def prune_empty_leaves(node: KnowledgeNode) -> int:
+  """Drops leaf facts left without refs or children; structural nodes keep their ids."""
+  removed = 0
+  kept = []
+  for child in node.children:
+    removed += prune_empty_leaves(child)
+    if child.type == NodeType.LEAF_FACT and not child.content_refs and not child.children:
+      removed += 1
+    else:
+      kept.append(child)
+  node.children = kept
+  return removed
+
+def apply_placements(tree: KnowledgeNode, placements: List[dict], entries: List[dict]) -> List[str]:
+  """
+  Applies model placements ('attach' a page to an existing node, or add a
+  'new_leaf' under one). A changed page with no valid placement goes back to
+  the nodes in its 'previously_at'. Returns the ids of the pages still
+  unplaced (never parked under the root, where every configuration sees them).
+  """
+  nodes = {node.id: node for node in walk(tree)}
+  by_page = {entry["page_id"]: entry for entry in entries}
+  placed: Set[str] = set()
+
+  def attach(target: KnowledgeNode, page_id: str) -> None:
+    if page_id not in target.content_refs:
+      target.content_refs.append(page_id)
+    placed.add(page_id)
+
+  def new_leaf(parent: KnowledgeNode, entry: dict, placement: dict) -> None:
+    leaf_id, counter = f"{parent.id}.{entry['page_id']}", 2
+    while leaf_id in nodes:
+      leaf_id = f"{parent.id}.{entry['page_id']}_{counter}"
+      counter += 1
+    leaf = KnowledgeNode(
+      id=leaf_id,
+      type=NodeType.LEAF_FACT,
+      title=placement.get("title") or f"{entry['page_type'].replace('_', ' ').title()} ({entry['page_id']})",
+      description=placement.get("description") or entry.get("summary", ""),
+      apply_condition=placement.get("apply_condition") or parent.apply_condition,
+      content_refs=[entry["page_id"]]
+    )
+    nodes[leaf_id] = leaf
+    parent.children.append(leaf)
+    placed.add(entry["page_id"])
+
+  for placement in placements:
+    entry = by_page.get(placement.get("page_id")) if isinstance(placement, dict) else None
+    if entry is None:
+      continue
+    if placement.get("action") == "attach" and placement.get("node_id") in nodes:
+      attach(nodes[placement["node_id"]], entry["page_id"])
+    elif placement.get("action") == "new_leaf" and placement.get("parent_id") in nodes:
+      new_leaf(nodes[placement["parent_id"]], entry, placement)
+
+  for entry in entries:
+    previous = [nodes[node_id] for node_id in entry.get("previously_at", []) if node_id in nodes]
+    if entry["page_id"] not in placed and previous:
+      for target in previous:
+        attach(target, entry["page_id"])
+  return [entry["page_id"] for entry in entries if entry["page_id"] not in placed]
\ No newline at end of file
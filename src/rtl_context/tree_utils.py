@@ -1,9 +1,23 @@
 import json
+import os
+import threading
 from pathlib import Path
-from typing import List, Dict, Optional, Set, Any
+from typing import List, Dict, Optional, Set, Any, Tuple
+from pipeline.artifacts import hash_file
 from .schema import KnowledgeNode, NodeType
 
 class TreeNavigator:
+  """
+  Read-only view of a knowledge tree, indexed once at load: id -> node,
+  parent pointers, the configuration list and each node's page set, so
+  agent tool calls are lookups. Use TreeNavigator.load() to share one
+  instance per file across the process.
+  """
+
+  # path -> ((mtime_ns, size), content hash, navigator)
+  _loaded: Dict[Path, Tuple[Tuple[int, int], str, "TreeNavigator"]] = {}
+  _load_lock = threading.Lock()
+
   def __init__(self, tree_path: Path):
     if not tree_path.exists():
       raise FileNotFoundError(f"Context tree not found at {tree_path}")
@@ -13,7 +27,85 @@ class TreeNavigator:
       # Load the root node (triggers recursive Pydantic validation)
       self.root = KnowledgeNode(**data)
 
+    self._nodes: Dict[str, KnowledgeNode] = {}
+    self._parents: Dict[str, Optional[str]] = {}
+    self._pages: Dict[str, frozenset] = {}
+    self._contexts: Dict[str, Dict[str, Any]] = {}
+    self._index(self.root, None)
+    self._configurations = self._walk_configurations()
+
+    # Global content (heuristic): direct LEAF_FACT children of the root, and
+    # whole subtrees of root children titled "Global ..."
+    global_pages: Set[str] = set()
+    for child in self.root.children:
+      if child.type == NodeType.LEAF_FACT:
+        global_pages.update(child.content_refs)
+      if child.title.lower().startswith("global"):
+        global_pages.update(self._pages[child.id])
+    self._global_pages = frozenset(global_pages)
+
+  @classmethod
+  def load(cls, tree_path: Path) -> "TreeNavigator":
+    """
+    Shared navigator for tree_path. Rebuilt only when the file's mtime/size
+    changed and its content hash differs from the one indexed.
+    """
+    path = Path(tree_path).resolve()
+    try:
+      stat = os.stat(path)
+    except FileNotFoundError:
+      raise FileNotFoundError(f"Context tree not found at {tree_path}")
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with cls._load_lock:
+      cached = cls._loaded.get(path)
+      if cached and cached[0] == signature:
+        return cached[2]
+
+      content_hash = hash_file(path)
+      if cached and cached[1] == content_hash:
+        # Touched or rewritten with the same content
+        cls._loaded[path] = (signature, content_hash, cached[2])
+        return cached[2]
+
+      navigator = cls(path)
+      cls._loaded[path] = (signature, content_hash, navigator)
+      return navigator
+
+  def _index(self, node: KnowledgeNode, parent_id: Optional[str]) -> frozenset:
+    """Registers node and its subtree; returns the subtree's page set."""
+    # First occurrence wins, as in a depth-first search
+    first = node.id not in self._nodes
+    if first:
+      self._nodes[node.id] = node
+      self._parents[node.id] = parent_id
+
+    pages = set(node.content_refs)
+    for child in node.children:
+      pages.update(self._index(child, node.id))
+    pages = frozenset(pages)
+    # Pages follow the node object kept in _nodes, not a later duplicate
+    # whose subtree happens to finish first in post-order
+    if first:
+      self._pages[node.id] = pages
+    return pages
+
+  def find_node(self, node_id: str) -> Optional[KnowledgeNode]:
+    return self._nodes.get(node_id)
+
+  def parent(self, node_id: str) -> Optional[KnowledgeNode]:
+    parent_id = self._parents.get(node_id)
+    return self._nodes[parent_id] if parent_id is not None else None
+
+  def pages_under(self, node_id: str) -> frozenset:
+    """content_refs of the node and all its descendants."""
+    return self._pages.get(node_id, frozenset())
+
   def list_configurations(self) -> List[Dict[str, str]]:
+    """All 'Sub-Mode' nodes, i.e. the selectable hardware configurations (precomputed)."""
+    return [dict(config) for config in self._configurations]
+
+  def _walk_configurations(self) -> List[Dict[str, str]]:
     """
     Deterministic walker. Finds all 'Sub-Mode' nodes which represent 
     selectable hardware configurations.
@@ -52,40 +144,17 @@ class TreeNavigator:
     The 'Zoom' function. Given a specific mode ID (e.g. '3wire_busy'),
     it collects ALL relevant constraints from that node AND its parents.
     """
-    target_node = self._find_node_recursive(self.root, target_node_id)
-    if not target_node:
-      return {"error": f"Node {target_node_id} not found"}
+    if target_node_id not in self._contexts:
+      target_node = self._nodes.get(target_node_id)
+      if not target_node:
+        return {"error": f"Node {target_node_id} not found"}
 
-    relevant_pages = set()
-    
-    # A. Target Node Content
-    self._collect_leaf_content(target_node, relevant_pages)
-    
-    # B. Global Content (Heuristic: Direct children of Root that are LEAF_FACTs)
-    for child in self.root.children:
-      if child.type == NodeType.LEAF_FACT:
-        relevant_pages.update(child.content_refs)
-      if child.title.lower().startswith("global"):
-        self._collect_leaf_content(child, relevant_pages)
-
-    return {
-      "config_id": target_node.id,
-      "config_name": target_node.title,
-      "apply_condition": target_node.apply_condition,
-      "relevant_pages": sorted(list(relevant_pages))
-    }
-
-  def _find_node_recursive(self, current: KnowledgeNode, target_id: str) -> Optional[KnowledgeNode]:
-    if current.id == target_id:
-      return current
-    for child in current.children:
-      found = self._find_node_recursive(child, target_id)
-      if found: return found
-    return None
-
-  def _collect_leaf_content(self, node: KnowledgeNode, refs: Set[str]):
-    """Helper to gather content_refs from a node and all its leaf children."""
-    if node.content_refs:
-      refs.update(node.content_refs)
-    for child in node.children:
-      self._collect_leaf_content(child, refs)
\ No newline at end of file
+      self._contexts[target_node_id] = {
+        "config_id": target_node.id,
+        "config_name": target_node.title,
+        "apply_condition": target_node.apply_condition,
+        "relevant_pages": sorted(self._pages[target_node_id] | self._global_pages)
+      }
+
+    context = self._contexts[target_node_id]
+    return {**context, "relevant_pages": list(context["relevant_pages"])}
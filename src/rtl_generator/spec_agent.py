@@ -1,12 +1,19 @@
 import os
 from pathlib import Path
+from typing import Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.prebuilt import create_react_agent
 from langchain_core.messages import SystemMessage, HumanMessage
+from pipeline.response_cache import ResponseCache
+from pipeline.langchain_cache import LangChainResponseCache
+from pipeline.langchain_tracing import TraceCallbackHandler
+from pipeline.tracing import span
 from .tools import DatasheetNavigatorTool, DatasheetReaderTool
 
 class SpecGenAgent:
-  def __init__(self, context_dir: Path, md_dir: Path, model_name: str = "gemini-2.5-flash"):
+  def __init__(
+    self, context_dir: Path, md_dir: Path, model_name: str = "gemini-2.5-flash", cache: Optional[ResponseCache] = None
+  ):
     self.tree_path = context_dir / "rtl_knowledge_tree.json"
     if not self.tree_path.exists():
       raise FileNotFoundError(f"Tree not found at {self.tree_path}")
@@ -18,7 +25,8 @@ class SpecGenAgent:
     self.llm = ChatGoogleGenerativeAI(
       model=model_name,
       temperature=0,
-      google_api_key=api_key
+      google_api_key=api_key,
+      cache=LangChainResponseCache(cache)
     )
 
     self.tools = [
@@ -71,7 +79,11 @@ class SpecGenAgent:
       SystemMessage(content=self.system_prompt),
       HumanMessage(content=user_query)
     ]
-    result = self.graph.invoke({"messages": messages})
+    # The callback config reaches every LLM turn and tool call of the loop
+    with span("agent_loop", "rtl_generator", agent=type(self).__name__):
+      result = self.graph.invoke(
+        {"messages": messages}, config={"callbacks": [TraceCallbackHandler("rtl_generator")]}
+      )
     
     # FIX: Handle Gemini returning list-of-content blocks
     content = result["messages"][-1].content
@@ -23,7 +23,7 @@ class DatasheetNavigatorTool(BaseTool):
   tree_path: Path
 
   def _run(self, query: str = "") -> str:
-    nav = TreeNavigator(self.tree_path)
+    nav = TreeNavigator.load(self.tree_path)
     options = nav.list_configurations()
     
     # Smart Filtering Logic
@@ -66,7 +66,7 @@ class DatasheetReaderTool(BaseTool):
   md_dir: Path
 
   def _run(self, config_id: str) -> str:
-    nav = TreeNavigator(self.tree_path)
+    nav = TreeNavigator.load(self.tree_path)
     context = nav.get_node_context(config_id)
     
     if "error" in context:
@@ -0,0 +1,74 @@
+import sys
+import threading
+import time
+from pathlib import Path
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+pytest.importorskip("google.generativeai")
+from PIL import Image
+
+from benchmarks.gemini_stub import GeminiStubServer
+from ocr_engine.cloud import GeminiTimingExtractor, TimingExtractionPool
+from pipeline.response_cache import ResponseCache
+
+RESULT = {"operating_mode": "3-Wire CS Mode"}
+
+def _extractor(stub, tmp_path, **kwargs) -> GeminiTimingExtractor:
+  cache = ResponseCache(tmp_path / "responses.sqlite3", enabled=False)
+  return GeminiTimingExtractor(api_key="stub-key", endpoint=stub.url, cache=cache, **kwargs)
+
+def _image(shade: int = 255) -> Image.Image:
+  return Image.new("RGB", (64, 48), (shade, shade, shade))
+
+def test_quota_and_unavailable_errors_are_retried(tmp_path):
+  with GeminiStubServer(RESULT, statuses=[429, 503]) as stub:
+    result = _extractor(stub, tmp_path, backoff=0.01).analyze_diagram(_image())
+
+  assert result == RESULT
+  assert stub.requests == 3
+
+def test_gives_up_after_max_retries(tmp_path):
+  with GeminiStubServer(RESULT, statuses=[503, 503, 503, 503]) as stub:
+    result = _extractor(stub, tmp_path, backoff=0.01, max_retries=2).analyze_diagram(_image())
+
+  assert "503" in result["error"]
+  assert stub.requests == 3  # Our retries only: the client's own retry is off
+
+def test_non_retryable_error_fails_at_once(tmp_path):
+  with GeminiStubServer(RESULT, statuses=[400]) as stub:
+    result = _extractor(stub, tmp_path, backoff=0.01).analyze_diagram(_image())
+
+  assert "error" in result
+  assert stub.requests == 1
+
+def test_quota_error_pauses_every_thread(tmp_path):
+  backoff = 0.3
+  with GeminiStubServer(RESULT, statuses=[429]) as stub:
+    extractor = _extractor(stub, tmp_path, backoff=backoff)
+    first = threading.Thread(target=extractor.analyze_diagram, args=(_image(),))
+    first.start()
+    while not extractor._resume_at:
+      time.sleep(0.005)
+    # Sent after the 429: waits out the cooldown instead of hitting the quota too
+    extractor.analyze_diagram(_image(128))
+    first.join()
+
+  assert stub.requests == 3
+  assert min(stub.arrivals[1:]) - stub.arrivals[0] >= backoff
+
+def test_pool_keeps_at_most_concurrency_requests_in_flight(tmp_path):
+  with GeminiStubServer(RESULT, latency=0.2) as stub:
+    pool = TimingExtractionPool(_extractor(stub, tmp_path), concurrency=2, max_pending=3)
+    pending = []
+    for index in range(6):
+      pool.submit(f"page_{index:03d}", _image(index * 40))
+      pending.append(pool.in_flight)
+    results = list(pool.drain())
+    pool.close()
+
+  assert stub.max_active == 2
+  assert max(pending) <= 3  # submit() blocks once max_pending jobs are queued or running
+  assert sorted(key for key, _, _ in results) == [f"page_{index:03d}" for index in range(6)]
+  assert all(result == RESULT for _, _, result in results)
\ No newline at end of file
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+fitz = pytest.importorskip("fitz")
+
+from pdf_processor.core import PDFProcessor
+
+def _build(path, label, filler_objects=0):
+  # The page's only content is a Form XObject showing another PDF's page:
+  # its text lives in the form's stream and font, not in the page's contents
+  source = fitz.open()
+  source.new_page().insert_text((72, 72), label)
+  document = fitz.open()
+  for _ in range(filler_objects):
+    document.new_page()
+  document.new_page().show_pdf_page(fitz.Rect(0, 0, 595, 842), source, 0)
+  document.select([filler_objects])
+  document.save(path)
+
+def _hash(path):
+  with PDFProcessor(path) as processor:
+    return processor.page_content_hash(0)
+
+def test_page_hash_follows_form_xobjects(tmp_path):
+  _build(tmp_path / "a.pdf", "Rev A")
+  _build(tmp_path / "b.pdf", "Rev B")
+  _build(tmp_path / "a_again.pdf", "Rev A", filler_objects=3)
+
+  assert _hash(tmp_path / "a.pdf") != _hash(tmp_path / "b.pdf")
+  assert _hash(tmp_path / "a.pdf") == _hash(tmp_path / "a_again.pdf")
\ No newline at end of file
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+fitz = pytest.importorskip("fitz")
+
+from pdf_processor.figures import FigureConfig, find_figure_regions, find_section_headings
+
+def test_timing_diagram_crop_comes_with_its_section_heading():
+  # Page 21 of the AD7980 datasheet: a connection diagram, then the 4-wire
+  # timing diagram (which find_tables boxes as a table), under one heading
+  with fitz.open(SRC / "pdf" / "ad7980.pdf") as document:
+    page = document[20]
+    regions = find_figure_regions(page, FigureConfig())
+    headings = find_section_headings(page, regions, FigureConfig())
+    heading_text = page.get_text("text", clip=headings[0].rect)
+
+  assert len(regions) == 2
+  assert regions[1].y1 > 680  # Down to the Figure 35 caption
+  assert all(region.y0 > 80 for region in regions)  # Not the running header
+  assert len(headings) == 1
+  assert "4-WIRE" in heading_text and "WITHOUT BUSY INDICATOR" in heading_text
\ No newline at end of file
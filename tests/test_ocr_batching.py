@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+fitz = pytest.importorskip("fitz")
+
+import cli
+from pipeline.artifacts import ArtifactStore
+
+class _FailingBatchEngine:
+  """Fails any batch of more than one page, and one page outright."""
+  def __init__(self, bad_image):
+    self.bad_image = bad_image
+    self.calls = []
+
+  def process_images(self, images):
+    self.calls.append(len(images))
+    if len(images) > 1 or images[0] == self.bad_image:
+      raise RuntimeError("out of memory")
+    return [f"text of {images[0]}"]
+
+def test_failed_batch_is_retried_page_by_page(tmp_path):
+  chunk = [cli._PageSource(f"page_00{n}", f"image {n}", f"hash {n}") for n in (1, 2, 3)]
+  engine = _FailingBatchEngine("image 2")
+
+  page_texts, _ = cli._ocr_chunk(
+    chunk, tmp_path, ArtifactStore(tmp_path), lambda: engine, "model", "prompt", {}
+  )
+
+  assert engine.calls == [3, 1, 1, 1]
+  assert page_texts == {"page_001": "text of image 1", "page_003": "text of image 3"}
+  assert (tmp_path / "page_003.md").exists()
+  assert not (tmp_path / "page_002.md").exists()
+
+def test_figure_crops_render_after_the_page_stream_closes():
+  # The last OCR chunk is only complete once the stream has run off the end
+  # of the document and closed it; its figure checks come after that
+  sources = list(cli._iter_ocr_sources(SRC / "pdf" / "ad7980.pdf", 50, [19], None))
+
+  crops = sources[0].figures()
+
+  assert crops
+  assert all(crop.dpi == 200 for _, crop in crops)
\ No newline at end of file
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from pipeline.progress import write_combined_markdown
+
+def test_combined_markdown_keeps_pages_from_earlier_runs(tmp_path):
+  # An earlier run finished pages 1-2; this '--pages 5' run only wrote page 5
+  for number in (5, 1, 2):
+    (tmp_path / f"page_{number:03d}.md").write_text(f"\n\nText of page {number}", encoding="utf-8")
+  (tmp_path / "page_005_timing.json").write_text("{}", encoding="utf-8")
+
+  combined = write_combined_markdown(tmp_path).read_text(encoding="utf-8")
+
+  assert [line for line in combined.splitlines() if line] == ["Text of page 1", "Text of page 2", "Text of page 5"]
\ No newline at end of file
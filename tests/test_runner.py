@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+from pipeline.runner import StreamingPipeline, Stage
+
+def test_batched_stage_gets_lists_at_batch_size_one():
+  # 'run' defaults to --batch-size 1; the OCR stage still unpacks a list of (document, page) pairs
+  def ocr(batch):
+    assert isinstance(batch, list)
+    return [f"{doc}:{page}" for doc, page in batch]
+
+  pipeline = StreamingPipeline([
+    Stage("ocr", ocr, batch_size=1, batched=True),
+    Stage("upper", str.upper)
+  ])
+  results = pipeline.run(("doc", f"page_{n}") for n in range(5))
+
+  assert sorted(results) == [f"DOC:PAGE_{n}" for n in range(5)]
+  assert not pipeline.errors
+
+def test_unbatched_stage_gets_single_items():
+  pipeline = StreamingPipeline([Stage("double", lambda item: item * 2, batch_size=1)])
+
+  assert sorted(pipeline.run(range(3))) == [0, 2, 4]
\ No newline at end of file
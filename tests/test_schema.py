@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+pytest.importorskip("pydantic")
+
+from rtl_context import PageAnalysis, PageType
+from rtl_context.tree_patch import diff_manifests
+
+def _analysis(**kwargs) -> PageAnalysis:
+  return PageAnalysis(
+    page_id="page_019", page_type=PageType.TIMING_SPEC, relevance_score=9,
+    summary="CS mode timing", key_signals=["CNV", "SDO"], **kwargs
+  )
+
+def test_manifest_entries_leave_out_prefilter_confidence():
+  # A manifest written before the pre-filter existed: no confidence key
+  previous = [_analysis().model_dump()]
+  current = [_analysis(confidence=0.97).model_dump()]
+
+  assert "confidence" not in current[0]
+  assert "confidence" not in _analysis().model_dump(mode="json")
+  diff = diff_manifests(previous, current)
+  assert diff.unchanged == 1 and not diff.changed
\ No newline at end of file
@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+pytest.importorskip("fitz")
+
+from benchmarks import Fixture, StubLatencies, StubOCREngine, make_synthetic_datasheet
+from pdf_processor import PDFProcessor, PDFExportConfig
+
+PDF = SRC / "pdf" / "ad7980.pdf"
+
+def test_stub_ocr_replays_by_page_not_call_order(tmp_path):
+  fixture = Fixture(SRC / "pdf" / "ad7980_md", SRC / "pdf" / "ad7980_context")
+  engine = StubOCREngine(fixture, StubLatencies().scaled(0), PDF, dpi=40)
+  synthetic = make_synthetic_datasheet(PDF, 30, tmp_path / "ad7980_x30.pdf")
+  with PDFProcessor(synthetic) as processor:
+    # Warm rerun: only a few pages miss the cache, out of order, one per call
+    images = {n: processor.render_page(n - 1, PDFExportConfig(dpi=40)).to_image() for n in (29, 5, 12)}
+
+  assert engine.process_images([images[29]]) == [fixture.pages[1]]
+  assert engine.process_images([images[5], images[12]]) == [fixture.pages[4], fixture.pages[11]]
+  assert engine.process_images([Path("page_007.png")]) == [fixture.pages[6]]
\ No newline at end of file
@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+fitz = pytest.importorskip("fitz")
+
+from pdf_processor.text_layer import TextLayerConfig, analyze_text_layer, page_to_markdown
+
+def test_two_column_page_reads_column_by_column():
+  # Page 18 of the AD7980 datasheet: the left column runs from 'Voltage
+  # Reference Input' down to the power-down paragraph, the right column
+  # opens with 'Digital Interface' level with the left column's middle
+  with fitz.open(SRC / "pdf" / "ad7980.pdf") as document:
+    markdown = page_to_markdown(document[17])
+
+  left_start = markdown.index("VOLTAGE REFERENCE INPUT")
+  left_end = markdown.index("powers down automatically")
+  right_start = markdown.index("DIGITAL INTERFACE")
+  right_end = markdown.index("busy indicator feature")
+  assert left_start < left_end < right_start < right_end
+  assert markdown.rstrip().endswith("Page 18 of 27")
+
+def test_pages_with_timing_diagrams_go_to_ocr():
+  # Pages 20 and 21 draw their timing diagrams with few, long paths (20 and
+  # 24 drawings, under max_figure_paths); the located figures still count
+  with fitz.open(SRC / "pdf" / "ad7980.pdf") as document:
+    decisions = [analyze_text_layer(document[index], TextLayerConfig()) for index in (19, 20)]
+
+  assert [decision.path for decision in decisions] == ["ocr", "ocr"]
+  assert all(decision.figure_paths <= TextLayerConfig().max_figure_paths for decision in decisions)
+  assert decisions[1].figures == 2
\ No newline at end of file
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+pytest.importorskip("pydantic")
+
+from rtl_context import KnowledgeNode, NodeType
+from rtl_context.tree_merge import ManifestCluster, merge_subtrees
+from rtl_context.tree_patch import walk
+
+def _node(node_id: str, refs=(), children=()) -> KnowledgeNode:
+  return KnowledgeNode(
+    id=node_id, type=NodeType.LEAF_FACT, title=node_id, description="", apply_condition="ALWAYS",
+    content_refs=list(refs), children=list(children)
+  )
+
+def test_leaves_for_forgotten_pages_get_unique_ids():
+  entries = [
+    {"page_id": f"page_{n:03d}", "page_type": "timing_spec", "summary": ""} for n in (19, 20)
+  ]
+  cluster = ManifestCluster("interface_s01", "interface", entries)
+  # The model named a node after page_019 but attached no refs, so page_019 comes back as a leaf too
+  subtree = _node("cs_mode", children=[_node("page_019"), _node("page_020_node", refs=["page_020"])])
+
+  tree = merge_subtrees("AD7980", [(cluster, subtree)])
+
+  ids = [node.id for node in walk(tree)]
+  assert len(ids) == len(set(ids))
+  assert "interface_s01.page_019_2" in ids
\ No newline at end of file